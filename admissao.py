@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+import database
+
+# Controle de admissão das rotas caras.
+# As listagens e relatórios (ROTAS_PESADAS) passam por três limites de
+# concorrência: um por rota, um das leituras pesadas em conjunto e um
+# compartilhado com as escritas, do tamanho do pool de conexões. Quem não cabe
+# espera numa fila limitada, por no máximo PRAZO_MS; com a fila cheia, ou
+# vencido o prazo, a requisição recebe 503 com Retry-After na hora, sem ocupar
+# thread nem conexão. Assim um pico de listagens não empurra a latência das
+# rotas baratas (ex. GET /reservas/{id}), que não passam por aqui.
+# As leituras pesadas gastam CPU (consulta e serialização de muitas linhas):
+# mais delas ao mesmo tempo que núcleos só disputam o processador (e o GIL)
+# com as rotas baratas. Por isso o limite conjunto vem do número de núcleos
+# (os.cpu_count()), e não do pool; as conexões e threads além dele ficam para
+# as rotas baratas e as escritas.
+# As escritas (POST, PUT, PATCH e DELETE em /reservas, /salas e /usuarios)
+# usam só o limite compartilhado, com prioridade: passam na frente das
+# leituras na fila e têm RESERVA_ESCRITAS vagas que as leituras não ocupam.
+# Os limites valem por processo (cada worker tem os seus).
+
+ATIVA = os.getenv("ADMISSAO_ATIVA", "true").strip().lower() in ("1", "true", "sim")
+# Requisições simultâneas no limite compartilhado (padrão: tamanho do pool de conexões)
+CONCORRENCIA = int(os.getenv("ADMISSAO_CONCORRENCIA", str(database.POOL_TAMANHO + database.POOL_EXCESSO)))
+RESERVA_ESCRITAS = int(os.getenv("ADMISSAO_RESERVA_ESCRITAS", str(max(CONCORRENCIA // 4, 1))))
+FILA = int(os.getenv("ADMISSAO_FILA", str(CONCORRENCIA * 4)))
+# Leituras pesadas simultâneas, somadas todas as rotas (padrão: núcleos da máquina)
+CONCORRENCIA_LEITURAS = int(os.getenv("ADMISSAO_CONCORRENCIA_LEITURAS", str(os.cpu_count() or 1)))
+FILA_LEITURAS = int(os.getenv("ADMISSAO_FILA_LEITURAS", str(CONCORRENCIA_LEITURAS * 16)))
+# Requisições simultâneas e fila de cada rota pesada (padrão: metade do limite
+# conjunto, para uma rota não ocupar todas as vagas)
+CONCORRENCIA_ROTA = int(os.getenv("ADMISSAO_CONCORRENCIA_ROTA", str(max(CONCORRENCIA_LEITURAS // 2, 1))))
+FILA_ROTA = int(os.getenv("ADMISSAO_FILA_ROTA", str(CONCORRENCIA_ROTA * 16)))
+# Espera máxima na fila (as duas filas, somadas)
+PRAZO_MS = float(os.getenv("ADMISSAO_PRAZO_MS", "2000"))
+RETRY_AFTER_SEGUNDOS = int(os.getenv("ADMISSAO_RETRY_AFTER_SEGUNDOS", "1"))
+
+# Caminhos (sem a barra final) das leituras limitadas
+ROTAS_PESADAS = (
+    "/reservas",
+    "/reservas/intervalo",
+    "/reservas/exportar",
+    "/salas",
+    "/salas/disponiveis",
+    "/salas/calendario",
+    "/usuarios",
+    "/analises/ocupacao",
+)
+METODOS_ESCRITA = ("POST", "PUT", "PATCH", "DELETE")
+PREFIXOS_ESCRITA = ("/reservas", "/salas", "/usuarios")
+
+# Prioridades na fila (menor passa primeiro)
+ESCRITA = 0
+LEITURA = 1
+
+FILA_CHEIA = "fila_cheia"
+PRAZO = "prazo"
+
+
+class Limitador:
+    """
+    Limite de concorrência com fila limitada e prioridade, para uso dentro do
+    loop de eventos. Com reserva > 0 as leituras ocupam no máximo
+    limite - reserva vagas. A fila é atendida por prioridade e, dentro dela,
+    por ordem de chegada.
+    """
+
+    def __init__(self, nome: str, limite: int, fila: int, reserva: int = 0):
+        self.nome = nome
+        self.limite = limite
+        self.fila = fila
+        self.reserva = min(reserva, limite - 1)
+        self.em_uso = 0
+        self._espera: List[Tuple[int, int, asyncio.Future]] = []  # heap (prioridade, chegada, futuro)
+        self._esperando = {ESCRITA: 0, LEITURA: 0}
+        self._chegada = itertools.count()
+        self.admitidas = 0
+        self.rejeitadas = {FILA_CHEIA: 0, PRAZO: 0}
+        self.tempo_espera = 0.0
+
+    def _cabe(self, prioridade: int) -> bool:
+        return self.em_uso < (self.limite if prioridade == ESCRITA else self.limite - self.reserva)
+
+    def _a_frente(self, prioridade: int) -> int:
+        return sum(total for p, total in self._esperando.items() if p <= prioridade)
+
+    async def entrar(self, prioridade: int, espera_maxima: float) -> Optional[str]:
+        """
+        Ocupa uma vaga, esperando na fila por até espera_maxima segundos.
+        Retorna None quando admitida, ou o motivo da rejeição (FILA_CHEIA, PRAZO).
+        """
+        if not self._a_frente(prioridade) and self._cabe(prioridade):
+            self.em_uso += 1
+            self.admitidas += 1
+            return None
+        if sum(self._esperando.values()) >= self.fila:
+            self.rejeitadas[FILA_CHEIA] += 1
+            return FILA_CHEIA
+        if espera_maxima <= 0:
+            self.rejeitadas[PRAZO] += 1
+            return PRAZO
+
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (prioridade, next(self._chegada), futuro))
+        self._esperando[prioridade] += 1
+        comeco = time.perf_counter()
+        try:
+            await asyncio.wait_for(futuro, espera_maxima)
+        except asyncio.TimeoutError:
+            self.rejeitadas[PRAZO] += 1
+            return PRAZO
+        except asyncio.CancelledError:
+            # Cliente desconectou; se a vaga já tinha sido passada, devolve
+            if futuro.done() and not futuro.cancelled():
+                self.sair()
+            raise
+        finally:
+            self._esperando[prioridade] -= 1
+            self.tempo_espera += time.perf_counter() - comeco
+        # A vaga foi passada por sair (em_uso já contado)
+        self.admitidas += 1
+        return None
+
+    def sair(self) -> None:
+        self.em_uso -= 1
+        # Passa as vagas livres para os primeiros da fila (os que desistiram
+        # por prazo ficam com o futuro cancelado e são descartados)
+        while self._espera:
+            prioridade, _, futuro = self._espera[0]
+            if futuro.done():
+                heapq.heappop(self._espera)
+                continue
+            if not self._cabe(prioridade):
+                break
+            heapq.heappop(self._espera)
+            self.em_uso += 1
+            futuro.set_result(None)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "limite": self.limite,
+            "reserva_escritas": self.reserva,
+            "em_uso": self.em_uso,
+            "fila": sum(self._esperando.values()),
+            "fila_escritas": self._esperando[ESCRITA],
+            "fila_maxima": self.fila,
+            "admitidas": self.admitidas,
+            "rejeitadas": dict(self.rejeitadas),
+            "espera_total_segundos": self.tempo_espera,
+        }
+
+
+class ControleAdmissao:
+    """
+    Os limitadores de cada rota pesada, o das leituras pesadas e o
+    compartilhado, e a escolha de quais se aplicam a uma requisição.
+    """
+
+    def __init__(self, ativa: bool = ATIVA, concorrencia: int = CONCORRENCIA, reserva_escritas: int = RESERVA_ESCRITAS,
+                 fila: int = FILA, concorrencia_leituras: int = CONCORRENCIA_LEITURAS,
+                 fila_leituras: int = FILA_LEITURAS, concorrencia_rota: int = CONCORRENCIA_ROTA,
+                 fila_rota: int = FILA_ROTA, prazo_ms: float = PRAZO_MS):
+        self.ativa = ativa
+        self.prazo = prazo_ms / 1000
+        self.compartilhado = Limitador("compartilhado", concorrencia, fila, reserva_escritas)
+        self.leituras = Limitador("leituras", concorrencia_leituras, fila_leituras)
+        self.rotas = {caminho: Limitador(caminho, concorrencia_rota, fila_rota) for caminho in ROTAS_PESADAS}
+
+    def limitadores(self, metodo: str, caminho: str) -> List[Tuple[Limitador, int]]:
+        """
+        (limitador, prioridade) na ordem em que devem ser ocupados; vazio para
+        as rotas sem controle.
+        """
+        caminho = caminho.rstrip("/") or "/"
+        if metodo == "GET":
+            rota = self.rotas.get(caminho)
+            return [(rota, LEITURA), (self.leituras, LEITURA), (self.compartilhado, LEITURA)] if rota else []
+        if metodo in METODOS_ESCRITA and caminho.startswith(PREFIXOS_ESCRITA):
+            return [(self.compartilhado, ESCRITA)]
+        return []
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "ativa": self.ativa,
+            "prazo_ms": self.prazo * 1000,
+            "limitadores": {
+                limitador.nome: limitador.estatisticas()
+                for limitador in (self.compartilhado, self.leituras, *self.rotas.values())
+            },
+        }
+
+
+controle = ControleAdmissao()
+
+
+class MiddlewareAdmissao:
+    """
+    Middleware ASGI que ocupa as vagas dos limitadores da rota antes de
+    chamar o endpoint, e as libera ao fim da resposta; sem vaga a tempo,
+    responde 503 com Retry-After.
+    """
+
+    def __init__(self, app, controle_admissao: ControleAdmissao = controle,
+                 retry_after: int = RETRY_AFTER_SEGUNDOS):
+        self.app = app
+        self.controle = controle_admissao
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controle.ativa:
+            await self.app(scope, receive, send)
+            return
+        limitadores = self.controle.limitadores(scope["method"], scope["path"])
+        if not limitadores:
+            await self.app(scope, receive, send)
+            return
+
+        prazo = time.monotonic() + self.controle.prazo
+        ocupados: List[Limitador] = []
+        try:
+            for limitador, prioridade in limitadores:
+                if await limitador.entrar(prioridade, prazo - time.monotonic()) is not None:
+                    resposta = JSONResponse(
+                        {"detail": "Servidor sobrecarregado; tente novamente em instantes."},
+                        status_code=503,
+                        headers={"Retry-After": str(self.retry_after)},
+                    )
+                    await resposta(scope, receive, send)
+                    return
+                ocupados.append(limitador)
+            await self.app(scope, receive, send)
+        finally:
+            for limitador in reversed(ocupados):
+                limitador.sair()
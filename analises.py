@@ -0,0 +1,289 @@
+from datetime import datetime
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, extract, func, literal_column, select
+from sqlalchemy.orm import Session, selectinload
+
+import arquivamento, models, schemas
+from recorrencia import Recorrencia
+
+# Relatórios de ocupação das salas.
+# As reservas do período são lidas em blocos como inteiros (minutos desde
+# 1970-01-01, convertidos no banco; sem objetos ORM) e agregadas com NumPy: os
+# minutos de cada reserva que caem em cada bucket são calculados de uma vez
+# para o bloco inteiro. As ocorrências das séries recorrentes, que não são
+# gravadas, são calculadas no Python e entram nos mesmos blocos.
+
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+# datetime64 conta minutos a partir de 1970-01-01, uma quinta-feira: somando
+# 3 dias, o resto da divisão por MINUTOS_SEMANA passa a contar a partir de segunda.
+DESLOCAMENTO_SEGUNDA = 3 * MINUTOS_DIA
+
+DIAS_SEMANA = ["seg", "ter", "qua", "qui", "sex", "sab", "dom"]
+
+# periodo -> (ciclo em minutos, largura de cada bucket em minutos)
+PERIODOS: Dict[str, Tuple[int, int]] = {
+    "hora": (MINUTOS_DIA, 60),               # hora do dia: 24 buckets
+    "dia_semana": (MINUTOS_SEMANA, MINUTOS_DIA),  # dia da semana: 7 buckets
+    "hora_semana": (MINUTOS_SEMANA, 60),     # hora da semana: 168 buckets
+}
+
+AGRUPAMENTOS = ("sala", "localizacao")
+
+# Reservas lidas e agregadas por bloco (limita a memória usada na leitura)
+TAMANHO_BLOCO = 65536
+
+
+def _minutos_epoca(coluna, dialeto: str):
+    """
+    Expressão SQL com os minutos desde 1970-01-01 de uma coluna DateTime
+    (sem fuso), ou None se o banco não tiver uma conversão conhecida.
+    Ler inteiros evita converter cada data para datetime no Python.
+    """
+    if dialeto == "sqlite":
+        # julianday é a conversão mais barata no SQLite; a folga de 1e-5 minuto
+        # evita que o erro de ponto flutuante arredonde 08:00 para 07:59.
+        return cast((func.julianday(coluna) - 2440587.5) * MINUTOS_DIA + 0.00001, BigInteger)
+    if dialeto == "postgresql":
+        return cast(func.floor(extract("epoch", coluna) / 60), BigInteger)
+    if dialeto in ("mysql", "mariadb"):
+        return func.timestampdiff(literal_column("MINUTE"), "1970-01-01", coluna)
+    return None
+
+
+def _blocos_reservas(db: Session, modelo, localizacao: Optional[str], start_date: datetime, end_date: datetime) -> Iterator[np.ndarray]:
+    """
+    Lê as reservas do período (de modelo: models.Reserva ou
+    models.ReservaHistorico) em blocos de até TAMANHO_BLOCO linhas, cada um
+    uma matriz n x 4 (id_sala, início, final, participantes) com início e final
+    em minutos desde 1970-01-01.
+    """
+    dialeto = db.get_bind().dialect.name
+    inicio = _minutos_epoca(modelo.data_inicio, dialeto)
+    final = _minutos_epoca(modelo.data_final, dialeto)
+    convertido_no_banco = inicio is not None
+    if not convertido_no_banco:
+        inicio, final = modelo.data_inicio, modelo.data_final
+
+    consulta = select()
+    if localizacao:
+        consulta = consulta.select_from(modelo).join(models.Sala, modelo.id_sala == models.Sala.id).where(models.Sala.localizacao == localizacao)
+    consulta = (
+        consulta
+        .add_columns(modelo.id_sala, inicio, final, func.coalesce(modelo.participantes, 0))
+        .where(modelo.data_inicio < end_date, modelo.data_final > start_date)
+    )
+    resultado = db.connection().execution_options(yield_per=TAMANHO_BLOCO).execute(consulta)
+    for linhas in resultado.partitions():
+        if convertido_no_banco:
+            yield np.fromiter(chain.from_iterable(linhas), dtype=np.int64, count=4 * len(linhas)).reshape(-1, 4)
+            continue
+        ids_sala, inicios, finais, participantes = zip(*linhas)
+        bloco = np.empty((len(linhas), 4), dtype=np.int64)
+        bloco[:, 0] = ids_sala
+        bloco[:, 1] = np.array(inicios, dtype="datetime64[m]").astype(np.int64)
+        bloco[:, 2] = np.array(finais, dtype="datetime64[m]").astype(np.int64)
+        bloco[:, 3] = participantes
+        yield bloco
+
+
+def _blocos_series(db: Session, localizacao: Optional[str], start_date: datetime, end_date: datetime) -> Iterator[np.ndarray]:
+    """
+    Ocorrências das séries recorrentes que se sobrepõem ao período, nos mesmos
+    blocos de _blocos_reservas (id_sala, início, final, participantes).
+    """
+    consulta = (
+        select(models.SerieReserva)
+        .options(selectinload(models.SerieReserva.excecoes))
+        .where(models.SerieReserva.data_inicio < end_date, models.SerieReserva.fim_serie > start_date)
+    )
+    if localizacao:
+        consulta = consulta.join(models.Sala, models.SerieReserva.id_sala == models.Sala.id).where(models.Sala.localizacao == localizacao)
+    ocorrencias = (
+        (serie.id_sala, inicio, final, serie.participantes or 0)
+        for serie in db.scalars(consulta).all()
+        for _, inicio, final in Recorrencia.de_serie(serie).ocorrencias_entre(start_date, end_date)
+    )
+    while linhas := list(islice(ocorrencias, TAMANHO_BLOCO)):
+        ids_sala, inicios, finais, participantes = zip(*linhas)
+        bloco = np.empty((len(linhas), 4), dtype=np.int64)
+        bloco[:, 0] = ids_sala
+        bloco[:, 1] = np.array(inicios, dtype="datetime64[m]").astype(np.int64)
+        bloco[:, 2] = np.array(finais, dtype="datetime64[m]").astype(np.int64)
+        bloco[:, 3] = participantes
+        yield bloco
+
+
+def _rotulos(periodo: str) -> List[str]:
+    if periodo == "hora":
+        return [f"{h:02d}h" for h in range(24)]
+    if periodo == "dia_semana":
+        return list(DIAS_SEMANA)
+    if periodo == "hora_semana":
+        return [f"{dia} {h:02d}h" for dia in DIAS_SEMANA for h in range(24)]
+    return ["total"]
+
+
+def _minutos_ate(grupos: np.ndarray, t: np.ndarray, pesos: np.ndarray, n_grupos: int, ciclo: int, largura: int) -> np.ndarray:
+    """
+    Soma, por grupo e bucket, pesos * (minutos de [0, t) que caem no bucket).
+    Retorna uma matriz n_grupos x (ciclo // largura).
+
+    Cada t contribui com `largura` minutos a todo bucket por ciclo completo,
+    com `largura` aos buckets anteriores ao seu no ciclo corrente e com o
+    resto ao próprio bucket; assim o custo é linear no número de instantes,
+    sem montar uma matriz instantes x buckets.
+    """
+    n_buckets = ciclo // largura
+    voltas, resto = np.divmod(t, ciclo)
+    bucket, parcial = np.divmod(resto, largura)
+    celulas = grupos * n_buckets + bucket
+
+    por_volta = np.bincount(grupos, weights=pesos * voltas * largura, minlength=n_grupos)
+    no_bucket = np.bincount(celulas, weights=pesos, minlength=n_grupos * n_buckets).reshape(n_grupos, n_buckets)
+    # Peso dos instantes que estão em buckets posteriores a cada bucket
+    posteriores = np.cumsum(no_bucket[:, ::-1], axis=1)[:, ::-1] - no_bucket
+    parciais = np.bincount(celulas, weights=pesos * parcial, minlength=n_grupos * n_buckets).reshape(n_grupos, n_buckets)
+    return por_volta[:, None] + largura * posteriores + parciais
+
+
+def _buckets_tocados(grupos: np.ndarray, inicios: np.ndarray, finais: np.ndarray, n_grupos: int, ciclo: int, largura: int) -> np.ndarray:
+    """
+    Conta, por grupo e bucket, quantos intervalos [início, final) têm ao menos
+    um minuto no bucket. Cada intervalo marca uma faixa circular de buckets,
+    somada com um vetor de diferenças.
+    """
+    n_buckets = ciclo // largura
+    primeiro = inicios // largura
+    ultimo = (finais - 1) // largura
+    todos = ultimo - primeiro + 1 >= n_buckets
+    primeiro, ultimo = primeiro % n_buckets, ultimo % n_buckets
+    da_volta = ~todos & (ultimo < primeiro)
+    linha = grupos * (n_buckets + 1)
+
+    # Marcas no vetor de diferenças (n_buckets + 1 posições por grupo): +1 no
+    # primeiro bucket e -1 depois do último. Intervalos que dão a volta no
+    # ciclo marcam [primeiro, n_buckets) e [0, ultimo + 1).
+    posicoes = np.concatenate([
+        linha + np.where(todos, 0, primeiro),
+        linha + np.where(todos | da_volta, n_buckets, ultimo + 1),
+        linha[da_volta],
+        (linha + ultimo + 1)[da_volta],
+    ])
+    n, n_volta = len(grupos), int(da_volta.sum())
+    pesos = np.concatenate([np.ones(n), -np.ones(n), np.ones(n_volta), -np.ones(n_volta)])
+    diferencas = np.bincount(posicoes, weights=pesos, minlength=n_grupos * (n_buckets + 1))
+    return np.cumsum(diferencas.reshape(n_grupos, n_buckets + 1), axis=1)[:, :n_buckets]
+
+
+def ocupacao(db: Session, start_date: datetime, end_date: datetime, agrupar: str = "sala", periodo: str = "hora", localizacao: Optional[str] = None) -> schemas.RelatorioOcupacao:
+    """
+    Calcula, por grupo (sala ou localização) e por bucket do período (hora do
+    dia, dia da semana, hora da semana ou total), os minutos ocupados, a
+    quantidade de reservas (avulsas e ocorrências de séries), a taxa de
+    ocupação e a razão média participantes/capacidade (ponderada pelos
+    minutos ocupados).
+    """
+    consulta_salas = select(models.Sala.id, models.Sala.capacidade, models.Sala.localizacao).order_by(models.Sala.id)
+    if localizacao:
+        consulta_salas = consulta_salas.where(models.Sala.localizacao == localizacao)
+    salas = db.execute(consulta_salas).all()
+
+    # Índice do grupo e capacidade de cada sala, indexados pelo id da sala
+    # (-1 para salas fora do relatório)
+    if agrupar == "sala":
+        nomes_grupos = [str(sala.id) for sala in salas]
+        indices = list(range(len(salas)))
+    else:
+        nomes_grupos = sorted({sala.localizacao or "" for sala in salas})
+        posicao = {nome: i for i, nome in enumerate(nomes_grupos)}
+        indices = [posicao[sala.localizacao or ""] for sala in salas]
+    maior_id = max((sala.id for sala in salas), default=0)
+    grupo_da_sala = np.full(maior_id + 1, -1, dtype=np.int64)
+    capacidade = np.zeros(maior_id + 1)
+    for sala, indice in zip(salas, indices):
+        grupo_da_sala[sala.id] = indice
+        capacidade[sala.id] = sala.capacidade or 0
+    salas_por_grupo = np.bincount(np.asarray(indices, dtype=np.int64), minlength=len(nomes_grupos))
+
+    # As reservas arquivadas só entram se o período alcança o corte do arquivamento
+    modelos = [models.Reserva]
+    if arquivamento.alcanca_historico(start_date):
+        modelos.append(models.ReservaHistorico)
+    blocos = chain(
+        chain.from_iterable(_blocos_reservas(db, modelo, localizacao, start_date, end_date) for modelo in modelos),
+        _blocos_series(db, localizacao, start_date, end_date),
+    )
+
+    origem = np.datetime64(start_date, "m").astype(np.int64)
+    inicio_janela = np.int64(0)
+    fim_janela = np.datetime64(end_date, "m").astype(np.int64) - origem
+
+    if periodo in PERIODOS:
+        ciclo, largura = PERIODOS[periodo]
+        # Alinha os instantes ao ciclo (segunda-feira 00:00, para os períodos semanais)
+        deslocamento = (origem + DESLOCAMENTO_SEGUNDA) % ciclo
+    else:
+        # "total": um único bucket do tamanho da janela
+        ciclo = largura = int(fim_janela) + 1
+        deslocamento = 0
+    n_grupos, n_buckets = len(nomes_grupos), ciclo // largura
+
+    minutos = np.zeros((n_grupos, n_buckets))
+    reservas = np.zeros((n_grupos, n_buckets))
+    ocupacao_ponderada = np.zeros((n_grupos, n_buckets))
+
+    for linhas in blocos:
+        linhas = linhas[linhas[:, 0] <= maior_id]
+        linhas = linhas[grupo_da_sala[linhas[:, 0]] >= 0]
+        ids_sala = linhas[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            razao = np.where(capacidade[ids_sala] > 0, linhas[:, 3] / capacidade[ids_sala], 0.0)
+        # Minutos desde o início da janela, recortados à janela; intervalos
+        # vazios depois do recorte são descartados
+        inicios = np.clip(linhas[:, 1] - origem, inicio_janela, fim_janela)
+        finais = np.clip(linhas[:, 2] - origem, inicio_janela, fim_janela)
+        validas = finais > inicios
+        grupos, inicios, finais, razao = grupo_da_sala[ids_sala][validas], inicios[validas], finais[validas], razao[validas]
+
+        uns = np.ones(len(grupos))
+        minutos += (
+            _minutos_ate(grupos, finais + deslocamento, uns, n_grupos, ciclo, largura)
+            - _minutos_ate(grupos, inicios + deslocamento, uns, n_grupos, ciclo, largura)
+        )
+        ocupacao_ponderada += (
+            _minutos_ate(grupos, finais + deslocamento, razao, n_grupos, ciclo, largura)
+            - _minutos_ate(grupos, inicios + deslocamento, razao, n_grupos, ciclo, largura)
+        )
+        reservas += _buckets_tocados(grupos, inicios + deslocamento, finais + deslocamento, n_grupos, ciclo, largura)
+
+    # Minutos disponíveis de cada bucket na janela, por sala
+    janela = np.array([inicio_janela, fim_janela]) + deslocamento
+    disponivel = _minutos_ate(np.zeros(2, dtype=np.int64), janela, np.array([-1.0, 1.0]), 1, ciclo, largura)[0]
+    disponivel_grupo = salas_por_grupo[:, None] * disponivel[None, :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        taxa = np.where(disponivel_grupo > 0, minutos / disponivel_grupo, 0.0)
+        razao_media = np.where(minutos > 0, ocupacao_ponderada / minutos, np.nan)
+
+    return schemas.RelatorioOcupacao(
+        data_inicio=start_date,
+        data_final=end_date,
+        agrupar=agrupar,
+        periodo=periodo,
+        buckets=_rotulos(periodo),
+        grupos=[
+            schemas.GrupoOcupacao(
+                grupo=nomes_grupos[g],
+                salas=int(salas_por_grupo[g]),
+                minutos_ocupados=np.round(minutos[g], 1).tolist(),
+                reservas=reservas[g].astype(int).tolist(),
+                taxa_ocupacao=np.round(taxa[g], 4).tolist(),
+                participantes_por_capacidade=[None if np.isnan(v) else round(float(v), 4) for v in razao_media[g]],
+            )
+            for g in range(n_grupos)
+        ],
+    )
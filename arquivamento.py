@@ -0,0 +1,131 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+import migracoes, models
+from cache import catalogo
+from database import SessionLocal, engine
+from indice_reservas import indice
+
+# Arquivamento das reservas antigas (tabela quente x histórico).
+# As reservas que terminaram há mais que RETENCAO são movidas, em lotes, da
+# tabela reservas para reservas_historico, com o mesmo ID. As consultas do dia
+# a dia (listagens, agendas das salas, verificação de conflitos) leem só a
+# tabela quente; o histórico só é lido quando o período consultado começa
+# antes do corte (agora - RETENCAO), ou quando pedido explicitamente.
+# O corte é calculado por cada processo a partir de RETENCAO, sem estado
+# compartilhado: o que foi arquivado terminou antes do corte do momento do
+# arquivamento, que nunca é posterior ao corte atual.
+# Cada lote é uma transação curta (DELETE ... RETURNING seguido do INSERT no
+# histórico), com uma pausa entre os lotes, para não segurar o lock de
+# escrita do banco e deixar os escritores passarem.
+# Uso (ex.: pelo cron): python arquivamento.py [--lote 1000] [--pausa 0.05] [--maximo N]
+
+RETENCAO = timedelta(days=int(os.getenv("ARQUIVO_RETENCAO_DIAS", "365")))
+TAMANHO_LOTE = int(os.getenv("ARQUIVO_TAMANHO_LOTE", "1000"))
+PAUSA_SEGUNDOS = float(os.getenv("ARQUIVO_PAUSA_SEGUNDOS", "0.05"))
+
+_COLUNAS = ("id", "id_sala", "id_usuario", "data_inicio", "data_final", "participantes")
+
+
+def corte(agora: Optional[datetime] = None) -> datetime:
+    """
+    Reservas que terminaram antes deste instante podem estar no histórico.
+    """
+    return (agora or datetime.now()) - RETENCAO
+
+
+def alcanca_historico(inicio: datetime) -> bool:
+    """
+    Se uma consulta de um período que começa em inicio precisa ler o histórico.
+    """
+    return inicio < corte()
+
+
+def arquivar_lote(db: Session, limite: datetime, tamanho: int = TAMANHO_LOTE) -> Tuple[int, int]:
+    """
+    Move para o histórico até tamanho reservas encerradas antes de limite, as
+    mais antigas primeiro, numa única transação.
+    Retorna (reservas movidas, salas afetadas).
+    """
+    # Os IDs das reservas não são reaproveitados (AUTOINCREMENT no SQLite,
+    # models.Reserva), então o ID de uma reserva arquivada não volta numa nova
+    ids = db.scalars(
+        select(models.Reserva.id)
+        .where(models.Reserva.data_final < limite)
+        .order_by(models.Reserva.data_final)
+        .limit(tamanho)
+    ).all()
+    if not ids:
+        db.rollback()
+        return 0, 0
+    # DELETE ... RETURNING: só vai para o histórico o que foi de fato removido
+    # (uma reserva apagada por outra requisição no meio do caminho fica de fora)
+    linhas = db.execute(
+        delete(models.Reserva)
+        .where(models.Reserva.id.in_(ids))
+        .returning(*(getattr(models.Reserva, coluna) for coluna in _COLUNAS))
+        .execution_options(synchronize_session=False)
+    ).all()
+    if linhas:
+        agora = datetime.now()
+        db.execute(
+            insert(models.ReservaHistorico),
+            [{**dict(zip(_COLUNAS, linha)), "arquivada_em": agora} for linha in linhas],
+        )
+    db.commit()
+
+    # As agendas em memória passam a ter só a tabela quente, como se tivessem
+    # sido recarregadas; o catálogo (salas com suas reservas) é invalidado.
+    salas = {}
+    for linha in linhas:
+        salas.setdefault(linha.id_sala, []).append(linha)
+    for id_sala, removidas in salas.items():
+        agenda = indice.agenda(id_sala)
+        with agenda.lock:
+            if agenda.carregada:
+                for linha in removidas:
+                    agenda.remover(linha.id, linha.data_inicio)
+    if linhas:
+        catalogo.invalidar()
+    return len(linhas), len(salas)
+
+
+def arquivar(sessao: Callable[[], Session] = SessionLocal, tamanho_lote: int = TAMANHO_LOTE,
+             pausa: float = PAUSA_SEGUNDOS, maximo: Optional[int] = None) -> int:
+    """
+    Arquiva, lote a lote, as reservas encerradas antes do corte (no máximo
+    maximo reservas, se informado). Cada lote usa uma sessão própria.
+    Retorna a quantidade de reservas movidas.
+    """
+    limite = corte()
+    total = 0
+    while maximo is None or total < maximo:
+        tamanho = tamanho_lote if maximo is None else min(tamanho_lote, maximo - total)
+        with sessao() as db:
+            movidas, _ = arquivar_lote(db, limite, tamanho)
+        if not movidas:
+            break
+        total += movidas
+        time.sleep(pausa)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move as reservas encerradas antes do horizonte de retenção para o histórico.")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="reservas por transação")
+    parser.add_argument("--pausa", type=float, default=PAUSA_SEGUNDOS, help="segundos entre os lotes")
+    parser.add_argument("--maximo", type=int, help="para depois de arquivar esta quantidade")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    migracoes.migrar(engine)
+    comeco = time.perf_counter()
+    movidas = arquivar(tamanho_lote=args.lote, pausa=args.pausa, maximo=args.maximo)
+    print(f"{movidas} reservas encerradas antes de {corte():%Y-%m-%d %H:%M} arquivadas "
+          f"em {time.perf_counter() - comeco:.1f} s")
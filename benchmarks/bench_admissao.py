@@ -0,0 +1,143 @@
+"""
+Teste de carga do controle de admissão (admissao.py): com a API rodando no
+uvicorn, clientes fazem GET /reservas/{id} (rota barata) sem parar, primeiro
+sozinhos e depois junto com uma enxurrada de /reservas/intervalo e
+/reservas/?limit=1000 (rotas pesadas), com o controle de admissão desligado
+e ligado. Reporta p50/p99 da rota barata em cada fase e, para as pesadas,
+as respostas 200 e 503 por segundo.
+
+Os limites vêm das variáveis ADMISSAO_* do ambiente, como na API.
+
+Uso: python benchmarks/bench_admissao.py [--reservas 20000] [--pesados 60] [--baratos 4]
+     [--segundos 15] [--porta 8765] [--banco sqlite:////tmp/bench_admissao.db]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+
+
+def percentis(amostras: list) -> str:
+    amostras = sorted(amostras)
+    return (f"p50 {statistics.median(amostras) * 1000:.1f} ms, "
+            f"p99 {amostras[int(len(amostras) * 0.99) - 1] * 1000:.1f} ms ({len(amostras)} requisições)")
+
+
+def popular(banco: str, reservas: int) -> datetime:
+    os.environ["CONEXAO_DB"] = banco
+    from sqlalchemy import insert
+
+    import models
+    from database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    inicio = datetime(2030, 1, 1)
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        db.add_all(models.Sala(id=i, nome=f"sala {i}", capacidade=10, localizacao="bench") for i in range(1, 21))
+        db.flush()
+        db.execute(insert(models.Reserva), [
+            {"id_sala": n % 20 + 1, "id_usuario": 1, "participantes": 1,
+             "data_inicio": inicio + timedelta(hours=n // 20), "data_final": inicio + timedelta(hours=n // 20, minutes=30)}
+            for n in range(reservas)
+        ])
+        db.commit()
+    return inicio
+
+
+async def carga(porta: int, inicio: datetime, pesados: int, baratos: int, segundos: float, reservas: int) -> tuple:
+    import httpx
+
+    latencias, pesadas = [], Counter()
+    fim = time.monotonic() + segundos
+    periodo = {"data_inicio": inicio.isoformat(), "data_final": (inicio + timedelta(days=30)).isoformat()}
+    limites = httpx.Limits(max_connections=pesados + baratos + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", timeout=60, limits=limites) as cliente:
+        async def barato(n: int) -> None:
+            while time.monotonic() < fim:
+                comeco = time.perf_counter()
+                resposta = await cliente.get(f"/reservas/{(n * 7919) % reservas + 1}")
+                latencias.append(time.perf_counter() - comeco)
+                resposta.raise_for_status()
+                n += 1
+                await asyncio.sleep(0.02)
+
+        async def pesado(n: int) -> None:
+            while time.monotonic() < fim:
+                try:
+                    if n % 2:
+                        resposta = await cliente.get("/reservas/intervalo", params=periodo)
+                    else:
+                        resposta = await cliente.get("/reservas/", params={"limit": 1000})
+                except httpx.TransportError:  # conexão derrubada pelo servidor sobrecarregado
+                    pesadas["erro"] += 1
+                    n += 1
+                    continue
+                pesadas[resposta.status_code] += 1
+                if resposta.status_code == 503:
+                    await asyncio.sleep(float(resposta.headers.get("Retry-After", "1")))
+                n += 1
+
+        await asyncio.gather(*(barato(n) for n in range(baratos)), *(pesado(n) for n in range(pesados)))
+    return latencias, pesadas
+
+
+def fase(args, inicio: datetime, admissao_ativa: bool, pesados: int) -> tuple:
+    ambiente = {**os.environ, "CONEXAO_DB": args.banco, "ADMISSAO_ATIVA": str(admissao_ativa).lower(),
+                "INSTRUMENTACAO_LENTA_MS": "0"}
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.porta), "--log-level", "warning"],
+        cwd=RAIZ, env=ambiente,
+    )
+    try:
+        import httpx
+
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.porta}/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        return asyncio.run(carga(args.porta, inicio, pesados, args.baratos, args.segundos, args.reservas))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reservas", type=int, default=20_000)
+    parser.add_argument("--pesados", type=int, default=60, help="clientes das rotas pesadas")
+    parser.add_argument("--baratos", type=int, default=4, help="clientes de GET /reservas/{id}")
+    parser.add_argument("--segundos", type=float, default=15)
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_admissao.db")
+    args = parser.parse_args()
+
+    inicio = popular(args.banco, args.reservas)
+    fases = [
+        ("só a rota barata", True, 0),
+        ("rotas pesadas saturadas, sem admissão", False, args.pesados),
+        ("rotas pesadas saturadas, com admissão", True, args.pesados),
+    ]
+    print(f"{args.reservas} reservas; {args.baratos} clientes baratos, {args.pesados} pesados, {args.segundos:.0f} s por fase")
+    for nome, ativa, pesados in fases:
+        latencias, pesadas = fase(args, inicio, ativa, pesados)
+        linha = f"{nome}: GET /reservas/{{id}} {percentis(latencias)}"
+        if pesados:
+            linha += (f"; pesadas: {pesadas[200] / args.segundos:.1f} 200/s, "
+                      f"{pesadas[503] / args.segundos:.1f} 503/s, {pesadas['erro']} erros de conexão")
+        print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Mede o efeito do arquivamento (arquivamento.py) numa base com anos de
+reservas encerradas: carga das agendas das salas, listagem e consulta por
+período recente, antes e depois de mover as reservas antigas para o
+histórico. Durante o arquivamento, um escritor cria reservas sem parar e a
+sua latência é reportada (o arquivamento não deve bloqueá-lo).
+
+Uso: python benchmarks/bench_arquivamento.py [--reservas 300000] [--salas 50]
+     [--anos 5] [--banco sqlite:////tmp/bench_arquivamento.db]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reservas", type=int, default=300_000)
+    parser.add_argument("--salas", type=int, default=50)
+    parser.add_argument("--anos", type=int, default=5)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_arquivamento.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    from sqlalchemy import insert
+
+    import arquivamento, crud, models, schemas
+    from database import SessionLocal, engine
+    from indice_reservas import carregar_agendas, indice
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    # Uma reserva de 1 h por sala a cada intervalo, dos últimos anos até hoje
+    agora = datetime.now().replace(minute=0, second=0, microsecond=0)
+    inicio = agora - timedelta(days=365 * args.anos)
+    passo = (agora - inicio) * args.salas / args.reservas
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        db.add_all(models.Sala(id=i, nome=f"sala {i}", capacidade=10, localizacao="bench") for i in range(1, args.salas + 1))
+        db.flush()
+        db.execute(insert(models.Reserva), [
+            {"id_sala": n % args.salas + 1, "id_usuario": 1, "participantes": 1,
+             "data_inicio": inicio + passo * (n // args.salas),
+             "data_final": inicio + passo * (n // args.salas) + timedelta(hours=1)}
+            for n in range(args.reservas)
+        ])
+        db.commit()
+
+    def medir() -> dict:
+        tempos = {}
+        with SessionLocal() as db:
+            indice.limpar()
+            agendas = [indice.agenda(id_sala) for id_sala in range(1, args.salas + 1)]
+            comeco = time.perf_counter()
+            carregar_agendas(db, agendas)
+            tempos["carga das agendas"] = time.perf_counter() - comeco
+            comeco = time.perf_counter()
+            crud.get_all_reservas(db, limit=50, linhas=True)
+            tempos["primeira página de /reservas"] = time.perf_counter() - comeco
+            comeco = time.perf_counter()
+            crud.get_resrevas_by_period(db, agora - timedelta(days=7), agora, linhas=True)
+            tempos["/reservas/intervalo (última semana)"] = time.perf_counter() - comeco
+        return tempos
+
+    antes = medir()
+
+    latencias = []
+    parar = threading.Event()
+
+    def escritor() -> None:
+        n = 0
+        with SessionLocal() as db:
+            while not parar.is_set():
+                data = agora + timedelta(days=1, hours=n)
+                comeco = time.perf_counter()
+                crud.create_reserva(db, schemas.ReservaCreate(
+                    id_sala=n % args.salas + 1, id_usuario=1, participantes=1,
+                    data_inicio=data, data_final=data + timedelta(minutes=30),
+                ))
+                latencias.append(time.perf_counter() - comeco)
+                n += 1
+
+    thread = threading.Thread(target=escritor)
+    thread.start()
+    comeco = time.perf_counter()
+    movidas = arquivamento.arquivar()
+    duracao = time.perf_counter() - comeco
+    parar.set()
+    thread.join()
+
+    depois = medir()
+    latencias.sort()
+    print(f"{args.reservas} reservas em {args.salas} salas ao longo de {args.anos} anos; "
+          f"retenção de {arquivamento.RETENCAO.days} dias")
+    print(f"arquivamento: {movidas} reservas em {duracao:.1f} s "
+          f"(lotes de {arquivamento.TAMANHO_LOTE}, pausa de {arquivamento.PAUSA_SEGUNDOS * 1000:.0f} ms)")
+    print(f"escritor durante o arquivamento: {len(latencias)} reservas, "
+          f"p50 {statistics.median(latencias) * 1000:.1f} ms, p99 {latencias[int(len(latencias) * 0.99) - 1] * 1000:.1f} ms, "
+          f"máx {latencias[-1] * 1000:.1f} ms")
+    for nome in antes:
+        print(f"{nome}: {antes[nome] * 1000:.1f} ms -> {depois[nome] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
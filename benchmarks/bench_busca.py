@@ -0,0 +1,98 @@
+"""
+Compara o filtro ?nome= da listagem de salas com ilike('%nome%') (varredura da
+tabela) e com o índice de trigramas (busca_salas.py), e mede a busca por
+relevância de /salas/busca, com muitas salas.
+
+Simula a caixa de busca: cada termo é consultado a cada tecla ("a", "au",
+"aud", ...), incluindo termos com erro de digitação. Reporta a latência
+(p50/p99) de cada caminho, sem a camada HTTP, o tempo da carga inicial do
+índice e a memória dos bitsets.
+
+Uso: python benchmarks/bench_busca.py [--salas 100000] [--banco sqlite:////tmp/bench_busca.db]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+TIPOS = ["sala", "auditório", "laboratório", "sala de reunião", "estúdio", "sala de treinamento", "biblioteca", "espaço"]
+NOMES = ["azul", "verde", "carvalho", "ipê", "jatobá", "aurora", "horizonte", "atlântico", "pampa", "cerrado",
+         "pantanal", "sertão", "oceano", "montanha", "cristal", "safira", "esmeralda", "rubi", "topázio", "jade"]
+LOCAIS = ["bloco a", "bloco b", "bloco c", "torre norte", "torre sul", "ala leste", "ala oeste", "anexo"]
+TERMOS = ["auditorio safira", "sala de reuniao", "laboratrio", "cristl", "torre norte", "esmeralda 12", "biblioteca"]
+
+
+def percentis(amostras: list) -> str:
+    amostras = sorted(amostras)
+    return (f"p50 {statistics.median(amostras) * 1000:.2f} ms, "
+            f"p99 {amostras[int(len(amostras) * 0.99) - 1] * 1000:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--salas", type=int, default=100_000)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_busca.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    from sqlalchemy import insert, select
+
+    import busca_salas, crud, models
+    from database import SessionLocal, engine
+
+    aleatorio = random.Random(42)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.Sala), [
+            {"id": i, "nome": f"{aleatorio.choice(TIPOS)} {aleatorio.choice(NOMES)} {i}",
+             "capacidade": 10, "localizacao": f"{aleatorio.choice(LOCAIS)} andar {i % 20}"}
+            for i in range(1, args.salas + 1)
+        ])
+        db.commit()
+
+    # Cada termo digitado tecla a tecla
+    digitados = [termo[:n] for termo in TERMOS for n in range(1, len(termo) + 1)]
+    with SessionLocal() as db:
+        comeco = time.perf_counter()
+        busca_salas.indice.carregar(db)
+        carga = time.perf_counter() - comeco
+        estatisticas = busca_salas.indice.estatisticas()
+
+        def medir(funcao) -> list:
+            tempos = []
+            for texto in digitados:
+                comeco = time.perf_counter()
+                funcao(texto)
+                tempos.append(time.perf_counter() - comeco)
+            return tempos
+
+        def ilike(texto: str) -> None:
+            db.execute(
+                select(models.Sala.id, models.Sala.nome, models.Sala.capacidade, models.Sala.localizacao)
+                .where(models.Sala.nome.ilike(f"%{texto}%")).order_by(models.Sala.id).limit(51)
+            ).all()
+
+        varredura = medir(ilike)
+        filtro = medir(lambda texto: crud.get_all_salas(db, nome=texto, limit=50, expand=False, linhas=True))
+        relevancia = medir(lambda texto: crud.buscar_salas(db, texto, limit=20))
+        so_indice = medir(lambda texto: busca_salas.indice.buscar(texto, 20))
+
+        print(f"{args.salas} salas; {len(digitados)} consultas (termos digitados tecla a tecla)")
+        print(f"índice: carga {carga:.2f} s, {estatisticas['trigramas']} trigramas, "
+              f"bitsets {estatisticas['bytes'] / 2 ** 20:.1f} MiB")
+        print(f"?nome= com ilike (varredura):   {percentis(varredura)}")
+        print(f"?nome= com o índice:            {percentis(filtro)}")
+        print(f"/salas/busca (com a leitura):   {percentis(relevancia)}")
+        print(f"/salas/busca (só o índice):     {percentis(so_indice)}")
+        for termo in TERMOS:
+            print(f"  {termo!r}: {[sala['nome'] for sala in crud.buscar_salas(db, termo, limit=3)]}")
+
+
+if __name__ == "__main__":
+    main()
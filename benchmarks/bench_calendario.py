@@ -0,0 +1,94 @@
+"""
+Compara duas formas de montar o calendário semanal de todas as salas:
+
+- intervalo: o que os clientes fazem hoje, /reservas/intervalo da semana
+  (todas as reservas sobrepostas, serializadas) e a conversão de cada reserva
+  em slots, no cliente;
+- calendario: /salas/calendario, que responde com os mapas de bits já
+  materializados nas agendas em memória (mede a primeira chamada, que carrega
+  as agendas, e as seguintes).
+
+Também confere que os mapas das duas formas são iguais.
+
+Uso: python benchmarks/bench_calendario.py [--salas 200] [--reservas 200000]
+     [--repeticoes 10] [--banco sqlite:////tmp/bench_calendario.db]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--salas", type=int, default=200)
+    parser.add_argument("--reservas", type=int, default=200_000)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_calendario.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    import json
+
+    import calendario, crud, serializacao
+    from bench_rotas import INICIO_RESERVAS, semear
+    from database import SessionLocal
+    from indice_reservas import indice
+
+    semear({"usuarios": args.usuarios, "salas": args.salas, "reservas": args.reservas})
+    # Uma semana no meio do período semeado
+    segunda = (INICIO_RESERVAS + timedelta(days=14)).date()
+    segunda -= timedelta(days=segunda.weekday())
+    inicio, final = datetime.combine(segunda, datetime.min.time()), datetime.combine(segunda + timedelta(days=7), datetime.min.time())
+    dias = [segunda + timedelta(days=n) for n in range(7)]
+
+    def intervalo(db) -> dict:
+        corpo = serializacao.dumps(serializacao.reservas(crud.get_resrevas_by_period(db, inicio, final, linhas=True)))
+        # Cliente: converte as reservas em slots por sala e dia
+        mapas = {}
+        for reserva in json.loads(corpo):
+            comeco, fim = datetime.fromisoformat(reserva["data_inicio"]), datetime.fromisoformat(reserva["data_final"])
+            por_dia = mapas.setdefault(reserva["id_sala"], {})
+            for dia in calendario.dias(max(comeco, inicio), min(fim, final)):
+                por_dia[dia] = por_dia.get(dia, 0) | calendario.mascara(comeco, fim, dia)
+        return {sala: [calendario.empacotar(por_dia.get(dia, 0)) for dia in dias] for sala, por_dia in mapas.items()}
+
+    def via_calendario(db) -> dict:
+        corpo = serializacao.dumps(crud.get_calendario(db, segunda, 7))
+        return {sala["id"]: sala["mapas"] for sala in json.loads(corpo)["salas"] if any(m != calendario.empacotar(0) for m in sala["mapas"])}
+
+    with SessionLocal() as db:
+        indice.limpar()
+        comeco = time.perf_counter()
+        frio = via_calendario(db)
+        tempo_frio = time.perf_counter() - comeco
+        if frio != intervalo(db):
+            raise SystemExit("os mapas do calendário diferem dos montados a partir de /reservas/intervalo")
+
+        def medir(funcao) -> float:
+            tempos = []
+            for _ in range(args.repeticoes):
+                comeco = time.perf_counter()
+                funcao(db)
+                tempos.append(time.perf_counter() - comeco)
+            return statistics.median(tempos)
+
+        tempo_intervalo = medir(intervalo)
+        tempo_quente = medir(via_calendario)
+        reservas_semana = len(crud.get_resrevas_by_period(db, inicio, final, linhas=True))
+
+    print(f"{args.salas} salas, {args.reservas} reservas; semana de {segunda} com {reservas_semana} reservas "
+          f"({calendario.SLOT_MINUTOS} min por slot)")
+    print(f"intervalo + slots no cliente: {tempo_intervalo * 1000:8.1f} ms")
+    print(f"calendario (1a chamada):      {tempo_frio * 1000:8.1f} ms  (carrega as agendas)")
+    print(f"calendario (seguintes):       {tempo_quente * 1000:8.1f} ms  ({tempo_intervalo / tempo_quente:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Mede o fan-out do feed de alterações (eventos.canal): N assinantes do fluxo
+SSE, cada um filtrando uma sala (ou nenhuma, com --sem-filtro), recebem as
+reservas criadas por crud.create_reserva.
+
+Para cada reserva criada mede o tempo entre o commit e a entrega do evento a
+todos os assinantes interessados, e confere que a quantidade de consultas SQL
+por criação é a mesma com e sem assinantes (o fan-out não consulta o banco).
+Os assinantes consomem o gerador de eventos.canal.assinar diretamente, no
+event loop, sem a camada HTTP.
+
+Uso: python benchmarks/bench_eventos.py [--assinantes 5000] [--reservas 200]
+     [--salas 20] [--sem-filtro] [--banco sqlite:////tmp/bench_eventos.db]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--assinantes", type=int, default=5000)
+    parser.add_argument("--reservas", type=int, default=200)
+    parser.add_argument("--salas", type=int, default=20)
+    parser.add_argument("--sem-filtro", action="store_true", help="todos os assinantes recebem todos os eventos")
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_eventos.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    from sqlalchemy import event
+
+    import crud, eventos, models, schemas
+    from database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        db.add_all(models.Sala(id=i, nome=f"sala {i}", capacidade=10, localizacao="bench") for i in range(1, args.salas + 1))
+        db.commit()
+
+    consultas = 0
+
+    def contar(*_):
+        nonlocal consultas
+        consultas += 1
+
+    event.listen(engine, "before_cursor_execute", contar)
+
+    def criar(inicio: datetime, quantidade: int) -> list:
+        """
+        Cria as reservas (uma por sala, em rodízio); retorna as consultas por
+        criação e o instante (perf_counter) do fim de cada uma.
+        """
+        nonlocal consultas
+        por_criacao, instantes = [], []
+        with SessionLocal() as db:
+            for n in range(quantidade):
+                antes = consultas
+                data = inicio + timedelta(hours=n)
+                crud.create_reserva(db, schemas.ReservaCreate(
+                    id_sala=n % args.salas + 1, id_usuario=1, participantes=1,
+                    data_inicio=data, data_final=data + timedelta(minutes=30),
+                ))
+                por_criacao.append(consultas - antes)
+                instantes.append(time.perf_counter())
+        return por_criacao, instantes
+
+    sem_assinantes, _ = criar(datetime(2024, 1, 1), args.reservas)
+
+    async def rodar():
+        entregas = [[] for _ in range(args.reservas)]  # instantes de entrega de cada evento
+        prontos = 0
+        primeiro = eventos.canal.seq + 1
+
+        async def assinante(n: int) -> None:
+            nonlocal prontos
+            sala = n % args.salas + 1
+            filtro = eventos.Filtro() if args.sem_filtro else eventos.Filtro(salas=frozenset({sala}))
+            esperados = args.reservas if args.sem_filtro else len(range(n % args.salas, args.reservas, args.salas))
+            fluxo = eventos.canal.assinar(eventos.canal.seq, filtro)
+            await fluxo.__anext__()  # retry
+            prontos += 1
+            recebidos = 0
+            async for quadro in fluxo:
+                if quadro.startswith(b":"):
+                    continue
+                agora = time.perf_counter()
+                for linha in quadro.split(b"\n"):
+                    if linha.startswith(b"id: "):
+                        entregas[int(linha.rsplit(b"-", 1)[1]) - primeiro].append(agora)
+                        recebidos += 1
+                if recebidos >= esperados:
+                    break
+            await fluxo.aclose()
+
+        tarefas = [asyncio.create_task(assinante(n)) for n in range(args.assinantes)]
+        while prontos < args.assinantes:
+            await asyncio.sleep(0.01)
+        inicio = time.perf_counter()
+        com_assinantes, instantes = await asyncio.to_thread(criar, datetime(2025, 1, 1), args.reservas)
+        await asyncio.gather(*tarefas)
+        return com_assinantes, instantes, entregas, time.perf_counter() - inicio
+
+    com_assinantes, instantes, entregas, duracao = asyncio.run(rodar())
+    atrasos = sorted(max(e) - commit for e, commit in zip(entregas, instantes))
+    total_entregas = sum(len(e) for e in entregas)
+
+    print(f"{args.assinantes} assinantes, {args.reservas} reservas em {args.salas} salas"
+          f"{' (sem filtro)' if args.sem_filtro else ''}")
+    print(f"consultas por criação: sem assinantes {statistics.mean(sem_assinantes):.1f}, "
+          f"com assinantes {statistics.mean(com_assinantes):.1f}")
+    print(f"entregas: {total_entregas} em {duracao:.2f} s ({total_entregas / duracao:.0f}/s)")
+    print(f"commit -> último assinante: p50 {atrasos[len(atrasos) // 2] * 1000:.1f} ms, "
+          f"p99 {atrasos[int(len(atrasos) * 0.99) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compara a exclusão de uma sala muito usada pelo ORM (db.delete, que carrega
+todas as reservas e associações da sala na sessão antes de deletar, e deixa
+as reservas órfãs) com a exclusão em conjunto do crud (DELETEs por conjunto
+numa única transação, com as reservas junto). Reporta o tempo e o pico de
+memória alocada (tracemalloc) de cada caminho.
+
+Uso: python benchmarks/bench_exclusao.py [--reservas 50000] [--banco sqlite:////tmp/bench_exclusao.db]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reservas", type=int, default=50_000)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_exclusao.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    from sqlalchemy import func, insert, select
+
+    import crud, models
+    from database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    inicio = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        db.add_all(models.Usuario(id=i, nome=f"usuario {i}", email=f"usuario{i}@exemplo.com") for i in range(1, 101))
+        db.add_all(models.Sala(id=i, nome=f"sala {i}", capacidade=10, localizacao="bench") for i in (1, 2))
+        db.flush()
+        for id_sala in (1, 2):
+            db.execute(insert(models.Reserva), [
+                {"id_sala": id_sala, "id_usuario": n % 100 + 1, "participantes": 1,
+                 "data_inicio": inicio + timedelta(hours=n), "data_final": inicio + timedelta(hours=n, minutes=30)}
+                for n in range(args.reservas)
+            ])
+            db.execute(insert(models.sala_usuario), [{"sala_id": id_sala, "usuario_id": i} for i in range(1, 101)])
+        db.commit()
+
+    def medir(funcao) -> tuple:
+        with SessionLocal() as db:
+            tracemalloc.start()
+            comeco = time.perf_counter()
+            funcao(db)
+            duracao = time.perf_counter() - comeco
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return duracao, pico
+
+    def orm(db) -> None:
+        db.delete(db.get(models.Sala, 1))
+        db.commit()
+
+    resultados = {
+        "db.delete (ORM)": medir(orm),
+        "crud.delete_sala (em conjunto)": medir(lambda db: crud.delete_sala(db, 2)),
+    }
+    with SessionLocal() as db:
+        orfas = db.scalar(select(func.count()).select_from(models.Reserva).where(models.Reserva.id_sala.is_(None)))
+        restantes = db.scalar(select(func.count()).select_from(models.Reserva))
+
+    print(f"sala com {args.reservas} reservas e 100 usuários associados")
+    for nome, (duracao, pico) in resultados.items():
+        print(f"{nome}: {duracao * 1000:.0f} ms, pico de memória {pico / 2 ** 20:.1f} MiB")
+    print(f"reservas órfãs deixadas pelo ORM: {orfas} (reservas restantes: {restantes})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Microbenchmark do índice de reservas por sala (indice_reservas.AgendaSala).
+
+Mede a latência de verificar conflito + inserir uma reserva à medida que o
+histórico de uma única sala cresce até 100 mil reservas, e a da conferência
+no banco que cada reserva gravada faz fora do PostgreSQL
+(crud._conflito_no_banco), comparada com a consulta por intervalo que ela
+substituiu.
+
+Uso: python benchmarks/bench_indice_reservas.py [--total 100000] [--bloco 10000]
+     [--banco sqlite:////tmp/bench_indice_reservas.db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BASE = datetime(2020, 1, 1)
+# Conferências no banco medidas a cada bloco
+CONSULTAS_POR_BLOCO = 500
+
+
+def medir(total: int, bloco: int, embaralhar: bool) -> None:
+    from indice_reservas import AgendaSala
+
+    slots = list(range(total))
+    if embaralhar:
+        random.shuffle(slots)
+
+    agenda = AgendaSala(id_sala=1)
+    agenda.carregada = True
+    ordem = "aleatória" if embaralhar else "cronológica"
+    print(f"\nInserções em ordem {ordem}")
+    print(f"{'reservas na sala':>18} | {'µs/inserção':>12}")
+
+    inicio_bloco = time.perf_counter()
+    for n, slot in enumerate(slots, start=1):
+        inicio = BASE + timedelta(minutes=30 * slot)
+        final = inicio + timedelta(minutes=30)
+        if agenda.conflito(inicio, final) is not None:
+            raise RuntimeError("conflito inesperado")
+        agenda.inserir(n, inicio, final)
+        if n % bloco == 0:
+            decorrido = time.perf_counter() - inicio_bloco
+            print(f"{n:>18} | {decorrido / bloco * 1e6:>12.2f}")
+            inicio_bloco = time.perf_counter()
+
+
+def medir_banco(total: int, bloco: int) -> None:
+    from sqlalchemy import insert, select
+
+    import crud, models
+    from database import SessionLocal, engine
+
+    def por_intervalo(db, id_sala: int, inicio: datetime, final: datetime):
+        # A consulta anterior: lê todas as reservas da sala que começam antes
+        # do fim do período
+        return db.scalar(
+            select(models.Reserva.id)
+            .where(models.Reserva.id_sala == id_sala, models.Reserva.data_inicio < final,
+                   models.Reserva.data_final > inicio)
+            .limit(1)
+        )
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    print(f"\nConferência no banco ({engine.dialect.name}), nova reserva no fim da agenda")
+    print(f"{'reservas na sala':>18} | {'µs última reserva':>18} | {'µs por intervalo':>17}")
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        db.add(models.Sala(id=1, nome="sala 1", capacidade=10, localizacao="bench"))
+        db.commit()
+        for n in range(bloco, total + 1, bloco):
+            db.execute(insert(models.Reserva), [
+                {"id_sala": 1, "id_usuario": 1, "participantes": 1,
+                 "data_inicio": BASE + timedelta(minutes=30 * slot),
+                 "data_final": BASE + timedelta(minutes=30 * slot + 30)}
+                for slot in range(n - bloco, n)
+            ])
+            db.commit()
+            inicio = BASE + timedelta(minutes=30 * n)
+            final = inicio + timedelta(minutes=30)
+            tempos = []
+            for conferir in (crud._conflito_no_banco, por_intervalo):
+                comeco = time.perf_counter()
+                for _ in range(CONSULTAS_POR_BLOCO):
+                    if conferir(db, 1, inicio, final) is not None:
+                        raise RuntimeError("conflito inesperado")
+                tempos.append((time.perf_counter() - comeco) / CONSULTAS_POR_BLOCO * 1e6)
+                db.rollback()
+            print(f"{n:>18} | {tempos[0]:>18.1f} | {tempos[1]:>17.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--total", type=int, default=100_000)
+    parser.add_argument("--bloco", type=int, default=10_000)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_indice_reservas.db")
+    args = parser.parse_args()
+    os.environ.setdefault("CONEXAO_DB", args.banco)
+    medir(args.total, args.bloco, embaralhar=False)
+    medir(args.total, args.bloco, embaralhar=True)
+    medir_banco(args.total, args.bloco)
@@ -0,0 +1,74 @@
+"""
+Compara a importação de N reservas chamando crud.create_reserva em laço com
+uma única chamada a crud.create_reservas_lote.
+
+Uso: python benchmarks/bench_lote.py [--reservas 10000] [--salas 100]
+     [--banco sqlite:////tmp/bench_lote.db]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def gerar(quantidade: int, salas: int, dia: datetime):
+    import schemas
+
+    return [
+        schemas.ReservaCreate(
+            id_sala=1 + n % salas,
+            id_usuario=1,
+            data_inicio=dia + timedelta(hours=n // salas),
+            data_final=dia + timedelta(hours=n // salas, minutes=50),
+            participantes=2,
+        )
+        for n in range(quantidade)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_lote.db")
+    parser.add_argument("--reservas", type=int, default=10_000)
+    parser.add_argument("--salas", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    import crud, models
+    from database import SessionLocal, engine
+    from indice_reservas import indice
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        for id_sala in range(1, args.salas + 1):
+            db.add(models.Sala(id=id_sala, nome=f"sala {id_sala}", capacidade=10, localizacao="bench"))
+        db.commit()
+
+    with SessionLocal() as db:
+        itens = gerar(args.reservas, args.salas, datetime(2025, 1, 1))
+        inicio = time.perf_counter()
+        for item in itens:
+            crud.create_reserva(db, item)
+        laco = time.perf_counter() - inicio
+
+    indice.limpar()
+    with SessionLocal() as db:
+        itens = gerar(args.reservas, args.salas, datetime(2026, 1, 1))
+        inicio = time.perf_counter()
+        resultado = crud.create_reservas_lote(db, itens)
+        lote = time.perf_counter() - inicio
+        assert resultado.criadas == args.reservas, resultado.rejeitadas
+
+    print(f"{args.reservas} reservas em {args.salas} salas")
+    print(f"create_reserva em laço: {laco:8.3f} s ({args.reservas / laco:10.0f} reservas/s)")
+    print(f"create_reservas_lote:   {lote:8.3f} s ({args.reservas / lote:10.0f} reservas/s)")
+    print(f"ganho: {laco / lote:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Suíte de carga das rotas da API.
+
+Semeia um banco (SQLite local por padrão, ou qualquer URL do SQLAlchemy, como
+um Postgres de teste) com volumes configuráveis de usuários, salas e
+reservas, sempre com a mesma semente, e mede cada rota do app de main.py com
+N clientes simultâneos:
+- em processo, via httpx.ASGITransport (--transporte asgi, padrão);
+- por HTTP, com o uvicorn em uma thread do mesmo processo (--transporte http)
+  ou contra um servidor já em execução (--url).
+
+Para cada rota e concorrência, reporta p50/p95/p99 de latência, vazão, erros e
+consultas ao banco por requisição (contadas no engine; indisponível com --url).
+O resultado é gravado em JSON, e --comparar mostra a variação em relação a um
+resultado anterior (ex.: de outro commit).
+
+Uso: python benchmarks/bench_rotas.py [--usuarios 1000] [--salas 200]
+     [--reservas 100000] [--concorrencia 1,10,50] [--requisicoes 500]
+     [--rotas reservas,reservas_intervalo] [--transporte asgi|http]
+     [--url http://localhost:8000] [--banco sqlite:////tmp/bench_rotas.db]
+     [--sem-semear] [--sem-cache] [--saida resultado.json]
+     [--comparar resultado_anterior.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+SEMENTE = 42
+INICIO_RESERVAS = datetime(2025, 1, 6, 8)
+
+
+class Rota:
+    """
+    Uma rota do benchmark: método, caminho e um gerador de requisições
+    (recebe o número da requisição e um random.Random, retorna caminho e corpo).
+    """
+
+    def __init__(self, nome: str, metodo: str, gerar: Callable[[int, random.Random], tuple]):
+        self.nome = nome
+        self.metodo = metodo
+        self.gerar = gerar
+        self.usadas = 0  # requisições já geradas (rotas de escrita não repetem dados)
+
+
+def rotas(volumes: Dict[str, int]) -> Dict[str, Rota]:
+    usuarios, salas, reservas = volumes["usuarios"], volumes["salas"], volumes["reservas"]
+    dias = max(reservas // max(salas, 1) // 8, 1)  # ~8 reservas por sala por dia
+
+    def intervalo(_, aleatorio):
+        inicio = INICIO_RESERVAS + timedelta(days=aleatorio.randrange(dias), hours=aleatorio.randrange(10))
+        return f"/reservas/intervalo?data_inicio={inicio.isoformat()}&data_final={(inicio + timedelta(hours=2)).isoformat()}", None
+
+    def disponiveis(_, aleatorio):
+        inicio = INICIO_RESERVAS + timedelta(days=aleatorio.randrange(dias), hours=aleatorio.randrange(10))
+        return f"/salas/disponiveis?data_inicio={inicio.isoformat()}&data_final={(inicio + timedelta(hours=1)).isoformat()}&capacidade=4", None
+
+    def criar_reserva(n, _):
+        # Horários depois do período semeado, um por requisição: nunca conflitam
+        sala = 1 + n % salas
+        inicio = INICIO_RESERVAS + timedelta(days=dias + 1 + n // salas)
+        corpo = {"id_sala": sala, "id_usuario": 1 + n % usuarios, "data_inicio": inicio.isoformat(),
+                 "data_final": (inicio + timedelta(minutes=30)).isoformat(), "participantes": 1}
+        return "/reservas/", corpo
+
+    return {
+        "usuarios": Rota("usuarios", "GET", lambda n, a: ("/usuarios/?limit=50&expand=false", None)),
+        "usuarios_id": Rota("usuarios_id", "GET", lambda n, a: (f"/usuarios/{a.randint(1, usuarios)}", None)),
+        "salas": Rota("salas", "GET", lambda n, a: ("/salas/?limit=50&expand=false", None)),
+        "salas_id": Rota("salas_id", "GET", lambda n, a: (f"/salas/{a.randint(1, salas)}?expand=false", None)),
+        "salas_disponiveis": Rota("salas_disponiveis", "GET", disponiveis),
+        "reservas": Rota("reservas", "GET", lambda n, a: ("/reservas/?limit=50", None)),
+        "reservas_id": Rota("reservas_id", "GET", lambda n, a: (f"/reservas/{a.randint(1, reservas)}", None)),
+        "reservas_intervalo": Rota("reservas_intervalo", "GET", intervalo),
+        "reservas_criar": Rota("reservas_criar", "POST", criar_reserva),
+    }
+
+
+# ===== banco =====
+
+def semear(volumes: Dict[str, int]) -> None:
+    """
+    Recria as tabelas e insere os volumes pedidos, de forma determinística.
+    As reservas de cada sala são sequenciais (sem sobreposição).
+    """
+    import models
+    from database import SessionLocal, engine
+    from sqlalchemy import insert
+
+    aleatorio = random.Random(SEMENTE)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.Usuario), [
+            {"id": i, "nome": f"usuario {i}", "email": f"usuario{i}@exemplo.com"}
+            for i in range(1, volumes["usuarios"] + 1)
+        ])
+        db.execute(insert(models.Sala), [
+            {"id": i, "nome": f"sala {i}", "capacidade": aleatorio.choice([4, 6, 8, 12, 20]),
+             "localizacao": f"andar {i % 10}"}
+            for i in range(1, volumes["salas"] + 1)
+        ])
+        proximo = {sala: INICIO_RESERVAS for sala in range(1, volumes["salas"] + 1)}
+        lote = []
+        for n in range(volumes["reservas"]):
+            sala = 1 + n % volumes["salas"]
+            inicio = proximo[sala] + timedelta(minutes=aleatorio.choice([0, 0, 15, 30]))
+            final = inicio + timedelta(minutes=aleatorio.choice([30, 45, 60, 90]))
+            proximo[sala] = final
+            if final.hour >= 18:  # continua no dia seguinte às 8h
+                proximo[sala] = final.replace(hour=8, minute=0) + timedelta(days=1)
+            lote.append({"id_sala": sala, "id_usuario": 1 + aleatorio.randrange(volumes["usuarios"]),
+                         "data_inicio": inicio, "data_final": final, "participantes": aleatorio.randint(1, 4)})
+            if len(lote) == 10_000:
+                db.execute(insert(models.Reserva), lote)
+                lote = []
+        if lote:
+            db.execute(insert(models.Reserva), lote)
+        db.commit()
+
+
+class ContadorConsultas:
+    """
+    Conta os comandos SQL executados pelo engine do app.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def instalar(self) -> None:
+        from sqlalchemy import event
+        import database
+
+        def contar(*_):
+            with self._lock:
+                self.total += 1
+
+        event.listen(database.engine, "before_cursor_execute", contar)
+        if getattr(database, "async_engine", None) is not None:
+            event.listen(database.async_engine.sync_engine, "before_cursor_execute", contar)
+
+
+# ===== medição =====
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+async def medir(cliente, rota: Rota, concorrencia: int, requisicoes: int, contador: Optional[ContadorConsultas]) -> dict:
+    aleatorio = random.Random(SEMENTE)
+    pedidos = iter([rota.gerar(rota.usadas + n, aleatorio) for n in range(requisicoes)])
+    rota.usadas += requisicoes
+    latencias: List[float] = []
+    erros = 0
+
+    async def trabalhador() -> None:
+        nonlocal erros
+        for caminho, corpo in pedidos:
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(rota.metodo, caminho, json=corpo)
+                if resposta.status_code >= 400:
+                    erros += 1
+            except Exception:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    consultas_antes = contador.total if contador else 0
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "segundos": round(total, 3),
+        "req_por_segundo": round(len(latencias) / total, 1),
+        "p50_ms": round(percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 0.99) * 1000, 2),
+        "consultas_por_requisicao": round((contador.total - consultas_antes) / len(latencias), 2) if contador else None,
+    }
+
+
+def iniciar_uvicorn(app, porta: int):
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("--transporte http precisa do uvicorn (pip install uvicorn)")
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=servidor.run, daemon=True)
+    thread.start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor, thread
+
+
+async def executar(args, volumes: Dict[str, int]) -> Dict[str, Dict[str, dict]]:
+    import httpx
+
+    selecionadas = rotas(volumes)
+    nomes = args.rotas.split(",") if args.rotas else list(selecionadas)
+    desconhecidas = [nome for nome in nomes if nome not in selecionadas]
+    if desconhecidas:
+        sys.exit(f"rotas desconhecidas: {', '.join(desconhecidas)} (disponíveis: {', '.join(selecionadas)})")
+
+    servidor = None
+    contador = None
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=None, limits=httpx.Limits(max_connections=None))
+    else:
+        from main import app
+        contador = ContadorConsultas()
+        contador.instalar()
+        if args.transporte == "http":
+            servidor, thread = iniciar_uvicorn(app, args.porta)
+            cliente = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.porta}", timeout=None,
+                                        limits=httpx.Limits(max_connections=None))
+        else:
+            cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+    resultados: Dict[str, Dict[str, dict]] = {}
+    async with cliente:
+        for nome in nomes:
+            resultados[nome] = {}
+            for concorrencia in args.concorrencia:
+                resultado = await medir(cliente, selecionadas[nome], concorrencia, args.requisicoes, contador)
+                resultados[nome][str(concorrencia)] = resultado
+                imprimir_linha(nome, concorrencia, resultado)
+
+    if servidor is not None:
+        servidor.should_exit = True
+        thread.join(timeout=10)
+    return resultados
+
+
+# ===== relatório =====
+
+def imprimir_linha(nome: str, concorrencia: int, r: dict, comparacao: str = "") -> None:
+    consultas = "-" if r["consultas_por_requisicao"] is None else r["consultas_por_requisicao"]
+    print(f"{nome:>20} | {concorrencia:>5} | {r['req_por_segundo']:>9} | {r['p50_ms']:>8} | {r['p95_ms']:>8} | "
+          f"{r['p99_ms']:>8} | {consultas:>9} | {r['erros']:>5}{comparacao}", flush=True)
+
+
+def comparar(atual: dict, anterior: dict) -> None:
+    """
+    Mostra a variação de vazão e p99 de cada rota/concorrência presente nos dois resultados.
+    """
+    print(f"\ncomparação com {anterior['meta'].get('commit') or 'resultado anterior'} "
+          f"(variação de req/s e de p99; p99 maior é pior)")
+    comparadas = 0
+    for nome, por_concorrencia in atual["rotas"].items():
+        for concorrencia, r in por_concorrencia.items():
+            antes = anterior["rotas"].get(nome, {}).get(concorrencia)
+            if not antes:
+                continue
+            vazao = (r["req_por_segundo"] / antes["req_por_segundo"] - 1) * 100 if antes["req_por_segundo"] else 0.0
+            p99 = (r["p99_ms"] / antes["p99_ms"] - 1) * 100 if antes["p99_ms"] else 0.0
+            print(f"{nome:>20} | {concorrencia:>5} | req/s {vazao:+7.1f}% | p99 {p99:+7.1f}%")
+            comparadas += 1
+    if not comparadas:
+        print("nenhuma rota/concorrência em comum com o resultado anterior")
+
+
+def commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_rotas.db")
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--salas", type=int, default=200)
+    parser.add_argument("--reservas", type=int, default=100_000)
+    parser.add_argument("--concorrencia", default="1,10,50",
+                        type=lambda valor: [int(c) for c in valor.split(",")])
+    parser.add_argument("--requisicoes", type=int, default=500, help="requisições por rota e concorrência")
+    parser.add_argument("--rotas", help="rotas separadas por vírgula (padrão: todas)")
+    parser.add_argument("--transporte", choices=["asgi", "http"], default="asgi")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--url", help="mede um servidor já em execução (não semeia nem conta consultas)")
+    parser.add_argument("--sem-semear", action="store_true",
+                        help="usa o banco como está, sem recriar e semear (os volumes devem ser os da semeadura)")
+    parser.add_argument("--sem-cache", action="store_true", help="desliga o cache do catálogo (TTL zero)")
+    parser.add_argument("--saida", help="arquivo JSON do resultado (padrão: benchmarks/resultados/<data>_<commit>.json)")
+    parser.add_argument("--comparar", help="resultado JSON anterior para comparação")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    if args.sem_cache:
+        os.environ["CACHE_TTL_SEGUNDOS"] = "0"
+    volumes = {"usuarios": args.usuarios, "salas": args.salas, "reservas": args.reservas}
+
+    if not args.sem_semear and not args.url:
+        inicio = time.perf_counter()
+        semear(volumes)
+        print(f"banco semeado em {time.perf_counter() - inicio:.1f} s: {volumes}")
+
+    print(f"{'rota':>20} | {'conc.':>5} | {'req/s':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'consultas':>9} | erros")
+    resultado = {
+        "meta": {
+            "commit": commit_atual(),
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "banco": args.url or args.banco.split("://")[0],
+            "transporte": "url" if args.url else args.transporte,
+            "volumes": volumes,
+            "concorrencia": args.concorrencia,
+            "requisicoes": args.requisicoes,
+            "cache": not args.sem_cache,
+            "semente": SEMENTE,
+        },
+        "rotas": asyncio.run(executar(args, volumes)),
+    }
+
+    saida = args.saida or os.path.join(
+        os.path.dirname(__file__), "resultados",
+        f"{datetime.now():%Y%m%d_%H%M%S}_{resultado['meta']['commit'] or 'sem_commit'}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nresultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(resultado, json.load(arquivo))
+
+
+if __name__ == "__main__":
+    main()
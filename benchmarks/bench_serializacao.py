@@ -0,0 +1,98 @@
+"""
+Compara o caminho antigo das listagens (objetos ORM validados pelo
+response_model e serializados pelo Pydantic) com o caminho rápido
+(linhas simples + serializacao.dumps) em respostas grandes.
+
+Casos (todos montados a partir do mesmo banco, semeado com bench_rotas.semear):
+- reservas_intervalo: /reservas/intervalo cobrindo todas as reservas (--reservas linhas);
+- reservas_pagina: uma página de /reservas/ com LIMITE_MAXIMO itens;
+- salas_expand: /salas/ com todas as salas e as reservas de cada uma.
+
+Para cada caso mede a consulta + montagem do corpo JSON (sem o HTTP), verifica
+que os dois caminhos geram exatamente os mesmos bytes e reporta respostas por
+segundo e o ganho do caminho rápido.
+
+Uso: python benchmarks/bench_serializacao.py [--reservas 10000] [--salas 50]
+     [--repeticoes 10] [--banco sqlite:////tmp/bench_serializacao.db]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def medir(funcao: Callable[[], bytes], repeticoes: int) -> List[float]:
+    funcao()  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reservas", type=int, default=10_000)
+    parser.add_argument("--salas", type=int, default=50)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_serializacao.db")
+    args = parser.parse_args()
+
+    os.environ["CONEXAO_DB"] = args.banco
+    from pydantic import TypeAdapter
+
+    import crud, schemas, serializacao
+    from bench_rotas import semear
+    from database import SessionLocal
+    from paginacao import LIMITE_MAXIMO
+
+    semear({"usuarios": args.usuarios, "salas": args.salas, "reservas": args.reservas})
+    lista_reservas = TypeAdapter(List[schemas.Reserva])
+    lista_salas = TypeAdapter(List[schemas.Sala])
+    periodo = (datetime(2000, 1, 1), datetime(2100, 1, 1))
+
+    def antes(adaptador: TypeAdapter, objetos) -> bytes:
+        # O que o FastAPI faz com o response_model: valida os objetos ORM e serializa
+        return adaptador.dump_json(adaptador.validate_python(objetos, from_attributes=True))
+
+    with SessionLocal() as db:
+        casos = {
+            "reservas_intervalo": (
+                lambda: antes(lista_reservas, crud.get_resrevas_by_period(db, *periodo)),
+                lambda: serializacao.dumps(serializacao.reservas(crud.get_resrevas_by_period(db, *periodo, linhas=True))),
+            ),
+            "reservas_pagina": (
+                lambda: antes(lista_reservas, crud.get_all_reservas(db, limit=LIMITE_MAXIMO)[0]),
+                lambda: serializacao.dumps(serializacao.reservas(crud.get_all_reservas(db, limit=LIMITE_MAXIMO, linhas=True)[0])),
+            ),
+            "salas_expand": (
+                lambda: antes(lista_salas, crud.get_all_salas(db, limit=LIMITE_MAXIMO)[0]),
+                lambda: serializacao.dumps(crud.get_all_salas(db, limit=LIMITE_MAXIMO, linhas=True)[0]),
+            ),
+        }
+
+        print(f"codificador: {'orjson' if serializacao.orjson else 'json'}; "
+              f"{args.reservas} reservas, {args.salas} salas, {args.repeticoes} repetições")
+        print(f"{'caso':>20} | {'bytes':>9} | {'antes ms':>9} | {'depois ms':>9} | {'antes/s':>8} | {'depois/s':>8} | ganho")
+        for nome, (caminho_antigo, caminho_rapido) in casos.items():
+            corpo = caminho_rapido()
+            if caminho_antigo() != corpo:
+                raise SystemExit(f"{nome}: os dois caminhos geraram respostas diferentes")
+            db.expunge_all()  # o caminho antigo não reaproveita objetos já carregados
+            tempos_antes = medir(lambda: (caminho_antigo(), db.expunge_all()), args.repeticoes)
+            tempos_depois = medir(caminho_rapido, args.repeticoes)
+            mediana_antes, mediana_depois = statistics.median(tempos_antes), statistics.median(tempos_depois)
+            print(f"{nome:>20} | {len(corpo):>9} | {mediana_antes * 1000:>9.1f} | {mediana_depois * 1000:>9.1f} | "
+                  f"{1 / mediana_antes:>8.1f} | {1 / mediana_depois:>8.1f} | {mediana_antes / mediana_depois:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
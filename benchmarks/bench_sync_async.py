@@ -0,0 +1,119 @@
+"""
+Compara a vazão das rotas de leitura nos modos síncrono e assíncrono
+(CONEXAO_DB_ASYNC) com N clientes simultâneos.
+
+Cada modo roda em um processo separado (o modo é lido na importação de
+database.py), contra o mesmo banco SQLite semeado no início, chamando o app
+em processo via httpx.ASGITransport.
+
+Uso: python benchmarks/bench_sync_async.py [--clientes 500] [--requisicoes 5000]
+     [--banco sqlite:////tmp/bench_async.db] [--rota /reservas/?limit=50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+
+def semear(url: str, salas: int, reservas_por_sala: int) -> None:
+    os.environ["CONEXAO_DB"] = url
+    import models
+    from database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(models.Usuario(id=1, nome="bench", email="bench@exemplo.com"))
+        base = datetime(2025, 1, 1, 8)
+        for id_sala in range(1, salas + 1):
+            db.add(models.Sala(id=id_sala, nome=f"sala {id_sala}", capacidade=10, localizacao="bench"))
+            for n in range(reservas_por_sala):
+                inicio = base + timedelta(hours=n)
+                db.add(models.Reserva(id_sala=id_sala, id_usuario=1, data_inicio=inicio,
+                                      data_final=inicio + timedelta(minutes=50), participantes=2))
+        db.commit()
+
+
+async def medir(rota: str, clientes: int, requisicoes: int) -> dict:
+    import httpx
+    from main import app
+
+    latencias = []
+    erros = 0
+    fila = iter(range(requisicoes))
+
+    async def cliente(http: httpx.AsyncClient) -> None:
+        nonlocal erros
+        for _ in fila:
+            inicio = time.perf_counter()
+            resposta = await http.get(rota)
+            # Sem conexão livre dentro do CONEXAO_DB_POOL_TIMEOUT a API responde
+            # 503 (database.get_db): a requisição conta como erro.
+            if resposta.status_code != 200:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as http:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(http) for _ in range(clientes)))
+        total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "segundos": round(total, 3),
+        "req_por_segundo": round(len(latencias) / total, 1),
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 2),
+        "p99_ms": round(latencias[int(len(latencias) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", default="sqlite:////tmp/bench_async.db")
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--rota", default="/reservas/?limit=50")
+    parser.add_argument("--salas", type=int, default=50)
+    parser.add_argument("--reservas-por-sala", type=int, default=200)
+    parser.add_argument("--modo", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        # Processo filho: mede um único modo e imprime o resultado em JSON
+        resultado = asyncio.run(medir(args.rota, args.clientes, args.requisicoes))
+        print(json.dumps(resultado))
+        return
+
+    semear(args.banco, args.salas, args.reservas_por_sala)
+    resultados = {}
+    for modo in ("sync", "async"):
+        env = dict(os.environ, CONEXAO_DB=args.banco, CONEXAO_DB_ASYNC="true" if modo == "async" else "false")
+        # Mede os modos de acesso ao banco, não o controle de admissão (que
+        # recusaria com 503 quase todos os 500 clientes); ADMISSAO_ATIVA=true
+        # no ambiente liga de novo
+        env.setdefault("ADMISSAO_ATIVA", "false")
+        saida = subprocess.run(
+            [sys.executable, __file__, "--modo", modo, "--banco", args.banco, "--rota", args.rota,
+             "--clientes", str(args.clientes), "--requisicoes", str(args.requisicoes)],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        resultados[modo] = json.loads(saida.stdout.strip().splitlines()[-1])
+
+    print(f"rota {args.rota}, {args.clientes} clientes simultâneos")
+    print(f"{'modo':>6} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'erros':>6}")
+    for modo, r in resultados.items():
+        print(f"{modo:>6} | {r['req_por_segundo']:>8} | {r['p50_ms']:>8} | {r['p99_ms']:>8} | {r['erros']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Teste de estresse da criação de reservas com muitos escritores simultâneos.
+
+N escritores disputam POST /reservas/ ao mesmo tempo: parte deles concentrada
+em poucas salas "quentes" (todos querendo os mesmos horários, que se
+sobrepõem) e o restante espalhado pelas demais salas. Os escritores podem ser
+divididos em vários processos (--processos), cada um com o seu app e o seu
+índice em memória, contra o mesmo banco, como vários workers do uvicorn.
+
+Ao final confere no banco que nenhuma sala tem reservas sobrepostas e que
+cada 201 corresponde a uma linha gravada, e reporta a vazão por segundo
+(mínimo/mediana/máximo), latências, conflitos (409) e erros. O tempo é
+contado a partir de quando os escritores começam, depois que os processos
+filhos subiram e importaram o app. Sai com código 1
+se encontrar reserva dupla ou resposta inesperada.
+
+Uso: python benchmarks/stress_reservas.py [--escritores 200] [--tentativas 20]
+     [--salas 20] [--salas-quentes 1] [--fracao-quente 0.5] [--processos 1]
+     [--banco sqlite:////tmp/stress_reservas.db]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, RAIZ)
+
+SEMENTE = 42
+DIA = datetime(2025, 3, 3, 8)
+# Horários disputados: início em múltiplos de 15 min ao longo de 10 h, com
+# durações de 30 a 90 min, então tentativas vizinhas quase sempre se sobrepõem.
+PASSOS_INICIO = 40
+DURACOES = (30, 45, 60, 90)
+
+
+def semear(url: str, salas: int, usuarios: int) -> None:
+    os.environ["CONEXAO_DB"] = url
+    import models
+    from database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add_all(models.Usuario(id=i, nome=f"usuario {i}", email=f"usuario{i}@exemplo.com") for i in range(1, usuarios + 1))
+        db.add_all(models.Sala(id=i, nome=f"sala {i}", capacidade=10, localizacao="estresse") for i in range(1, salas + 1))
+        db.commit()
+
+
+async def escrever(escritores: range, tentativas: int, salas: int, salas_quentes: int,
+                   fracao_quente: float, usuarios: int) -> dict:
+    """
+    Roda os escritores deste processo; retorna contagens, latências, os
+    instantes (time.time) em que os escritores começaram e terminaram e em
+    que cada reserva foi criada.
+    """
+    import httpx
+    from main import app
+
+    status = Counter()
+    latencias = []
+    criadas_em = []
+    inesperadas = []
+
+    async def escritor(n: int, http: httpx.AsyncClient) -> None:
+        aleatorio = random.Random(SEMENTE + n)
+        for _ in range(tentativas):
+            if aleatorio.random() < fracao_quente:
+                sala = aleatorio.randint(1, salas_quentes)
+            else:
+                sala = aleatorio.randint(salas_quentes + 1, salas)
+            inicio = DIA + timedelta(minutes=15 * aleatorio.randrange(PASSOS_INICIO))
+            corpo = {
+                "id_sala": sala, "id_usuario": aleatorio.randint(1, usuarios), "participantes": 2,
+                "data_inicio": inicio.isoformat(),
+                "data_final": (inicio + timedelta(minutes=aleatorio.choice(DURACOES))).isoformat(),
+            }
+            comeco = time.perf_counter()
+            resposta = await http.post("/reservas/", json=corpo)
+            latencias.append(time.perf_counter() - comeco)
+            status[resposta.status_code] += 1
+            if resposta.status_code == 201:
+                criadas_em.append(time.time())
+            elif resposta.status_code != 409 and len(inesperadas) < 5:
+                inesperadas.append(f"{resposta.status_code}: {resposta.text[:200]}")
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://estresse", timeout=None) as http:
+        inicio = time.time()
+        await asyncio.gather(*(escritor(n, http) for n in escritores))
+        fim = time.time()
+    return {"status": dict(status), "latencias": latencias, "criadas_em": criadas_em, "inesperadas": inesperadas,
+            "inicio": inicio, "fim": fim}
+
+
+def verificar(url: str) -> dict:
+    """
+    Procura reservas sobrepostas na mesma sala, direto no banco.
+    """
+    os.environ["CONEXAO_DB"] = url
+    import models
+    from database import SessionLocal
+    from sqlalchemy import select
+
+    duplas = []
+    total = 0
+    with SessionLocal() as db:
+        linhas = db.execute(
+            select(models.Reserva.id_sala, models.Reserva.data_inicio, models.Reserva.data_final, models.Reserva.id)
+            .order_by(models.Reserva.id_sala, models.Reserva.data_inicio)
+        ).all()
+    anterior = None
+    for linha in linhas:
+        total += 1
+        if anterior is not None and anterior.id_sala == linha.id_sala and anterior.data_final > linha.data_inicio:
+            duplas.append((anterior.id, linha.id))
+        if anterior is None or anterior.id_sala != linha.id_sala or linha.data_final > anterior.data_final:
+            anterior = linha
+    return {"reservas": total, "sobrepostas": duplas}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", default="sqlite:////tmp/stress_reservas.db")
+    parser.add_argument("--escritores", type=int, default=200)
+    parser.add_argument("--tentativas", type=int, default=20, help="reservas tentadas por escritor")
+    parser.add_argument("--salas", type=int, default=20)
+    parser.add_argument("--salas-quentes", type=int, default=1)
+    parser.add_argument("--fracao-quente", type=float, default=0.5, help="fração das tentativas nas salas quentes")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--processos", type=int, default=1)
+    parser.add_argument("--faixa", help=argparse.SUPPRESS)  # processo filho: "inicio:fim" dos escritores
+    args = parser.parse_args()
+
+    if args.faixa:
+        inicio, fim = map(int, args.faixa.split(":"))
+        resultado = asyncio.run(escrever(range(inicio, fim), args.tentativas, args.salas, args.salas_quentes,
+                                         args.fracao_quente, args.usuarios))
+        print(json.dumps(resultado))
+        return
+
+    semear(args.banco, args.salas, args.usuarios)
+    por_processo = -(-args.escritores // args.processos)
+    filhos = []
+    for p in range(args.processos):
+        faixa = f"{p * por_processo}:{min((p + 1) * por_processo, args.escritores)}"
+        filhos.append(subprocess.Popen(
+            [sys.executable, __file__, "--faixa", faixa, "--banco", args.banco, "--tentativas", str(args.tentativas),
+             "--salas", str(args.salas), "--salas-quentes", str(args.salas_quentes),
+             "--fracao-quente", str(args.fracao_quente), "--usuarios", str(args.usuarios)],
+            env=dict(os.environ, CONEXAO_DB=args.banco), stdout=subprocess.PIPE, text=True,
+        ))
+    resultados = [json.loads(filho.communicate()[0].strip().splitlines()[-1]) for filho in filhos]
+    # Do primeiro escritor a começar ao último a terminar: sem a subida dos
+    # processos e a importação do app
+    comeco = min(r["inicio"] for r in resultados)
+    duracao = max(r["fim"] for r in resultados) - comeco
+
+    status = Counter()
+    latencias, criadas_em, inesperadas = [], [], []
+    for r in resultados:
+        status.update({int(k): v for k, v in r["status"].items()})
+        latencias += r["latencias"]
+        criadas_em += r["criadas_em"]
+        inesperadas += r["inesperadas"]
+    verificacao = verificar(args.banco)
+
+    latencias.sort()
+    tentativas = sum(status.values())
+    # Reservas criadas em cada segundo de execução; o último, incompleto, é
+    # proporcional à fração do segundo que durou
+    por_segundo = Counter(int(t - comeco) for t in criadas_em)
+    segundos = [por_segundo.get(s, 0) / min(1.0, duracao - s) for s in range(math.ceil(duracao))] or [0]
+
+    print(f"{args.escritores} escritores em {args.processos} processo(s), {args.tentativas} tentativas cada, "
+          f"{args.salas} salas ({args.salas_quentes} quente(s), {args.fracao_quente:.0%} das tentativas)")
+    print(f"tentativas: {tentativas} em {duracao:.1f} s ({tentativas / duracao:.0f}/s); "
+          f"criadas (201): {status[201]}; conflitos (409): {status[409]}; "
+          f"outras: {tentativas - status[201] - status[409]}")
+    print(f"latência: p50 {latencias[len(latencias) // 2] * 1000:.1f} ms, "
+          f"p99 {latencias[int(len(latencias) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"reservas criadas por segundo: mín {min(segundos):.0f}, mediana {statistics.median(segundos):.0f}, "
+          f"máx {max(segundos):.0f}")
+    print(f"no banco: {verificacao['reservas']} reservas, {len(verificacao['sobrepostas'])} sobrepostas")
+    for mensagem in inesperadas:
+        print(f"  resposta inesperada: {mensagem}")
+
+    if verificacao["sobrepostas"] or verificacao["reservas"] != status[201] or inesperadas:
+        if verificacao["sobrepostas"]:
+            print(f"reservas duplas (ids): {verificacao['sobrepostas'][:10]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+from cache import TTL_SEGUNDOS
+
+# Índice em memória de trigramas dos nomes e localizações das salas, para a
+# caixa de busca (/salas/busca) e o filtro ?nome= da listagem, que com
+# ilike('%nome%') varria a tabela inteira a cada tecla.
+# Cada sala ocupa uma posição (slot), na ordem dos IDs, e cada trigrama guarda
+# o conjunto das salas que o contêm como um bitset (um int do Python: bit i =
+# slot i). Interseções e contagens são operações sobre os ints inteiros, sem
+# percorrer as salas uma a uma.
+# Os textos são normalizados (minúsculas, sem acentos e pontuação) e cada
+# palavra é completada com dois espaços antes e um depois, como no pg_trgm:
+# "sala" -> "  s", " sa", "sal", "ala", "la ". Na busca a última palavra fica
+# sem o espaço final, então casa com qualquer palavra que comece com ela.
+# A relevância é a fração dos trigramas da busca que a sala contém; com
+# LIMIAR abaixo de 1 os erros de digitação ainda encontram a sala.
+# Numa busca curta um erro derruba quase todos os trigramas ("sla" tem só
+# "  s" em comum com "sala"), então as salas abaixo do LIMIAR com ao menos um
+# trigrama também entram, se cada palavra da busca estiver a no máximo
+# TOLERANCIA letras (inserção, remoção, troca ou transposição) de uma palavra
+# da sala. Elas vêm depois das que passam do LIMIAR, e no máximo CONFERIDAS
+# salas são conferidas assim por busca.
+# O índice é carregado sob demanda e atualizado pelo crud a cada sala criada ou
+# removida. Obs.: como o índice de reservas, vive no processo; a cada
+# VERIFICACAO_SEGUNDOS ele é conferido com a tabela (quantidade e maior ID) e
+# recarregado se outro processo a alterou.
+
+# Fração mínima dos trigramas da busca que uma sala precisa conter
+LIMIAR = float(os.getenv("BUSCA_LIMIAR", "0.4"))
+# Erros de digitação aceitos por palavra abaixo do LIMIAR: 1 até
+# PALAVRA_CURTA letras, 2 nas mais longas
+TOLERANCIA = 1
+PALAVRA_CURTA = 5
+# Salas avaliadas na ordenação final (as de maior cobertura; nos empates, as de menor ID)
+CANDIDATOS = 200
+# Salas abaixo do LIMIAR conferidas com _parecida em cada busca
+CONFERIDAS = 10 * CANDIDATOS
+VERIFICACAO_SEGUNDOS = TTL_SEGUNDOS
+
+_SEPARADORES = re.compile(r"[\W_]+")
+
+
+class _SemAcento(dict):
+    """
+    Tabela para str.translate: cada caractere sem os acentos (NFKD sem as
+    marcas combinantes), calculado na primeira vez em que aparece.
+    """
+
+    def __missing__(self, codigo: int) -> str:
+        letra = "".join(c for c in unicodedata.normalize("NFKD", chr(codigo)) if not unicodedata.combining(c))
+        self[codigo] = letra
+        return letra
+
+
+_SEM_ACENTO = _SemAcento()
+
+
+def normalizar(texto: str) -> str:
+    """
+    Minúsculas, sem acentos e com pontuação e espaços repetidos trocados por um espaço.
+    """
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = texto.translate(_SEM_ACENTO)
+    return _SEPARADORES.sub(" ", texto).strip()
+
+
+@lru_cache(maxsize=65536)
+def _trigramas_palavra(palavra: str) -> FrozenSet[str]:
+    return frozenset(palavra[i:i + 3] for i in range(len(palavra) - 2))
+
+
+def trigramas(texto: str, prefixo: bool = False) -> Set[str]:
+    """
+    Trigramas das palavras de um texto já normalizado.
+    Com prefixo=True a última palavra fica sem o espaço final.
+    """
+    palavras = texto.split()
+    resultado = set()
+    for n, palavra in enumerate(palavras):
+        resultado |= _trigramas_palavra("  " + palavra if prefixo and n == len(palavras) - 1 else "  " + palavra + " ")
+    return resultado
+
+
+def _distancia(a: str, b: str) -> int:
+    """
+    Distância de edição entre dois textos: inserções, remoções, trocas e
+    transposições de letras vizinhas (Damerau-Levenshtein restrita).
+    """
+    anterior, linha = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        atual = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            atual[j] = min(linha[j] + 1, atual[j - 1] + 1, linha[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                atual[j] = min(atual[j], anterior[j - 2] + 1)
+        anterior, linha = linha, atual
+    return linha[-1]
+
+
+def _parecida(palavras: List[str], texto: str, memo: Dict[str, int]) -> bool:
+    """
+    Se cada palavra da busca está a no máximo a tolerância de uma palavra do
+    texto; a última palavra da busca é comparada com o começo das palavras.
+    memo guarda, por palavra do texto, o bitset das palavras da busca que ela
+    satisfaz (as palavras das salas se repetem muito).
+    """
+    todas = (1 << len(palavras)) - 1
+    satisfeitas = 0
+    for alvo in texto.split():
+        if alvo not in memo:
+            bits = 0
+            for n, palavra in enumerate(palavras):
+                tolerancia = TOLERANCIA if len(palavra) <= PALAVRA_CURTA else TOLERANCIA + 1
+                if n == len(palavras) - 1:
+                    tamanhos = range(max(1, len(palavra) - tolerancia), len(palavra) + tolerancia + 1)
+                    perto = any(_distancia(palavra, alvo[:k]) <= tolerancia for k in tamanhos)
+                else:
+                    perto = _distancia(palavra, alvo) <= tolerancia
+                if perto:
+                    bits |= 1 << n
+            memo[alvo] = bits
+        satisfeitas |= memo[alvo]
+        if satisfeitas == todas:
+            return True
+    return False
+
+
+def _slots(mascara: int) -> Iterator[int]:
+    """
+    Posições dos bits ligados, da menor para a maior.
+    """
+    bits = bin(mascara)[:1:-1]  # bit 0 primeiro
+    slot = bits.find("1")
+    while slot >= 0:
+        yield slot
+        slot = bits.find("1", slot + 1)
+
+
+def _contar(bitsets: Iterable[int]) -> List[int]:
+    """
+    Soma os bitsets bit a bit: retorna a contagem de cada slot em fatias
+    (fatia i = bit i da contagem), como num somador.
+    """
+    fatias: List[int] = []
+    for vai_um in bitsets:
+        for i, fatia in enumerate(fatias):
+            fatias[i] = fatia ^ vai_um
+            vai_um &= fatia
+            if not vai_um:
+                break
+        else:
+            if vai_um:
+                fatias.append(vai_um)
+    return fatias
+
+
+def _igual(fatias: List[int], contagem: int, universo: int) -> int:
+    """
+    Slots do universo cuja contagem (em fatias, de _contar) é igual a contagem.
+    """
+    if contagem >> len(fatias):
+        return 0
+    mascara = universo
+    for i, fatia in enumerate(fatias):
+        mascara &= fatia if contagem >> i & 1 else ~fatia
+    return mascara
+
+
+def _bitsets(posicoes: Dict[str, List[int]], quantidade: int) -> Dict[str, int]:
+    """
+    Bitset de cada trigrama a partir dos seus slots. Montado como texto
+    binário (um byte por slot) e convertido de uma vez, em vez de um | por
+    sala, que copiaria o int inteiro a cada bit.
+    """
+    bits = {}
+    for trigrama, slots in posicoes.items():
+        binario = bytearray(b"0") * quantidade
+        for slot in slots:
+            binario[slot] = 49  # "1"
+        bits[trigrama] = int(binario[::-1], 2)
+    return bits
+
+
+def _incluir(bits: Dict[str, int], trigramas_texto: Iterable[str], bit: int) -> None:
+    for trigrama in trigramas_texto:
+        bits[trigrama] = bits.get(trigrama, 0) | bit
+
+
+def _retirar(bits: Dict[str, int], trigramas_texto: Iterable[str], bit: int) -> None:
+    for trigrama in trigramas_texto:
+        restantes = bits[trigrama] & ~bit
+        if restantes:
+            bits[trigrama] = restantes
+        else:
+            del bits[trigrama]
+
+
+class IndiceBusca:
+    """
+    Trigramas de nome e localização de todas as salas, em bitsets separados:
+    o filtro por nome só olha os nomes; a busca soma os dois.
+    """
+
+    def __init__(self):
+        self._bits_nome: Dict[str, int] = {}  # trigrama -> bitset dos slots
+        self._bits_local: Dict[str, int] = {}
+        self._ids: List[int] = []  # slot -> ID da sala (crescente)
+        self._nomes: List[Optional[str]] = []  # slot -> nome normalizado (None: removida)
+        self._locais: List[Optional[str]] = []
+        self._slots: Dict[int, int] = {}  # ID -> slot
+        self._vivas = 0  # bitset das salas não removidas
+        self.carregado = False
+        self.verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def carregar(self, db: Session) -> None:
+        """
+        Carrega o índice a partir da tabela de salas se ainda não estiver
+        carregado, ou confere se a tabela mudou desde a última conferência:
+        salas novas (ID maior que o último) são incluídas; qualquer outra
+        diferença recarrega o índice inteiro.
+        """
+        agora = time.monotonic()
+        if self.carregado and agora - self.verificado_em < VERIFICACAO_SEGUNDOS:
+            return
+        consulta = select(models.Sala.id, models.Sala.nome, models.Sala.localizacao).order_by(models.Sala.id)
+        if self.carregado:
+            ultimo_id = self._ids[-1] if self._ids else 0
+            quantidade, maior_id = db.execute(select(func.count(), func.max(models.Sala.id))).one()
+            novas = db.execute(consulta.where(models.Sala.id > ultimo_id)).all() if (maior_id or 0) > ultimo_id else []
+            if quantidade == len(self._slots) + len(novas) and (novas or maior_id == self._maior_id()):
+                for linha in novas:
+                    self.adicionar(*linha)
+                self.verificado_em = agora
+                return
+        self.preencher(db.execute(consulta).all())
+        self.verificado_em = agora
+
+    def preencher(self, linhas: List[Tuple[int, str, str]]) -> None:
+        """
+        Reconstrói o índice com as salas (id, nome, localizacao), em ordem de ID.
+        """
+        nomes, locais = [], []
+        # Slots de cada palavra: as palavras se repetem muito entre as salas,
+        # então os trigramas são extraídos uma vez por palavra distinta.
+        palavras_nome: Dict[str, List[int]] = {}
+        palavras_local: Dict[str, List[int]] = {}
+        for slot, (_, nome, localizacao) in enumerate(linhas):
+            nome, localizacao = normalizar(nome), normalizar(localizacao)
+            nomes.append(nome)
+            locais.append(localizacao)
+            for palavra in nome.split():
+                palavras_nome.setdefault(palavra, []).append(slot)
+            for palavra in localizacao.split():
+                palavras_local.setdefault(palavra, []).append(slot)
+        posicoes_nome: Dict[str, List[int]] = {}
+        posicoes_local: Dict[str, List[int]] = {}
+        for palavras, posicoes in ((palavras_nome, posicoes_nome), (palavras_local, posicoes_local)):
+            for palavra, slots in palavras.items():
+                for trigrama in _trigramas_palavra("  " + palavra + " "):
+                    posicoes.setdefault(trigrama, []).extend(slots)
+        bits_nome = _bitsets(posicoes_nome, len(linhas))
+        bits_local = _bitsets(posicoes_local, len(linhas))
+        with self._lock:
+            self._bits_nome, self._bits_local = bits_nome, bits_local
+            self._ids = [linha[0] for linha in linhas]
+            self._nomes, self._locais = nomes, locais
+            self._slots = {id_sala: slot for slot, id_sala in enumerate(self._ids)}
+            self._vivas = (1 << len(linhas)) - 1
+            self.carregado = True
+
+    def adicionar(self, id_sala: int, nome: str, localizacao: str) -> None:
+        """
+        Inclui uma sala recém-criada. Um ID fora de ordem (menor que o último)
+        faz o índice ser recarregado na próxima consulta.
+        """
+        with self._lock:
+            if not self.carregado:
+                return
+            if self._ids and id_sala <= self._ids[-1]:
+                self.carregado = False
+                return
+            slot = len(self._ids)
+            nome, localizacao = normalizar(nome), normalizar(localizacao)
+            self._ids.append(id_sala)
+            self._nomes.append(nome)
+            self._locais.append(localizacao)
+            self._slots[id_sala] = slot
+            bit = 1 << slot
+            _incluir(self._bits_nome, trigramas(nome), bit)
+            _incluir(self._bits_local, trigramas(localizacao), bit)
+            self._vivas |= bit
+
+    def remover(self, id_sala: int) -> None:
+        with self._lock:
+            slot = self._slots.pop(id_sala, None)
+            if slot is None:
+                return
+            bit = 1 << slot
+            _retirar(self._bits_nome, trigramas(self._nomes[slot]), bit)
+            _retirar(self._bits_local, trigramas(self._locais[slot]), bit)
+            self._vivas &= ~bit
+            self._nomes[slot] = self._locais[slot] = None
+            # Muitos slots vazios: recarrega (e compacta) na próxima consulta
+            if len(self._ids) > 2 * len(self._slots) + 1024:
+                self.carregado = False
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            bitsets = list(self._bits_nome.values()) + list(self._bits_local.values())
+            return {
+                "salas": len(self._slots),
+                "slots": len(self._ids),
+                "trigramas": len(bitsets),
+                "bytes": sum(bits.__sizeof__() for bits in bitsets),
+            }
+
+    def _maior_id(self) -> Optional[int]:
+        for slot in range(len(self._ids) - 1, -1, -1):
+            if self._nomes[slot] is not None:
+                return self._ids[slot]
+        return None
+
+    def buscar(self, texto: str, limite: int) -> List[Tuple[int, float]]:
+        """
+        Salas mais parecidas com o texto, como (id, pontuação), da mais
+        relevante para a menos. A pontuação é a fração dos trigramas da busca
+        que a sala contém (no nome ou na localização); nos empates vêm primeiro
+        as salas cujo nome começa com o texto, depois as que o contêm, e as de
+        nome mais curto. Abaixo do LIMIAR só entram as salas a poucos erros de
+        digitação da busca (_parecida).
+        """
+        consulta = normalizar(texto)
+        busca = trigramas(consulta, prefixo=True)
+        if not busca:
+            return []
+        minimo = max(1, math.ceil(len(busca) * LIMIAR))
+        with self._lock:
+            fatias = _contar(
+                self._bits_nome.get(trigrama, 0) | self._bits_local.get(trigrama, 0) for trigrama in busca
+            )
+            candidatos = []
+            palavras, memo, conferidas = consulta.split(), {}, 0
+            for contagem in range(len(busca), 0, -1):
+                for slot in _slots(_igual(fatias, contagem, self._vivas)):
+                    if contagem < minimo:
+                        conferidas += 1
+                        if conferidas > CONFERIDAS:
+                            break
+                        if not _parecida(palavras, f"{self._nomes[slot]} {self._locais[slot]}", memo):
+                            continue
+                    candidatos.append((contagem, slot))
+                    if len(candidatos) == CANDIDATOS:
+                        break
+                if len(candidatos) == CANDIDATOS or conferidas > CONFERIDAS:
+                    break
+            ordem = []
+            for contagem, slot in candidatos:
+                nome = self._nomes[slot]
+                ordem.append((-contagem, not nome.startswith(consulta), consulta not in nome, len(nome), self._ids[slot]))
+        ordem.sort()
+        return [(id_sala, round(-negativo / len(busca), 3)) for negativo, *_, id_sala in ordem[:limite]]
+
+    def contendo(self, texto: str, depois_de: Optional[int], quantidade: int) -> Optional[List[int]]:
+        """
+        IDs, em ordem, das primeiras salas com ID maior que depois_de cujo nome
+        contém o texto (sem diferenciar maiúsculas nem acentos).
+        Retorna None se o texto não tiver letras nem números.
+        """
+        consulta = normalizar(texto)
+        if not consulta:
+            return None
+        palavras = [palavra for palavra in consulta.split() if len(palavra) >= 3]
+        with self._lock:
+            inicio = bisect_right(self._ids, depois_de) if depois_de is not None else 0
+            if palavras:
+                # Todo trigrama interno das palavras da busca está no nome
+                mascara = self._vivas
+                for palavra in palavras:
+                    for trigrama in _trigramas_palavra(palavra):
+                        mascara &= self._bits_nome.get(trigrama, 0)
+                slots = (inicio + slot for slot in _slots(mascara >> inicio))
+            else:
+                slots = iter(range(inicio, len(self._ids)))
+            ids = []
+            for slot in slots:
+                nome = self._nomes[slot]
+                if nome is not None and consulta in nome:
+                    ids.append(self._ids[slot])
+                    if len(ids) == quantidade:
+                        break
+        return ids
+
+
+indice = IndiceBusca()
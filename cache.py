@@ -0,0 +1,207 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+import serializacao
+
+# Cache em memória (LRU com TTL) das respostas de leitura do catálogo de salas
+# e usuários, que mudam poucas vezes por dia e são lidas o tempo todo.
+# O crud invalida as entradas a cada escrita; o TTL limita por quanto tempo
+# outro processo (outro worker) pode servir uma resposta desatualizada.
+# As respostas levam ETag e Last-Modified, e GETs condicionais que batem com o
+# cache recebem 304 sem consultar o banco.
+
+TAMANHO_MAXIMO = int(os.getenv("CACHE_TAMANHO_MAXIMO", "1000"))
+TTL_SEGUNDOS = float(os.getenv("CACHE_TTL_SEGUNDOS", "60"))
+
+Chave = Tuple[Hashable, ...]  # o primeiro elemento é o namespace ("salas", "usuarios")
+
+
+class CacheTTL:
+    """
+    Dicionário LRU com expiração por tempo, seguro para uso entre threads.
+    """
+
+    def __init__(self, tamanho_maximo: int, ttl_segundos: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def definir(self, chave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self.despejos += 1
+
+    def remover_namespace(self, namespace: str) -> None:
+        with self._lock:
+            for chave in [c for c in self._itens if c[0] == namespace]:
+                del self._itens[chave]
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "itens": len(self._itens),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "despejos": self.despejos,
+        }
+
+
+class RespostaCache:
+    """
+    Corpo JSON já serializado de uma resposta, com seus validadores HTTP.
+    """
+
+    def __init__(self, corpo: bytes, modificado_em: datetime, cabecalhos: Optional[Dict[str, str]] = None):
+        self.corpo = corpo
+        self.etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+        self.modificado_em = modificado_em
+        self.cabecalhos = cabecalhos or {}
+
+    def validadores(self) -> Dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.modificado_em, usegmt=True),
+            "Cache-Control": "no-cache",  # o cliente pode guardar, mas deve revalidar
+        }
+
+
+class CacheCatalogo:
+    """
+    Cache de respostas por namespace, com controle de versão para não gravar
+    uma resposta montada antes de uma invalidação concorrente.
+    """
+
+    NAMESPACES = ("salas", "usuarios")
+
+    def __init__(self, tamanho_maximo: int = TAMANHO_MAXIMO, ttl_segundos: float = TTL_SEGUNDOS):
+        self._cache = CacheTTL(tamanho_maximo, ttl_segundos)
+        self._lock = threading.Lock()
+        agora = datetime.now(timezone.utc).replace(microsecond=0)
+        self._modificado_em = {namespace: agora for namespace in self.NAMESPACES}
+        self._geracao = {namespace: 0 for namespace in self.NAMESPACES}
+        self.respostas_304 = 0
+
+    def geracao(self, namespace: str) -> int:
+        return self._geracao[namespace]
+
+    def invalidar(self, *namespaces: str) -> None:
+        """
+        Descarta as respostas dos namespaces informados (todos, se nenhum for informado).
+        """
+        agora = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            for namespace in namespaces or self.NAMESPACES:
+                self._geracao[namespace] += 1
+                self._modificado_em[namespace] = agora
+                self._cache.remover_namespace(namespace)
+
+    def responder_do_cache(self, request: Request, chave: Chave) -> Optional[Response]:
+        """
+        Retorna a resposta em cache (ou 304, para um GET condicional válido),
+        ou None se a chave não estiver em cache.
+        """
+        entrada = self._cache.obter(chave)
+        if entrada is None:
+            return None
+        if self._nao_modificado(request, entrada):
+            self.respostas_304 += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=entrada.validadores())
+        return self._resposta(entrada)
+
+    def armazenar(self, chave: Chave, geracao: int, dados: Any, cabecalhos: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Serializa os dados, guarda no cache e retorna a resposta.
+        geracao é o valor de geracao(namespace) lido antes de consultar o banco.
+        """
+        return self._resposta(self._guardar(chave, geracao, dados, cabecalhos))
+
+    def responder_lote(self, namespace: str, ids: List[int], expand: bool,
+                       buscar: Callable[[List[int]], List[Optional[Any]]]) -> Response:
+        """
+        Resposta de uma busca por vários IDs: {namespace: [itens na ordem dos
+        IDs], "nao_encontrados": [IDs]}.
+        Os itens já em cache (as mesmas entradas de GET /{namespace}/{id}) são
+        reaproveitados; os demais vêm de buscar(ids_faltando), numa única
+        consulta, e entram no cache.
+        """
+        geracao = self.geracao(namespace)
+        corpos: Dict[int, Optional[bytes]] = {}
+        for id_item in ids:
+            entrada = self._cache.obter((namespace, "item", id_item, expand))
+            corpos[id_item] = entrada.corpo if entrada is not None else None
+        faltando = [id_item for id_item, corpo in corpos.items() if corpo is None]
+        if faltando:
+            for id_item, dados in zip(faltando, buscar(faltando)):
+                if dados is not None:
+                    corpos[id_item] = self._guardar((namespace, "item", id_item, expand), geracao, dados).corpo
+        nao_encontrados = [id_item for id_item, corpo in corpos.items() if corpo is None]
+        corpo = b'{"%s":[%s],"nao_encontrados":%s}' % (
+            namespace.encode(), b",".join(corpo for corpo in corpos.values() if corpo is not None),
+            serializacao.dumps(nao_encontrados),
+        )
+        return Response(content=corpo, media_type="application/json")
+
+    def _guardar(self, chave: Chave, geracao: int, dados: Any, cabecalhos: Optional[Dict[str, str]] = None) -> RespostaCache:
+        namespace = chave[0]
+        corpo = serializacao.dumps(dados)
+        entrada = RespostaCache(corpo, self._modificado_em[namespace], cabecalhos)
+        with self._lock:
+            if self._geracao[namespace] == geracao:
+                self._cache.definir(chave, entrada)
+        return entrada
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {**self._cache.estatisticas(), "respostas_304": self.respostas_304}
+
+    @staticmethod
+    def _nao_modificado(request: Request, entrada: RespostaCache) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return entrada.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return entrada.modificado_em <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _resposta(entrada: RespostaCache) -> Response:
+        return Response(
+            content=entrada.corpo,
+            media_type="application/json",
+            headers={**entrada.validadores(), **entrada.cabecalhos},
+        )
+
+
+catalogo = CacheCatalogo()
@@ -0,0 +1,59 @@
+import base64
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterator
+
+# Mapas de ocupação das salas por dia, para as visões de calendário.
+# Cada dia de uma sala vira um bitmap de SLOTS_DIA slots de SLOT_MINUTOS
+# minutos, guardado num int: o bit i corresponde ao slot que começa
+# i * SLOT_MINUTOS minutos depois da meia-noite e vale 1 se alguma reserva (ou
+# ocorrência de série) ocupa qualquer parte dele.
+# Os mapas são materializados em memória, na agenda de cada sala
+# (indice_reservas.AgendaSala): calculados na primeira consulta ao dia e
+# mantidos a cada reserva criada ou removida. Num período alinhado aos slots,
+# a sala está livre se (mapa & mascara(...)) == 0 em cada dia.
+
+SLOT_MINUTOS = int(os.getenv("CALENDARIO_SLOT_MINUTOS", "15"))
+if SLOT_MINUTOS <= 0 or (24 * 60) % SLOT_MINUTOS:
+    raise ValueError("CALENDARIO_SLOT_MINUTOS deve dividir o dia (1440 minutos) em partes inteiras.")
+
+SLOT = timedelta(minutes=SLOT_MINUTOS)
+SLOTS_DIA = 24 * 60 // SLOT_MINUTOS
+BYTES_DIA = (SLOTS_DIA + 7) // 8
+
+# Dias de uma consulta ao calendário
+LIMITE_DIAS = 31
+
+
+def meia_noite(dia: date) -> datetime:
+    return datetime.combine(dia, time())
+
+
+def dias(inicio: datetime, final: datetime) -> Iterator[date]:
+    """
+    Dias tocados pelo intervalo [inicio, final).
+    """
+    dia, ultimo = inicio.date(), (final - timedelta.resolution).date()
+    while dia <= ultimo:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def mascara(inicio: datetime, final: datetime, dia: date) -> int:
+    """
+    Bits dos slots do dia que o intervalo [inicio, final) ocupa, mesmo que em parte.
+    """
+    zero = meia_noite(dia)
+    primeiro = max((inicio - zero) // SLOT, 0)
+    ultimo = min(-((zero - final) // SLOT), SLOTS_DIA)  # arredondado para cima
+    if ultimo <= primeiro:
+        return 0
+    return ((1 << (ultimo - primeiro)) - 1) << primeiro
+
+
+def empacotar(mapa: int) -> str:
+    """
+    Mapa de um dia em base64: BYTES_DIA bytes, o slot i no bit i % 8 (do
+    menos significativo) do byte i // 8.
+    """
+    return base64.b64encode(mapa.to_bytes(BYTES_DIA, "little")).decode("ascii")
@@ -1,30 +1,252 @@
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import delete, event, exc as sa_exc, insert, or_, select, tuple_, update
 
-from datetime import datetime
+import time
+from contextlib import ExitStack
+from dataclasses import replace
+from heapq import merge
+from itertools import groupby, islice
+from operator import itemgetter
+from datetime import date, datetime, timedelta
 
-import models, schemas
+import arquivamento, busca_salas, calendario, eventos, models, schemas, serializacao
+from cache import TTL_SEGUNDOS, catalogo
+from indice_reservas import AgendaSala, carregar_agendas, indice
+from paginacao import LIMITE_PADRAO, decodificar_cursor, paginar
+from recorrencia import LIMITE_OCORRENCIAS, Ocorrencia, Recorrencia, expandir, ocorrencia
 
 class DuplicateEntryError(Exception):
     def __init__(self, message="Já existe um item com este identificador único."):
         self.message = message
         super().__init__(self.message)
 
+class ReservationConflictError(Exception):
+    def __init__(self, message="Já existe uma reserva para esta sala no período informado."):
+        self.message = message
+        super().__init__(self.message)
+
+
+# Estratégias de carregamento: cada relação usada pelos schemas de resposta é
+# carregada de uma vez (selectinload/joinedload), então o número de consultas
+# por requisição é fixo e não cresce com a quantidade de linhas.
+
+def _opcoes_reserva(modelo=models.Reserva):
+    # Reserva (ou ReservaHistorico) -> sala, usuario (SalaBase/UsuarioBase): JOIN na mesma consulta
+    return (joinedload(modelo.sala), joinedload(modelo.usuario))
+
+def _opcoes_sala():
+    # Sala -> usuarios (resumidos) + reservas -> sala, usuario
+    return (
+        selectinload(models.Sala.usuarios),
+        selectinload(models.Sala.reservas).options(*_opcoes_reserva()),
+    )
+
+def _opcoes_usuario():
+    # Usuario -> salas -> (usuarios, reservas)
+    return (selectinload(models.Usuario.salas).options(*_opcoes_sala()),)
+
+def _opcoes_serie():
+    # SerieReserva -> sala, usuario (repassados às ocorrências) + exceções
+    return (
+        joinedload(models.SerieReserva.sala),
+        joinedload(models.SerieReserva.usuario),
+        selectinload(models.SerieReserva.excecoes),
+    )
+
+
+# ===== busca por ID em lote (dataloader) =====
+
+# IDs por consulta IN (...) (abaixo do limite de parâmetros dos bancos)
+TAMANHO_IN = 500
+
+
+class Carregador:
+    """
+    Dataloader de um modelo, por requisição (guardado na sessão): os IDs
+    pedidos (pedir) são buscados todos juntos, numa única consulta IN (...),
+    na primeira vez que algum deles é lido (obter), e os resultados ficam
+    memorizados até o fim da transação.
+    """
+
+    def __init__(self, db: Session, modelo, opcoes: tuple = ()):
+        self.db = db
+        self.modelo = modelo
+        self.opcoes = opcoes
+        self._pendentes = set()
+        self._carregados = {}  # id -> objeto (None se não existir)
+        self.consultas = 0
+
+    def pedir(self, ids: Iterable[int]) -> None:
+        self._pendentes.update(i for i in ids if i not in self._carregados)
+
+    def obter(self, id_: int):
+        if id_ not in self._carregados:
+            self._pendentes.add(id_)
+            self._carregar()
+        return self._carregados[id_]
 
-def get_all_users(db: Session) -> List[models.Usuario]:
+    def obter_varios(self, ids: List[int]) -> list:
+        """
+        Objetos na ordem dos IDs (None para os que não existem).
+        """
+        self.pedir(ids)
+        self._carregar()
+        return [self._carregados[i] for i in ids]
+
+    def _carregar(self) -> None:
+        ids = sorted(self._pendentes)
+        self._pendentes.clear()
+        for inicio in range(0, len(ids), TAMANHO_IN):
+            parte = ids[inicio:inicio + TAMANHO_IN]
+            encontrados = {
+                obj.id: obj
+                for obj in self.db.query(self.modelo).options(*self.opcoes).filter(self.modelo.id.in_(parte))
+            }
+            self.consultas += 1
+            for i in parte:
+                self._carregados[i] = encontrados.get(i)
+
+
+def carregador(db: Session, modelo, expand: bool = True) -> Carregador:
     """
-    Retorna todos os usuários cadastrados no sistema.
+    Carregador de usuários ou salas da sessão (expand=True carrega as relações).
     """
-    return db.query(models.Usuario).all()
+    carregadores = db.info.setdefault("carregadores", {})
+    chave = (modelo, expand)
+    if chave not in carregadores:
+        opcoes = {models.Usuario: _opcoes_usuario, models.Sala: _opcoes_sala}[modelo]() if expand else ()
+        carregadores[chave] = Carregador(db, modelo, opcoes)
+    return carregadores[chave]
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _descartar_carregadores(db: Session) -> None:
+    # Depois de uma escrita os objetos memorizados podem estar desatualizados
+    db.info.pop("carregadores", None)
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[models.Usuario]:
+
+# ===== exclusão em conjunto (salas e usuários) =====
+
+# Salas ou usuários removidos por transação nas exclusões em lote
+LOTE_EXCLUSAO = 100
+
+
+def _excluir_lote(db: Session, modelo, ids: List[int]) -> List[int]:
+    """
+    Deleta as salas ou os usuários (modelo) com os IDs informados e tudo que
+    depende deles (reservas, reservas arquivadas, séries com suas exceções e
+    associações sala_usuario) com DELETEs em conjunto, numa única transação,
+    sem carregar as linhas na sessão. Atualiza depois as agendas em memória,
+    o índice de busca e o catálogo, e publica a remoção das reservas que
+    ainda não terminaram no feed de eventos.
+    Retorna os IDs que existiam (e foram deletados).
+    """
+    por_sala = modelo is models.Sala
+    coluna = "id_sala" if por_sala else "id_usuario"
+    associacao = models.sala_usuario.c.sala_id if por_sala else models.sala_usuario.c.usuario_id
+
+    existentes = db.scalars(select(modelo.id).where(modelo.id.in_(ids)).order_by(modelo.id)).all()
+    if not existentes:
+        db.rollback()
+        return []
+    futuras = db.execute(
+        _consulta_linhas_reserva()
+        .where(getattr(models.Reserva, coluna).in_(existentes), models.Reserva.data_final > datetime.now())
+        .order_by(models.Reserva.data_inicio, models.Reserva.id)
+    ).all()
+
+    def excluir(tabela, *condicoes, retorno=()):
+        comando = delete(tabela).where(*condicoes).execution_options(synchronize_session=False)
+        return db.execute(comando.returning(*retorno)).all() if retorno else db.execute(comando)
+
+    try:
+        excluir(models.ExcecaoSerie, models.ExcecaoSerie.id_serie.in_(
+            select(models.SerieReserva.id).where(getattr(models.SerieReserva, coluna).in_(existentes))
+        ))
+        # As agendas das salas deletadas são descartadas inteiras; as das
+        # salas em que os usuários tinham reservas perdem só essas reservas
+        retorno_series = () if por_sala else (models.SerieReserva.id_sala, models.SerieReserva.id)
+        series = excluir(models.SerieReserva, getattr(models.SerieReserva, coluna).in_(existentes), retorno=retorno_series)
+        retorno_reservas = () if por_sala else (models.Reserva.id_sala, models.Reserva.id, models.Reserva.data_inicio)
+        reservas = excluir(models.Reserva, getattr(models.Reserva, coluna).in_(existentes), retorno=retorno_reservas)
+        excluir(models.ReservaHistorico, getattr(models.ReservaHistorico, coluna).in_(existentes))
+        excluir(models.sala_usuario, associacao.in_(existentes))
+        excluir(modelo, modelo.id.in_(existentes))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if por_sala:
+        for id_sala in existentes:
+            agenda = indice.agenda(id_sala)
+            with agenda.lock:
+                agenda.invalidar()  # para quem já tinha a agenda em mãos
+                indice.descartar(id_sala)
+            busca_salas.indice.remover(id_sala)
+    else:
+        removidas: Dict[int, Tuple[list, list]] = {}
+        for id_sala, id_serie in series:
+            removidas.setdefault(id_sala, ([], []))[0].append(id_serie)
+        for id_sala, id_reserva, data_inicio in reservas:
+            removidas.setdefault(id_sala, ([], []))[1].append((id_reserva, data_inicio))
+        for id_sala in sorted(removidas):
+            agenda = indice.agenda(id_sala)
+            with agenda.lock:
+                if agenda.carregada:
+                    for id_serie in removidas[id_sala][0]:
+                        agenda.remover_serie(id_serie)
+                    for id_reserva, data_inicio in removidas[id_sala][1]:
+                        agenda.remover(id_reserva, data_inicio)
+    for linha in futuras:
+        eventos.canal.publicar(eventos.REMOVIDA, serializacao.reserva(linha))
+    catalogo.invalidar()
+    return list(existentes)
+
+
+def _excluir(db: Session, modelo, ids: Iterable[int]) -> List[int]:
+    # Em transações de até LOTE_EXCLUSAO IDs
+    ids = list(dict.fromkeys(ids))
+    excluidos = []
+    for i in range(0, len(ids), LOTE_EXCLUSAO):
+        excluidos += _excluir_lote(db, modelo, ids[i:i + LOTE_EXCLUSAO])
+    return excluidos
+
+
+# ===== usuarios =====
+
+def get_all_users(db: Session, limit: int = LIMITE_PADRAO, cursor: Optional[str] = None, expand: bool = True) -> Tuple[List[models.Usuario], Optional[str]]:
+    """
+    Retorna uma página de usuários, ordenados por ID.
+    Retorna também o cursor da próxima página (None se for a última).
+    Com expand=False as relações não são carregadas.
+    """
+    query = db.query(models.Usuario)
+    if expand:
+        query = query.options(*_opcoes_usuario())
+    if cursor:
+        (ultimo_id,) = decodificar_cursor(cursor, int)
+        query = query.filter(models.Usuario.id > ultimo_id)
+    usuarios = query.order_by(models.Usuario.id).limit(limit + 1).all()
+    return paginar(usuarios, limit, lambda u: (u.id,))
+
+def get_user_by_id(db: Session, user_id: int, expand: bool = True) -> Optional[models.Usuario]:
     """
     Busca um usuário pelo ID.
     Retorna None se o usuário não for encontrado.
     """
-    return db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
+    return carregador(db, models.Usuario, expand).obter(user_id)
+
+def get_users_by_ids(db: Session, user_ids: List[int], expand: bool = True) -> List[Optional[models.Usuario]]:
+    """
+    Busca vários usuários numa única consulta.
+    Retorna na ordem dos IDs, com None para os não encontrados.
+    """
+    return carregador(db, models.Usuario, expand).obter_varios(user_ids)
 
 def create_user(db: Session, user: schemas.UsuarioCreate) -> models.Usuario:
     db_usuario = models.Usuario(**user.model_dump())
@@ -35,40 +257,249 @@ def create_user(db: Session, user: schemas.UsuarioCreate) -> models.Usuario:
     except sa_exc.IntegrityError:
         db.rollback()
         raise DuplicateEntryError("Email já cadastrado.")
+    catalogo.invalidar("usuarios")
     return db_usuario
 
 def delete_user(db: Session, user_id: int) -> bool:
     """
-    Deleta um usuário do banco de dados.
+    Deleta um usuário do banco de dados, com suas reservas (inclusive as
+    arquivadas), séries e associações com salas.
     Retorna True se o usuário foi deletado, False se não foi encontrado.
     """
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == user_id).first()
-    if not usuario:
-        return False  # Usuário não encontrado
+    return bool(_excluir(db, models.Usuario, [user_id]))
 
-    db.delete(usuario)
-    try:
-        db.commit()
-        return True
-    except Exception as e:
-        db.rollback()
-        raise  # Relança a exceção para ser tratada pelo router
+def delete_users(db: Session, user_ids: Iterable[int]) -> List[int]:
+    """
+    Deleta vários usuários, com tudo que depende deles, em transações de até
+    LOTE_EXCLUSAO usuários.
+    Retorna os IDs deletados; os que não existiam ficam de fora.
+    """
+    return _excluir(db, models.Usuario, user_ids)
 
 
 # ===== salas =====
 
-def get_all_salas(db: Session, nome: Optional[str] = None) -> List[models.Sala]:
-    query = db.query(models.Sala).options(joinedload(models.Sala.reservas))
+def get_all_salas(db: Session, nome: Optional[str] = None, limit: int = LIMITE_PADRAO, cursor: Optional[str] = None, expand: bool = True, linhas: bool = False) -> Tuple[List[Union[models.Sala, dict]], Optional[str]]:
+    """
+    Retorna uma página de salas, ordenadas por ID.
+    Retorna também o cursor da próxima página (None se for a última).
+    Com expand=False as relações não são carregadas.
+    Com linhas=True as salas já vêm como dicionários prontos para o JSON
+    (formato de schemas.Sala/SalaResumo), lidos sem objetos ORM.
+    O filtro por nome usa o índice de trigramas (busca_salas.py): a página é
+    escolhida em memória e só as salas dela são lidas do banco.
+    """
+    if linhas:
+        query = select(models.Sala.id, models.Sala.nome, models.Sala.capacidade, models.Sala.localizacao)
+    else:
+        query = db.query(models.Sala)
+        if expand:
+            query = query.options(*_opcoes_sala())
+    ultimo_id = decodificar_cursor(cursor, int)[0] if cursor else None
     if nome:
-        query = query.filter(models.Sala.nome.ilike(f"%{nome}%"))
-    return query.all()
+        busca_salas.indice.carregar(db)
+        ids = busca_salas.indice.contendo(nome, depois_de=ultimo_id, quantidade=limit + 1)
+        if ids is None:  # sem letras nem números: não há o que indexar
+            query = query.filter(models.Sala.nome.ilike(f"%{nome}%"))
+        else:
+            query = query.filter(models.Sala.id.in_(ids))
+    if ultimo_id is not None:
+        query = query.filter(models.Sala.id > ultimo_id)
+    query = query.order_by(models.Sala.id).limit(limit + 1)
+    if not linhas:
+        return paginar(query.all(), limit, lambda s: (s.id,))
+    salas, proximo_cursor = paginar(db.execute(query).all(), limit, lambda s: (s.id,))
+    return _salas_em_dicionarios(db, salas, expand), proximo_cursor
 
-def get_sala_by_id(db: Session, sala_id: int) -> Optional[models.Sala]:
+def _salas_em_dicionarios(db: Session, salas: List[Row], expand: bool) -> List[dict]:
+    # Com expand, as relações de todas as salas da página vêm em uma consulta
+    # cada (usuários e reservas), como no selectinload de _opcoes_sala.
+    if not expand:
+        return [serializacao.sala(sala) for sala in salas]
+    ids = [sala.id for sala in salas]
+    usuarios: dict = {id_sala: [] for id_sala in ids}
+    reservas: dict = {id_sala: [] for id_sala in ids}
+    for id_sala, *usuario in db.execute(
+        select(models.sala_usuario.c.sala_id, models.Usuario.id, models.Usuario.nome, models.Usuario.email)
+        .join(models.Usuario, models.sala_usuario.c.usuario_id == models.Usuario.id)
+        .where(models.sala_usuario.c.sala_id.in_(ids))
+        .order_by(models.Usuario.id)
+    ):
+        usuarios[id_sala].append(serializacao.usuario_resumo(usuario))
+    for linha in db.execute(_consulta_linhas_reserva().where(models.Reserva.id_sala.in_(ids)).order_by(models.Reserva.id)):
+        reservas[linha[1]].append(serializacao.reserva(linha))
+    return [serializacao.sala(sala, usuarios[sala.id], reservas[sala.id]) for sala in salas]
+
+def get_sala_by_id(db: Session, sala_id: int, expand: bool = True) -> Optional[models.Sala]:
     """
     Busca uma sala pelo ID.
     Retorna None se a sala não for encontrada.
     """
-    return db.query(models.Sala).filter(models.Sala.id == sala_id).first()
+    return carregador(db, models.Sala, expand).obter(sala_id)
+
+def get_salas_by_ids(db: Session, sala_ids: List[int], expand: bool = True) -> List[Optional[models.Sala]]:
+    """
+    Busca várias salas numa única consulta.
+    Retorna na ordem dos IDs, com None para as não encontradas.
+    """
+    return carregador(db, models.Sala, expand).obter_varios(sala_ids)
+
+def buscar_salas(db: Session, texto: str, limit: int = LIMITE_PADRAO) -> List[dict]:
+    """
+    Salas com nome ou localização parecidos com o texto (por prefixo e
+    tolerando erros de digitação), da mais relevante para a menos, no formato
+    de schemas.SalaBusca.
+    """
+    busca_salas.indice.carregar(db)
+    resultados = busca_salas.indice.buscar(texto, limit)
+    if not resultados:
+        return []
+    linhas = {
+        sala.id: sala
+        for sala in db.execute(
+            select(models.Sala.id, models.Sala.nome, models.Sala.capacidade, models.Sala.localizacao)
+            .where(models.Sala.id.in_([id_sala for id_sala, _ in resultados]))
+        )
+    }
+    # Salas removidas por outro processo ainda podem estar no índice
+    return [
+        {**serializacao.sala(linhas[id_sala]), "pontuacao": pontuacao}
+        for id_sala, pontuacao in resultados
+        if id_sala in linhas
+    ]
+
+def _filtro_salas(capacidade: int, localizacao: Optional[str]):
+    filtros = [models.Sala.capacidade >= capacidade]
+    if localizacao:
+        filtros.append(models.Sala.localizacao == localizacao)
+    return filtros
+
+def get_salas_disponiveis(db: Session, start_date: datetime, end_date: datetime, capacidade: int = 1, localizacao: Optional[str] = None, limit: int = LIMITE_PADRAO) -> List[models.Sala]:
+    """
+    Retorna as salas com capacidade >= capacidade (e na localização, se
+    informada) que não têm nenhuma reserva (avulsa ou ocorrência de série)
+    sobrepondo o período.
+    """
+    ocupadas_por_series = _salas_ocupadas_por_series(db, start_date, end_date)
+    # As reservas de uma sala não se sobrepõem, então basta olhar a última
+    # reserva que começa antes do fim do período: a sala está livre se ela não
+    # existir ou terminar até o início do período. Com o índice
+    # (id_sala, data_inicio, data_final) isso é uma busca no índice por sala.
+    fim_ultima_reserva = (
+        select(models.Reserva.data_final)
+        .where(models.Reserva.id_sala == models.Sala.id, models.Reserva.data_inicio < end_date)
+        .order_by(models.Reserva.data_inicio.desc())
+        .limit(1)
+        .correlate(models.Sala)
+        .scalar_subquery()
+    )
+    query = (
+        db.query(models.Sala)
+        .filter(*_filtro_salas(capacidade, localizacao))
+        .filter(or_(fim_ultima_reserva.is_(None), fim_ultima_reserva <= start_date))
+    )
+    if ocupadas_por_series:
+        query = query.filter(models.Sala.id.notin_(ocupadas_por_series))
+    return query.order_by(models.Sala.capacidade, models.Sala.id).limit(limit).all()
+
+def _series_no_periodo(db: Session, start_date: datetime, end_date: datetime, *filtros) -> List[models.SerieReserva]:
+    # Séries com alguma ocorrência possível em [start_date, end_date); as
+    # exceções vêm junto, mas sala e usuário não.
+    return db.scalars(
+        select(models.SerieReserva)
+        .options(selectinload(models.SerieReserva.excecoes))
+        .where(models.SerieReserva.data_inicio < end_date, models.SerieReserva.fim_serie > start_date, *filtros)
+    ).all()
+
+def _salas_ocupadas_por_series(db: Session, start_date: datetime, end_date: datetime) -> set:
+    return {
+        serie.id_sala for serie in _series_no_periodo(db, start_date, end_date)
+        if Recorrencia.de_serie(serie).conflito(start_date, end_date) is not None
+    }
+
+def sugerir_horarios(db: Session, start_date: datetime, end_date: datetime, capacidade: int = 1, localizacao: Optional[str] = None, horizonte: timedelta = timedelta(days=1), quantidade: int = 5) -> List[schemas.HorarioSugerido]:
+    """
+    Sugere os horários livres mais próximos, a partir de start_date e com a
+    mesma duração do período pedido, nas salas compatíveis.
+    Faz uma varredura (sweep-line) nas reservas da janela [start_date, start_date + horizonte).
+    """
+    duracao = end_date - start_date
+    limite_janela = start_date + horizonte
+    salas = db.query(models.Sala).filter(*_filtro_salas(capacidade, localizacao)).all()
+    if not salas:
+        return []
+
+    ids_compativeis = select(models.Sala.id).where(*_filtro_salas(capacidade, localizacao))
+    linhas = db.execute(
+        select(models.Reserva.id_sala, models.Reserva.data_inicio, models.Reserva.data_final)
+        .where(
+            models.Reserva.id_sala.in_(ids_compativeis),
+            models.Reserva.data_inicio < limite_janela,
+            models.Reserva.data_final > start_date,
+        )
+        .order_by(models.Reserva.id_sala, models.Reserva.data_inicio)
+    ).all()
+    ocupacoes = {id_sala: [(linha[1], linha[2]) for linha in grupo] for id_sala, grupo in groupby(linhas, key=lambda linha: linha[0])}
+    # Ocorrências de séries na janela entram na varredura como reservas avulsas
+    for serie in _series_no_periodo(db, start_date, limite_janela, models.SerieReserva.id_sala.in_(ids_compativeis)):
+        intervalos = ocupacoes.setdefault(serie.id_sala, [])
+        intervalos.extend((inicio, final) for _, inicio, final in Recorrencia.de_serie(serie).ocorrencias_entre(start_date, limite_janela))
+        intervalos.sort()
+
+    candidatos = []
+    for sala in salas:
+        livre_em = start_date
+        for inicio, final in ocupacoes.get(sala.id, []):
+            if inicio - livre_em >= duracao:
+                break  # o intervalo livre antes desta reserva já comporta o período
+            livre_em = max(livre_em, final)
+        if livre_em + duracao <= limite_janela:
+            candidatos.append((livre_em, sala.capacidade, sala))
+
+    candidatos.sort(key=lambda candidato: (candidato[0], candidato[1], candidato[2].id))
+    return [
+        schemas.HorarioSugerido(
+            sala=schemas.SalaResumo.model_validate(sala),
+            data_inicio=inicio,
+            data_final=inicio + duracao,
+        )
+        for inicio, _, sala in candidatos[:quantidade]
+    ]
+
+def get_calendario(db: Session, data_inicio: date, dias: int, capacidade: int = 1, localizacao: Optional[str] = None) -> dict:
+    """
+    Mapas de ocupação (calendario.py) de cada sala compatível em cada dia de
+    [data_inicio, data_inicio + dias), no formato de schemas.Calendario.
+    Os mapas vêm das agendas em memória: salas ainda não carregadas são lidas
+    de uma vez, e as carregadas há mais que o TTL do catálogo são relidas
+    (para refletir as gravações de outros processos).
+    """
+    salas = db.execute(
+        select(models.Sala.id, models.Sala.nome, models.Sala.capacidade, models.Sala.localizacao)
+        .where(*_filtro_salas(capacidade, localizacao))
+        .order_by(models.Sala.id)
+    ).all()
+    periodo = [data_inicio + timedelta(days=n) for n in range(dias)]
+    agendas = [indice.agenda(sala[0]) for sala in salas]
+    # Locks na ordem dos IDs, como no lote
+    with ExitStack() as locks:
+        for agenda in agendas:
+            locks.enter_context(agenda.lock)
+        limite = time.monotonic() - TTL_SEGUNDOS
+        for agenda in agendas:
+            if agenda.carregada and agenda.carregada_em < limite:
+                agenda.invalidar()
+        carregar_agendas(db, agendas)
+        mapas = [[agenda.mapa_dia(dia) for dia in periodo] for agenda in agendas]
+    return {
+        "slot_minutos": calendario.SLOT_MINUTOS,
+        "slots_por_dia": calendario.SLOTS_DIA,
+        "dias": periodo,
+        "salas": [
+            {**serializacao.sala(sala), "mapas": [calendario.empacotar(mapa) for mapa in mapas_sala]}
+            for sala, mapas_sala in zip(salas, mapas)
+        ],
+    }
 
 def create_sala(db: Session, sala: schemas.SalaCreate) -> models.Sala:
     normalized_nome = sala.nome.strip().lower()
@@ -90,108 +521,609 @@ def create_sala(db: Session, sala: schemas.SalaCreate) -> models.Sala:
         if "UNIQUE constraint failed" in str(e) and "salas.nome" in str(e):
              raise DuplicateEntryError(f"Já existe uma sala com o nome '{sala.nome}'.")
         raise
+    busca_salas.indice.adicionar(db_sala.id, db_sala.nome, db_sala.localizacao)
+    catalogo.invalidar("salas")
     return db_sala
 
 def delete_sala(db: Session, sala_id: int) -> bool:
     """
-    Deleta uma sala do banco de dados.
+    Deleta uma sala do banco de dados, com suas reservas (inclusive as
+    arquivadas), séries e associações com usuários.
     Retorna True se a sala foi deletada, False se não foi encontrada.
     """
-    sala = db.query(models.Sala).filter(models.Sala.id == sala_id).first()
-    if not sala:
-        return False # Sala não encontrada
+    return bool(_excluir(db, models.Sala, [sala_id]))
 
-    # Opcional: Lidar com dependências (e.g., reservas).
-    # Dependendo da sua configuração ForeignKey (ON DELETE CASCADE),
-    # as reservas podem ser deletadas automaticamente.
-    # Caso contrário, você precisaria deletá-las explicitamente aqui.
-    # Ex: db.query(models.Reserva).filter(models.Reserva.id_sala == sala_id).delete()
-
-    db.delete(sala)
-    try:
-        db.commit()
-        return True
-    except Exception as e:
-        db.rollback()
-        raise # Relança a exceção para ser tratada pelo router
+def delete_salas(db: Session, sala_ids: Iterable[int]) -> List[int]:
+    """
+    Deleta várias salas, com tudo que depende delas, em transações de até
+    LOTE_EXCLUSAO salas.
+    Retorna os IDs deletados; os que não existiam ficam de fora.
+    """
+    return _excluir(db, models.Sala, sala_ids)
 
 # ===== reservas =====
 
-def get_all_reservas(db: Session, sala_id: Optional[int] = None, user_id: Optional[int] = None) -> List[models.Reserva]:
-    query = db.query(models.Reserva).options(joinedload(models.Reserva.sala), joinedload(models.Reserva.usuario))
+def _chave_reserva(reserva: Union[models.Reserva, Ocorrencia]) -> Tuple[datetime, int, int]:
+    # Ordem das listagens: (data_inicio, 0, id) para reservas avulsas e
+    # (data_inicio, id_serie, índice) para ocorrências de séries.
+    if isinstance(reserva, Ocorrencia):
+        return (reserva.data_inicio, reserva.id_serie, reserva.indice)
+    return (reserva.data_inicio, 0, reserva.id)
+
+def _ocorrencias_depois(serie: models.SerieReserva, ultimo: Optional[Tuple[datetime, int, int]]) -> Iterator[Ocorrencia]:
+    # Ocorrências da série, em ordem, com chave posterior à do cursor
+    regra = Recorrencia.de_serie(serie)
+    for n, inicio, final in regra.ocorrencias_a_partir(ultimo[0] if ultimo else regra.data_inicio):
+        item = ocorrencia(serie, n, inicio, final)
+        if ultimo is None or _chave_reserva(item) > ultimo:
+            yield item
+
+def _consulta_linhas_reserva(modelo=models.Reserva):
+    # Colunas de schemas.Reserva (sala e usuário achatados, com prefixo), sem
+    # objetos ORM. serializacao.reserva lê as linhas por posição: mantenha a ordem.
+    # modelo: models.Reserva ou models.ReservaHistorico.
+    return (
+        select(
+            modelo.id,
+            modelo.id_sala,
+            modelo.id_usuario,
+            modelo.data_inicio,
+            modelo.data_final,
+            modelo.participantes,
+            models.Sala.nome.label("sala_nome"),
+            models.Sala.capacidade.label("sala_capacidade"),
+            models.Sala.localizacao.label("sala_localizacao"),
+            models.Usuario.nome.label("usuario_nome"),
+            models.Usuario.email.label("usuario_email"),
+        )
+        .join(models.Sala, modelo.id_sala == models.Sala.id)
+        .join(models.Usuario, modelo.id_usuario == models.Usuario.id)
+    )
+
+def get_all_reservas(db: Session, sala_id: Optional[int] = None, user_id: Optional[int] = None, limit: int = LIMITE_PADRAO, cursor: Optional[str] = None, linhas: bool = False, historico: bool = False) -> Tuple[List[Union[models.Reserva, Row, Ocorrencia]], Optional[str]]:
+    """
+    Retorna uma página de reservas, ordenadas por data_inicio, incluindo as
+    ocorrências das séries recorrentes (calculadas só até o fim da página).
+    Retorna também o cursor da próxima página (None se for a última).
+    Com linhas=True as reservas avulsas vêm como linhas simples
+    (_consulta_linhas_reserva), para serialização com serializacao.reservas.
+    Só lista as reservas ativas; com historico=True inclui as arquivadas.
+    """
+    ultimo = decodificar_cursor(cursor, datetime.fromisoformat, int, int) if cursor else None
+    listas = []
+    for modelo in (models.Reserva, models.ReservaHistorico) if historico else (models.Reserva,):
+        query = _consulta_linhas_reserva(modelo) if linhas else db.query(modelo).options(*_opcoes_reserva(modelo))
+        if sala_id:
+            query = query.filter(modelo.id_sala == sala_id)
+        if user_id:
+            query = query.filter(modelo.id_usuario == user_id)
+        if ultimo:
+            ultimo_inicio, ultima_serie, ultimo_id = ultimo
+            if ultima_serie:
+                # Depois de uma ocorrência, as reservas avulsas do mesmo horário já passaram
+                query = query.filter(modelo.data_inicio > ultimo_inicio)
+            else:
+                query = query.filter(tuple_(modelo.data_inicio, modelo.id) > (ultimo_inicio, ultimo_id))
+        query = query.order_by(modelo.data_inicio, modelo.id).limit(limit + 1)
+        listas.append(db.execute(query).all() if linhas else query.all())
+    # Os IDs do histórico são os das reservas originais: a ordem (data_inicio, id) continua única
+    reservas = list(islice(merge(*listas, key=_chave_reserva), limit + 1))
+
+    series = db.query(models.SerieReserva).options(*_opcoes_serie())
     if sala_id:
-        query = query.filter(models.Reserva.id_sala == sala_id)
+        series = series.filter(models.SerieReserva.id_sala == sala_id)
     if user_id:
-        query = query.filter(models.Reserva.id_usuario == user_id)
-    
-    return query.all()
+        series = series.filter(models.SerieReserva.id_usuario == user_id)
+    if ultimo:
+        series = series.filter(models.SerieReserva.fim_serie > ultimo[0])
+    if len(reservas) > limit:
+        # A página termina no máximo na última reserva avulsa lida
+        series = series.filter(models.SerieReserva.data_inicio <= reservas[-1].data_inicio)
+
+    ocorrencias = [_ocorrencias_depois(serie, ultimo) for serie in series.all()]
+    itens = list(islice(merge(reservas, *ocorrencias, key=_chave_reserva), limit + 1))
+    return paginar(itens, limit, _chave_reserva)
 
-def get_reserva_by_id(db: Session, reserva_id: int) -> Optional[models.Reserva]:
+def get_reserva_by_id(db: Session, reserva_id: int) -> Optional[Union[models.Reserva, models.ReservaHistorico]]:
     """
-    Busca uma reserva pelo ID.
+    Busca uma reserva pelo ID, ativa ou já arquivada.
     Retorna None se a reserva não for encontrada.
     """
+    reserva = db.query(models.Reserva).options(*_opcoes_reserva()).filter(models.Reserva.id == reserva_id).first()
+    if reserva is None:
+        reserva = (
+            db.query(models.ReservaHistorico)
+            .options(*_opcoes_reserva(models.ReservaHistorico))
+            .filter(models.ReservaHistorico.id == reserva_id)
+            .first()
+        )
+    return reserva
 
-    return db.query(models.Reserva).filter(models.Reserva.id == reserva_id).first()
+def _modelos_periodo(start_date: datetime):
+    # A tabela quente, mais o histórico se o período alcança o corte do arquivamento
+    if arquivamento.alcanca_historico(start_date):
+        return (models.Reserva, models.ReservaHistorico)
+    return (models.Reserva,)
 
-def get_resrevas_by_period(db: Session, start_date: datetime, end_date: datetime) -> List[models.Reserva]:
+def get_resrevas_by_period(db: Session, start_date: datetime, end_date: datetime, linhas: bool = False) -> List[Union[models.Reserva, Row, Ocorrencia]]:
     """
-    Retorna todas as reservas que se sobrepõem ao período fornecido.
+    Retorna todas as reservas que se sobrepõem ao período fornecido, incluindo
+    as ocorrências de séries recorrentes no período, ordenadas por data_inicio.
+    Com linhas=True as reservas avulsas vêm como linhas simples.
+    As reservas arquivadas só são lidas se o período começa antes do corte.
     """
-    query = db.query(models.Reserva)
+    listas = []
+    for modelo in _modelos_periodo(start_date):
+        query = _consulta_linhas_reserva(modelo) if linhas else db.query(modelo).options(*_opcoes_reserva(modelo))
+        query = query.filter(
+            modelo.data_inicio < end_date,
+            modelo.data_final > start_date
+        ).order_by(modelo.data_inicio, modelo.id)
+        listas.append(db.execute(query).all() if linhas else query.all())
+    reservas = listas[0] if len(listas) == 1 else list(merge(*listas, key=_chave_reserva))
 
-    query = query.filter(
-        models.Reserva.data_inicio < end_date,
-        models.Reserva.data_final > start_date
+    series = (
+        db.query(models.SerieReserva)
+        .options(*_opcoes_serie())
+        .filter(models.SerieReserva.data_inicio < end_date, models.SerieReserva.fim_serie > start_date)
+        .all()
     )
-    query = query.options(
-        joinedload(models.Reserva.sala),
-        joinedload(models.Reserva.usuario)
+    if not series:
+        return reservas
+    ocorrencias = sorted(expandir(series, start_date, end_date), key=_chave_reserva)
+    return list(merge(reservas, ocorrencias, key=_chave_reserva))
+    
+def iter_reservas_by_period(db: Session, start_date: datetime, end_date: datetime, tamanho_lote: int = 1000) -> Iterator[Row]:
+    """
+    Percorre as reservas que se sobrepõem ao período, já com os dados da sala
+    e do usuário, em lotes de tamanho_lote linhas (cursor do lado do servidor
+    quando o driver suporta), junto com as ocorrências das séries recorrentes
+    no período, em ordem de data_inicio. As reservas avulsas vêm como linhas
+    simples, sem objetos ORM, e as ocorrências como recorrencia.Ocorrencia.
+    As reservas arquivadas só são lidas se o período começa antes do corte.
+    """
+    # As séries são poucas linhas; as ocorrências de cada uma são calculadas
+    # em ordem, à medida que o merge as consome
+    series = (
+        db.query(models.SerieReserva)
+        .options(*_opcoes_serie())
+        .filter(models.SerieReserva.data_inicio < end_date, models.SerieReserva.fim_serie > start_date)
+        .all()
     )
+    resultados = [
+        db.execute(
+            _consulta_linhas_reserva(modelo)
+            .where(modelo.data_inicio < end_date, modelo.data_final > start_date)
+            .order_by(modelo.data_inicio, modelo.id)
+            .execution_options(yield_per=tamanho_lote)
+        )
+        for modelo in _modelos_periodo(start_date)
+    ]
+    ocorrencias = [expandir([serie], start_date, end_date) for serie in series]
+    yield from merge(*resultados, *ocorrencias, key=_chave_reserva)
 
-    return query.all()
-    
-def create_reserva(db: Session, reserva: schemas.ReservaCreate) -> models.Reserva:
-    # Verifica se a sala existe
-    sala = db.query(models.Sala).filter(models.Sala.id == reserva.id_sala).first()
-    if not sala:
-        raise ValueError(f"Sala com ID {reserva.id_sala} não encontrada.")
-
-    # Verifica se o usuário existe
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == reserva.id_usuario).first()
-    if not usuario:
-        raise ValueError(f"Usuário com ID {reserva.id_usuario} não encontrado.")
-
-    # Verifica se a quantidade de participantes não excede a capacidade da sala
-    capacidade_sala = sala.capacidade
-    if reserva.participantes > capacidade_sala:
-        raise ValueError(f"A quantidade de participantes ({reserva.participantes}) excede a capacidade da sala ({capacidade_sala}).")
+def _agendas_arquivadas(db: Session, inicios: Dict[int, datetime]) -> Dict[int, AgendaSala]:
+    """
+    Reservas arquivadas de cada sala a partir do início informado (id_sala ->
+    início), como agendas avulsas. As agendas do índice só têm as reservas
+    ativas; isto confere os conflitos de reservas que começam antes do corte.
+    Só consulta o histórico para as salas com início antes do corte.
+    """
+    pendentes = {id_sala: inicio for id_sala, inicio in inicios.items() if arquivamento.alcanca_historico(inicio)}
+    agendas = {id_sala: AgendaSala(id_sala) for id_sala in pendentes}
+    if not pendentes:
+        return agendas
+    linhas = db.execute(
+        select(models.ReservaHistorico.id_sala, models.ReservaHistorico.data_inicio,
+               models.ReservaHistorico.data_final, models.ReservaHistorico.id)
+        .where(models.ReservaHistorico.id_sala.in_(pendentes), models.ReservaHistorico.data_final > min(pendentes.values()))
+        .order_by(models.ReservaHistorico.id_sala, models.ReservaHistorico.data_inicio, models.ReservaHistorico.id)
+    ).all()
+    for id_sala, grupo in groupby(linhas, key=itemgetter(0)):
+        agendas[id_sala].preencher([tuple(linha[1:]) for linha in grupo])
+    return agendas
 
-    
-    db_reserva = models.Reserva(**reserva.model_dump())
-    db.add(db_reserva)
-    try:
-        db.commit()
-        db.refresh(db_reserva)
-    except sa_exc.IntegrityError as e:
-        db.rollback()
-        raise DuplicateEntryError("Já existe uma reserva com esses dados.")
-    
-    return db_reserva
+def _travar_sala(db: Session, id_sala: int) -> Optional[models.Sala]:
+    """
+    Busca a sala travando a sua linha até o fim da transação (SELECT ... FOR
+    UPDATE): gravações na mesma sala, mesmo vindas de outros processos, passam
+    uma por vez, e salas diferentes seguem em paralelo. O SQLite não tem FOR
+    UPDATE e o driver só abre a transação na primeira escrita; lá a trava é
+    uma atualização vazia da sala, que já toma o lock de escrita do banco antes
+    das leituras.
+    Deve ser chamada com o lock da agenda da sala (sempre nesta ordem: primeiro
+    o lock do processo, depois o do banco), assim quem espera não segura uma
+    transação aberta.
+    """
+    _travar_escrita_sqlite(db, [id_sala])
+    return db.execute(select(models.Sala).where(models.Sala.id == id_sala).with_for_update()).scalar_one_or_none()
+
+def _travar_escrita_sqlite(db: Session, ids_sala: Iterable[int]) -> None:
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(
+            update(models.Sala).where(models.Sala.id.in_(list(ids_sala))).values(id=models.Sala.id)
+            .execution_options(synchronize_session=False)
+        )
+
+def _conflito_no_banco(db: Session, id_sala: int, inicio: datetime, final: datetime) -> Optional[int]:
+    """
+    Confere no banco, com a sala travada, se outro processo gravou uma reserva
+    sobreposta que o índice deste processo ainda não conhece. No PostgreSQL a
+    restrição de exclusão (models.RESTRICAO_SOBREPOSICAO) já garante isso, sem
+    consulta extra.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return None
+    # Como em get_salas_disponiveis: as reservas gravadas da sala não se
+    # sobrepõem, então só a última que começa antes do fim do período pode
+    # sobrepor. Uma busca no índice (id_sala, data_inicio, data_final), em vez
+    # de percorrer todas as reservas anteriores da sala.
+    ultima = db.execute(
+        select(models.Reserva.id, models.Reserva.data_final)
+        .where(models.Reserva.id_sala == id_sala, models.Reserva.data_inicio < final)
+        .order_by(models.Reserva.data_inicio.desc())
+        .limit(1)
+    ).first()
+    if ultima is not None and ultima.data_final > inicio:
+        return ultima.id
+    return None
+
+def _violou_sobreposicao(e: sa_exc.IntegrityError) -> bool:
+    return models.RESTRICAO_SOBREPOSICAO in str(e.orig)
+
+def create_reserva(db: Session, reserva: schemas.ReservaCreate) -> schemas.Reserva:
+    """
+    Cria uma reserva.
+    Reservas da mesma sala são serializadas: primeiro pelo lock da agenda no
+    processo (quem espera não ocupa conexão nem transação), depois pela trava
+    da linha da sala no banco. Conflitos são respondidos pelo índice em
+    memória; só a reserva que vai ser gravada confere o banco.
+    A resposta é montada antes do commit, então a conexão volta ao pool no
+    commit e não é usada de novo até o fim da requisição.
+    Lança ValueError para dados inválidos e ReservationConflictError para
+    horários ocupados.
+    """
+    if reserva.data_final <= reserva.data_inicio:
+        raise ValueError("A data final da reserva deve ser posterior à data de início.")
+
+    agenda = indice.agenda(reserva.id_sala)
+    with agenda.lock:
+        try:
+            # Verifica se a sala existe (e trava a sala até o commit)
+            sala = _travar_sala(db, reserva.id_sala)
+            if not sala:
+                raise ValueError(f"Sala com ID {reserva.id_sala} não encontrada.")
+
+            # Verifica se o usuário existe
+            usuario = db.get(models.Usuario, reserva.id_usuario)
+            if not usuario:
+                raise ValueError(f"Usuário com ID {reserva.id_usuario} não encontrado.")
+
+            # Verifica se a quantidade de participantes não excede a capacidade da sala
+            if reserva.participantes > sala.capacidade:
+                raise ValueError(f"A quantidade de participantes ({reserva.participantes}) excede a capacidade da sala ({sala.capacidade}).")
+
+            agenda.carregar(db)
+            conflito = agenda.conflito(reserva.data_inicio, reserva.data_final)
+            if conflito is None:
+                conflito = _conflito_no_banco(db, reserva.id_sala, reserva.data_inicio, reserva.data_final)
+                if conflito is not None:
+                    agenda.invalidar()  # o índice deste processo está desatualizado
+            if conflito is None:
+                arquivada = _agendas_arquivadas(db, {reserva.id_sala: reserva.data_inicio}).get(reserva.id_sala)
+                if arquivada is not None:
+                    conflito = arquivada.conflito(reserva.data_inicio, reserva.data_final)
+            if conflito is not None:
+                raise ReservationConflictError(
+                    f"A sala {reserva.id_sala} já possui a reserva {conflito} no período informado."
+                )
+            conflito_serie = agenda.conflito_serie(reserva.data_inicio, reserva.data_final)
+            if conflito_serie is not None:
+                raise ReservationConflictError(
+                    f"A sala {reserva.id_sala} já possui a ocorrência de {conflito_serie[1].isoformat()} da série {conflito_serie[0]} no período informado."
+                )
+
+            db_reserva = models.Reserva(**reserva.model_dump(), sala=sala, usuario=usuario)
+            db.add(db_reserva)
+            db.flush()
+            resposta = schemas.Reserva.model_validate(db_reserva, from_attributes=True)
+            db.commit()
+        except sa_exc.IntegrityError as e:
+            db.rollback()
+            if _violou_sobreposicao(e):
+                agenda.invalidar()
+                raise ReservationConflictError(f"A sala {reserva.id_sala} já possui uma reserva no período informado.")
+            raise DuplicateEntryError("Já existe uma reserva com esses dados.")
+        except Exception:
+            db.rollback()  # libera a trava da sala
+            raise
+
+        agenda.inserir(resposta.id, resposta.data_inicio, resposta.data_final)
+        eventos.canal.publicar(eventos.CRIADA, resposta.model_dump())
+
+    # Salas e usuários são retornados com suas reservas
+    catalogo.invalidar()
+    return resposta
+
+def create_reservas_lote(db: Session, itens: List[Union[schemas.ReservaCreate, str]]) -> schemas.ResultadoLote:
+    """
+    Cria várias reservas em uma única transação.
+    Cada item é uma ReservaCreate ou a mensagem de erro de validação do item.
+    Salas e usuários são buscados em uma consulta cada; capacidade e conflitos
+    são verificados em memória, contra as reservas existentes (índice por sala)
+    e contra os demais itens do próprio lote. Itens rejeitados não impedem a
+    gravação dos outros.
+    """
+    resultados: List[Optional[schemas.ResultadoItemLote]] = [None] * len(itens)
+    validos = [(i, item) for i, item in enumerate(itens) if isinstance(item, schemas.ReservaCreate)]
+    for i, item in enumerate(itens):
+        if not isinstance(item, schemas.ReservaCreate):
+            resultados[i] = schemas.ResultadoItemLote(indice=i, status="invalida", erro=item)
+
+    ids_sala = {item.id_sala for _, item in validos}
+    ids_usuario = {item.id_usuario for _, item in validos}
+    # Nome e e-mail (e, abaixo, os dados da sala) montam os eventos do feed sem outra consulta
+    usuarios = {linha[0]: linha for linha in db.execute(
+        select(models.Usuario.id, models.Usuario.nome, models.Usuario.email).where(models.Usuario.id.in_(ids_usuario))
+    )} if ids_usuario else {}
+    db.commit()  # devolve a conexão enquanto espera os locks; a gravação começa com as salas travadas
+
+    aceitos = []
+    # Os locks das salas são adquiridos sempre na mesma ordem (por ID) para
+    # não haver deadlock com outros lotes ou com create_reserva: primeiro os
+    # locks das agendas no processo, depois as linhas das salas no banco.
+    agendas = {id_sala: indice.agenda(id_sala) for id_sala in sorted(ids_sala)}
+    with ExitStack() as locks:
+        for agenda in agendas.values():
+            locks.enter_context(agenda.lock)
+        if ids_sala:
+            _travar_escrita_sqlite(db, ids_sala)
+        salas = {linha[0]: linha for linha in db.execute(
+            select(models.Sala.id, models.Sala.nome, models.Sala.capacidade, models.Sala.localizacao)
+            .where(models.Sala.id.in_(ids_sala))
+            .order_by(models.Sala.id)
+            .with_for_update()
+        )} if ids_sala else {}
+        capacidades = {id_sala: linha[2] for id_sala, linha in salas.items()}
+        agendas = {id_sala: agenda for id_sala, agenda in agendas.items() if id_sala in capacidades}
+        if db.get_bind().dialect.name != "postgresql":
+            # Sem a restrição de exclusão, o lote confere o banco recarregando
+            # as agendas (uma consulta para todas) com as salas já travadas
+            for agenda in agendas.values():
+                agenda.invalidar()
+        carregar_agendas(db, agendas.values())
+        no_lote = {id_sala: AgendaSala(id_sala) for id_sala in agendas}
+        inicios: Dict[int, datetime] = {}
+        for _, item in validos:
+            if item.id_sala in agendas:
+                inicios[item.id_sala] = min(item.data_inicio, inicios.get(item.id_sala, item.data_inicio))
+        arquivadas = _agendas_arquivadas(db, inicios)
+
+        for i, item in validos:
+            erro, status = None, "invalida"
+            if item.data_final <= item.data_inicio:
+                erro = "A data final da reserva deve ser posterior à data de início."
+            elif item.id_sala not in capacidades:
+                erro = f"Sala com ID {item.id_sala} não encontrada."
+            elif item.id_usuario not in usuarios:
+                erro = f"Usuário com ID {item.id_usuario} não encontrado."
+            elif item.participantes > capacidades[item.id_sala]:
+                erro = f"A quantidade de participantes ({item.participantes}) excede a capacidade da sala ({capacidades[item.id_sala]})."
+            else:
+                status = "conflito"
+                conflito = agendas[item.id_sala].conflito(item.data_inicio, item.data_final)
+                if conflito is None and item.id_sala in arquivadas:
+                    conflito = arquivadas[item.id_sala].conflito(item.data_inicio, item.data_final)
+                conflito_serie = agendas[item.id_sala].conflito_serie(item.data_inicio, item.data_final)
+                conflito_lote = no_lote[item.id_sala].conflito(item.data_inicio, item.data_final)
+                if conflito is not None:
+                    erro = f"A sala {item.id_sala} já possui a reserva {conflito} no período informado."
+                elif conflito_serie is not None:
+                    erro = f"A sala {item.id_sala} já possui a ocorrência de {conflito_serie[1].isoformat()} da série {conflito_serie[0]} no período informado."
+                elif conflito_lote is not None:
+                    erro = f"Conflita com o item {conflito_lote} do próprio lote."
+            if erro:
+                resultados[i] = schemas.ResultadoItemLote(indice=i, status=status, erro=erro)
+                continue
+            no_lote[item.id_sala].inserir(i, item.data_inicio, item.data_final)
+            aceitos.append((i, item))
+
+        if aceitos:
+            try:
+                novos_ids = db.scalars(
+                    insert(models.Reserva).returning(models.Reserva.id, sort_by_parameter_order=True),
+                    [item.model_dump() for _, item in aceitos],
+                ).all()
+                db.commit()
+            except sa_exc.IntegrityError as e:
+                db.rollback()
+                if _violou_sobreposicao(e):
+                    # Outro processo gravou nestas salas: os índices estão desatualizados
+                    for agenda in agendas.values():
+                        agenda.invalidar()
+                    raise ReservationConflictError("Uma ou mais reservas do lote conflitam com reservas gravadas por outro processo; envie o lote novamente.")
+                raise
+            except Exception:
+                db.rollback()
+                raise
+            for (i, item), reserva_id in zip(aceitos, novos_ids):
+                agendas[item.id_sala].inserir(reserva_id, item.data_inicio, item.data_final)
+                resultados[i] = schemas.ResultadoItemLote(indice=i, status="criada", id=reserva_id)
+                _, sala_nome, sala_capacidade, sala_localizacao = salas[item.id_sala]
+                _, usuario_nome, usuario_email = usuarios[item.id_usuario]
+                eventos.canal.publicar(eventos.CRIADA, serializacao.reserva((
+                    reserva_id, item.id_sala, item.id_usuario, item.data_inicio, item.data_final, item.participantes,
+                    sala_nome, sala_capacidade, sala_localizacao, usuario_nome, usuario_email,
+                )))
+            catalogo.invalidar()
+        else:
+            db.rollback()  # libera as travas das salas
+
+    return schemas.ResultadoLote(
+        criadas=len(aceitos),
+        rejeitadas=len(itens) - len(aceitos),
+        itens=resultados,
+    )
 
 def delete_reserva(db: Session, reserva_id: int) -> bool:
     """
     Deleta uma reserva do banco de dados.
     Retorna True se a reserva foi deletada, False se não foi encontrada.
     """
-    reserva = db.query(models.Reserva).filter(models.Reserva.id == reserva_id).first()
+    reserva = db.query(models.Reserva).options(*_opcoes_reserva()).filter(models.Reserva.id == reserva_id).first()
     if not reserva:
         return False  # Reserva não encontrada
 
-    db.delete(reserva)
-    try:
-        db.commit()
-        return True
-    except Exception as e:
-        db.rollback()
-        raise  # Relança a exceção para ser tratada pelo router
\ No newline at end of file
+    agenda = indice.agenda(reserva.id_sala)
+    with agenda.lock:
+        id_sala, data_inicio = reserva.id_sala, reserva.data_inicio
+        removida = schemas.Reserva.model_validate(reserva, from_attributes=True).model_dump()
+        db.delete(reserva)
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise  # Relança a exceção para ser tratada pelo router
+        if agenda.carregada:
+            agenda.remover(reserva_id, data_inicio)
+        eventos.canal.publicar(eventos.REMOVIDA, removida)
+    catalogo.invalidar()
+    return True
+
+# ===== séries de reservas recorrentes =====
+
+def get_serie_by_id(db: Session, serie_id: int) -> Optional[models.SerieReserva]:
+    """
+    Busca uma série pelo ID.
+    Retorna None se a série não for encontrada.
+    """
+    return db.query(models.SerieReserva).options(*_opcoes_serie()).filter(models.SerieReserva.id == serie_id).first()
+
+def create_serie(db: Session, serie: schemas.SerieReservaCreate) -> models.SerieReserva:
+    """
+    Cria uma série recorrente, gravada como uma única linha.
+    Todas as ocorrências são verificadas de uma vez contra o índice da sala
+    (reservas avulsas e outras séries), já carregado em memória, sem uma
+    consulta por ocorrência. Lança ReservationConflictError no primeiro conflito.
+    """
+    if serie.data_final <= serie.data_inicio:
+        raise ValueError("A data final da reserva deve ser posterior à data de início.")
+    if serie.ocorrencias is None and serie.data_limite is None:
+        raise ValueError("Informe a quantidade de ocorrências ou a data limite da série.")
+
+    regra = Recorrencia(
+        id=None,
+        data_inicio=serie.data_inicio,
+        data_final=serie.data_final,
+        frequencia=serie.frequencia,
+        intervalo=serie.intervalo,
+        ocorrencias=serie.ocorrencias,
+        data_limite=serie.data_limite,
+    )
+    if regra.total == 0:
+        raise ValueError("A série não tem nenhuma ocorrência antes da data limite.")
+    if regra.total > LIMITE_OCORRENCIAS:
+        raise ValueError(f"A série pode ter no máximo {LIMITE_OCORRENCIAS} ocorrências.")
+    if regra.duracao > regra.menor_passo:
+        raise ValueError("A duração de cada ocorrência deve ser menor que o intervalo entre elas.")
+    inicios = {inicio for _, inicio, _ in regra.todas()}
+    invalidas = [excecao for excecao in serie.excecoes if excecao not in inicios]
+    if invalidas:
+        raise ValueError(f"As exceções {', '.join(e.isoformat() for e in invalidas)} não são ocorrências da série.")
+    regra = replace(regra, excecoes=frozenset(serie.excecoes))
+
+    agenda = indice.agenda(serie.id_sala)
+    with agenda.lock:
+        try:
+            sala = _travar_sala(db, serie.id_sala)
+            if not sala:
+                raise ValueError(f"Sala com ID {serie.id_sala} não encontrada.")
+            usuario = db.get(models.Usuario, serie.id_usuario)
+            if not usuario:
+                raise ValueError(f"Usuário com ID {serie.id_usuario} não encontrado.")
+            if serie.participantes > sala.capacidade:
+                raise ValueError(f"A quantidade de participantes ({serie.participantes}) excede a capacidade da sala ({sala.capacidade}).")
+
+            if db.get_bind().dialect.name != "postgresql":
+                agenda.invalidar()  # como no lote: recarrega do banco com a sala travada
+            agenda.carregar(db)
+            arquivada = _agendas_arquivadas(db, {serie.id_sala: regra.data_inicio}).get(serie.id_sala)
+            for _, inicio, final in regra.todas():
+                conflito = agenda.conflito(inicio, final)
+                if conflito is None and arquivada is not None:
+                    conflito = arquivada.conflito(inicio, final)
+                if conflito is not None:
+                    raise ReservationConflictError(
+                        f"A ocorrência de {inicio.isoformat()} conflita com a reserva {conflito} da sala {serie.id_sala}."
+                    )
+                conflito_serie = agenda.conflito_serie(inicio, final)
+                if conflito_serie is not None:
+                    raise ReservationConflictError(
+                        f"A ocorrência de {inicio.isoformat()} conflita com a ocorrência de {conflito_serie[1].isoformat()} da série {conflito_serie[0]}."
+                    )
+        except Exception:
+            db.rollback()  # libera a trava da sala
+            raise
+
+        dados = serie.model_dump(exclude={"excecoes"})
+        db_serie = models.SerieReserva(
+            **dados,
+            fim_serie=regra.fim,
+            excecoes=[models.ExcecaoSerie(data_inicio=excecao) for excecao in sorted(regra.excecoes)],
+        )
+        db.add(db_serie)
+        try:
+            db.commit()
+            db.refresh(db_serie)
+        except Exception:
+            db.rollback()
+            raise
+        agenda.inserir_serie(Recorrencia.de_serie(db_serie))
+    return db_serie
+
+def add_excecao_serie(db: Session, serie_id: int, data_inicio: datetime) -> Optional[models.SerieReserva]:
+    """
+    Cancela uma ocorrência da série, identificada pela data de início.
+    Retorna None se a série não for encontrada.
+    """
+    serie = get_serie_by_id(db, serie_id)
+    if not serie:
+        return None
+    regra = Recorrencia.de_serie(serie)
+    if data_inicio in regra.excecoes:
+        raise ValueError("Esta ocorrência já foi cancelada.")
+    if next(regra.ocorrencias_a_partir(data_inicio), (None, None))[1] != data_inicio:
+        raise ValueError(f"{data_inicio.isoformat()} não é uma ocorrência da série {serie_id}.")
+
+    agenda = indice.agenda(serie.id_sala)
+    with agenda.lock:
+        serie.excecoes.append(models.ExcecaoSerie(data_inicio=data_inicio))
+        try:
+            db.commit()
+            db.refresh(serie)
+        except Exception:
+            db.rollback()
+            raise
+        if agenda.carregada:
+            agenda.inserir_serie(Recorrencia.de_serie(serie))
+    return serie
+
+def delete_serie(db: Session, serie_id: int) -> bool:
+    """
+    Deleta uma série (e todas as suas ocorrências).
+    Retorna True se a série foi deletada, False se não foi encontrada.
+    """
+    serie = db.query(models.SerieReserva).filter(models.SerieReserva.id == serie_id).first()
+    if not serie:
+        return False
+
+    agenda = indice.agenda(serie.id_sala)
+    with agenda.lock:
+        db.delete(serie)
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        agenda.remover_serie(serie_id)
+    return True
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import crud, schemas, serializacao
+
+# Versões assíncronas das consultas do crud, usadas pelas rotas no modo
+# CONEXAO_DB_ASYNC. A lógica de cada consulta continua em crud.py: aqui ela é
+# executada com AsyncSession.run_sync, que roda o código síncrono sobre o
+# driver assíncrono sem ocupar uma thread durante a espera pelo banco.
+# Os objetos são convertidos para os schemas ainda dentro do run_sync, porque
+# relacionamentos carregados sob demanda não podem ser lidos fora dele.
+# Com linhas=True as listagens usam o caminho rápido do crud e retornam
+# dicionários prontos para serializacao.RespostaRapida.
+
+
+def _converter(schema, objetos) -> list:
+    return [schema.model_validate(obj, from_attributes=True) for obj in objetos]
+
+
+def _converter_um(schema, obj):
+    return schema.model_validate(obj, from_attributes=True) if obj is not None else None
+
+
+# ===== usuarios =====
+
+async def get_all_users(db: AsyncSession, expand: bool = True, **filtros) -> Tuple[List[schemas.UsuarioResumo], Optional[str]]:
+    schema = schemas.Usuario if expand else schemas.UsuarioResumo
+    def consulta(sessao: Session):
+        usuarios, proximo_cursor = crud.get_all_users(sessao, expand=expand, **filtros)
+        return _converter(schema, usuarios), proximo_cursor
+    return await db.run_sync(consulta)
+
+async def get_user_by_id(db: AsyncSession, user_id: int, expand: bool = True) -> Optional[schemas.UsuarioResumo]:
+    schema = schemas.Usuario if expand else schemas.UsuarioResumo
+    return await db.run_sync(lambda sessao: _converter_um(schema, crud.get_user_by_id(sessao, user_id, expand=expand)))
+
+
+# ===== salas =====
+
+async def get_all_salas(db: AsyncSession, expand: bool = True, linhas: bool = False, **filtros) -> Tuple[List[Union[schemas.SalaResumo, dict]], Optional[str]]:
+    schema = schemas.Sala if expand else schemas.SalaResumo
+    def consulta(sessao: Session):
+        salas, proximo_cursor = crud.get_all_salas(sessao, expand=expand, linhas=linhas, **filtros)
+        return (salas if linhas else _converter(schema, salas)), proximo_cursor
+    return await db.run_sync(consulta)
+
+async def get_sala_by_id(db: AsyncSession, sala_id: int, expand: bool = True) -> Optional[schemas.SalaResumo]:
+    schema = schemas.Sala if expand else schemas.SalaResumo
+    return await db.run_sync(lambda sessao: _converter_um(schema, crud.get_sala_by_id(sessao, sala_id, expand=expand)))
+
+
+# ===== reservas =====
+
+async def get_all_reservas(db: AsyncSession, linhas: bool = False, **filtros) -> Tuple[List[Union[schemas.Reserva, dict]], Optional[str]]:
+    def consulta(sessao: Session):
+        reservas, proximo_cursor = crud.get_all_reservas(sessao, linhas=linhas, **filtros)
+        if linhas:
+            return serializacao.reservas(reservas), proximo_cursor
+        return _converter(schemas.Reserva, reservas), proximo_cursor
+    return await db.run_sync(consulta)
+
+async def get_reserva_by_id(db: AsyncSession, reserva_id: int) -> Optional[schemas.Reserva]:
+    return await db.run_sync(lambda sessao: _converter_um(schemas.Reserva, crud.get_reserva_by_id(sessao, reserva_id)))
+
+async def get_resrevas_by_period(db: AsyncSession, start_date: datetime, end_date: datetime, linhas: bool = False) -> List[Union[schemas.Reserva, dict]]:
+    if linhas:
+        return await db.run_sync(
+            lambda sessao: serializacao.reservas(crud.get_resrevas_by_period(sessao, start_date, end_date, linhas=True))
+        )
+    return await db.run_sync(
+        lambda sessao: _converter(schemas.Reserva, crud.get_resrevas_by_period(sessao, start_date, end_date))
+    )
@@ -1,20 +1,219 @@
-from sqlalchemy import create_engine
+from fastapi import HTTPException, status
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from typing import Any, Dict
+import anyio
 import os
+import threading
+import time
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("CONEXAO_DB")
 
-engine = create_engine(DATABASE_URL)
+# Modo assíncrono: com CONEXAO_DB_ASYNC=true as rotas de leitura usam um engine
+# assíncrono (aiosqlite/asyncpg), sem ocupar threads enquanto esperam o banco.
+DB_ASYNC = os.getenv("CONEXAO_DB_ASYNC", "false").strip().lower() in ("1", "true", "sim")
+
+# Driver assíncrono usado para cada banco quando a URL não especifica um
+DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+# Pool de conexões (mesmos padrões do SQLAlchemy). Com Postgres, a soma de
+# TAMANHO + EXCESSO de todos os workers deve caber no max_connections do banco.
+POOL_TAMANHO = int(os.getenv("CONEXAO_DB_POOL_TAMANHO", "5"))
+POOL_EXCESSO = int(os.getenv("CONEXAO_DB_POOL_EXCESSO", "10"))  # conexões além do tamanho, fechadas ao voltar
+POOL_TIMEOUT = float(os.getenv("CONEXAO_DB_POOL_TIMEOUT", "30"))  # segundos esperando uma conexão livre
+POOL_PRE_PING = os.getenv("CONEXAO_DB_POOL_PRE_PING", "false").strip().lower() in ("1", "true", "sim")
+POOL_RECICLAR = int(os.getenv("CONEXAO_DB_POOL_RECICLAR", "-1"))  # idade máxima da conexão em segundos (-1: sem limite)
+
+# SQLite: o modo WAL deixa os leitores trabalharem enquanto um escritor grava
+# (no modo padrão, rollback journal, eles esperam o commit), e com ele
+# synchronous=NORMAL é seguro contra corrupção, sem um fsync por commit.
+# O busy_timeout faz quem encontra o banco travado esperar em vez de falhar
+# na hora com "database is locked".
+SQLITE_WAL = os.getenv("CONEXAO_DB_SQLITE_WAL", "true").strip().lower() in ("1", "true", "sim")
+SQLITE_SYNCHRONOUS = os.getenv("CONEXAO_DB_SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("CONEXAO_DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+class _EsperaMedida:
+    """
+    Mistura para os pools com fila que mede o tempo de cada checkout (espera
+    por uma conexão livre, ou abertura de uma nova) e conta os timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_medicao = threading.Lock()
+        self.checkouts = 0
+        self.tempo_espera = 0.0
+        self.maior_espera = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        comeco = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._lock_medicao:
+                self.timeouts += 1
+            raise
+        finally:
+            duracao = time.perf_counter() - comeco
+            with self._lock_medicao:
+                self.checkouts += 1
+                self.tempo_espera += duracao
+                self.maior_espera = max(self.maior_espera, duracao)
+
+
+class PoolMedido(_EsperaMedida, QueuePool):
+    pass
+
+
+class PoolMedidoAsync(_EsperaMedida, AsyncAdaptedQueuePool):
+    pass
+
+
+def _sqlite_memoria(url) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def opcoes_engine(url: str, assincrono: bool = False) -> Dict[str, Any]:
+    """
+    Argumentos de create_engine/create_async_engine para a URL. O SQLite em
+    memória mantém o pool padrão do SQLAlchemy (uma única conexão).
+    """
+    url = make_url(url)
+    if _sqlite_memoria(url):
+        return {}
+    return {
+        "poolclass": PoolMedidoAsync if assincrono else PoolMedido,
+        "pool_size": POOL_TAMANHO,
+        "max_overflow": POOL_EXCESSO,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_pre_ping": POOL_PRE_PING,
+        "pool_recycle": POOL_RECICLAR,
+    }
+
+
+def configurar_sqlite(engine: Engine) -> None:
+    """
+    Aplica os pragmas do SQLite (WAL, synchronous, busy_timeout) a cada
+    conexão nova do engine; não faz nada com outros bancos.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    wal = SQLITE_WAL and not _sqlite_memoria(engine.url)
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        finally:
+            cursor.close()
+
+
+def estatisticas_pool(engine: Engine) -> Dict[str, Any]:
+    """
+    Estado atual do pool de conexões do engine: conexões em uso, ociosas e
+    além do tamanho (excesso), e os tempos de checkout desde a criação do pool.
+    """
+    pool = engine.pool
+    estatisticas: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        estatisticas.update({
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "excesso": max(pool.overflow(), 0),
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _EsperaMedida):
+        with pool._lock_medicao:
+            estatisticas.update({
+                "checkouts": pool.checkouts,
+                "espera_total_segundos": pool.tempo_espera,
+                "espera_media_segundos": pool.tempo_espera / pool.checkouts if pool.checkouts else 0.0,
+                "espera_maxima_segundos": pool.maior_espera,
+                "timeouts": pool.timeouts,
+            })
+    return estatisticas
+
+
+engine = create_engine(DATABASE_URL, **opcoes_engine(DATABASE_URL))
+configurar_sqlite(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 teste = 'teste'
-def get_db():
+
+# Sessões das rotas (get_db) abertas ao mesmo tempo: no máximo uma por conexão
+# do pool. As rotas síncronas rodam no threadpool do AnyIO (40 threads), e a
+# validação da resposta delas também passa por ele. Sem este limite, com mais
+# requisições que conexões, as 40 threads podiam ficar todas esperando no
+# checkout do pool por conexões presas a requisições que já tinham terminado
+# o endpoint, mas esperavam uma thread livre para montar a resposta e fechar
+# a sessão: tudo parava até o POOL_TIMEOUT. A espera pela vaga é feita no
+# loop de eventos, sem ocupar thread, e dura no máximo POOL_TIMEOUT; depois
+# disso a requisição recebe 503 com Retry-After.
+sessoes = anyio.CapacityLimiter(POOL_TAMANHO + POOL_EXCESSO)
+
+
+async def get_db():
+    vaga = object()
+    try:
+        with anyio.fail_after(POOL_TIMEOUT):
+            await sessoes.acquire_on_behalf_of(vaga)
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Nenhuma conexão com o banco disponível; tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
     db = SessionLocal()
-    try: 
+    try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        # O close pode ir ao banco (rollback): numa thread, e até o fim mesmo
+        # se o cliente desconectar
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(db.close)
+        sessoes.release_on_behalf_of(vaga)
+
+
+def url_async(url: str) -> str:
+    """
+    Converte a URL de conexão síncrona para o driver assíncrono equivalente.
+    """
+    url_sync = make_url(url)
+    drivername = DRIVERS_ASYNC.get(url_sync.get_backend_name(), url_sync.drivername)
+    return url_sync.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    # Importado só no modo assíncrono: depende do driver async estar instalado
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(url_async(DATABASE_URL), **opcoes_engine(DATABASE_URL, assincrono=True))
+    configurar_sqlite(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+import serializacao
+
+# Feed de alterações das reservas (criadas e removidas) em Server-Sent Events,
+# para os painéis das salas acompanharem a agenda sem fazer polling de
+# /reservas/intervalo.
+# O crud publica cada alteração depois do commit; o evento é serializado uma
+# única vez (o quadro SSE já pronto, em bytes) e guardado num histórico
+# circular. Os assinantes não recebem cópias: cada um lê o histórico a partir
+# do último evento que viu, filtra por sala/localização e espera o próximo
+# sinal. Uma escrita acorda só os assinantes da sala/localização (ou sem
+# filtro), sem nenhuma consulta ao banco.
+# Cada evento tem um ID "<época>-<seq>"; o cliente que reconecta informa o
+# último ID recebido (cabeçalho Last-Event-ID, enviado automaticamente pelo
+# EventSource, ou ?desde=) e recebe só o que perdeu. Se o ID não está mais no
+# histórico, ou é de outra execução do servidor, o cliente recebe o evento
+# "reinicio" e deve recarregar a agenda antes de seguir aplicando eventos.
+# Obs.: como o índice de reservas, o canal vive no processo; com vários
+# workers cada um só vê as escritas feitas por ele.
+
+# Quantidade de eventos guardados para a retomada
+HISTORICO = int(os.getenv("EVENTOS_HISTORICO", "10000"))
+# Intervalo entre comentários de keepalive em uma conexão sem eventos
+KEEPALIVE_SEGUNDOS = float(os.getenv("EVENTOS_KEEPALIVE_SEGUNDOS", "15"))
+# Espera sugerida ao navegador antes de reconectar (campo retry do SSE)
+RECONEXAO_MS = 3000
+
+CRIADA = "criada"
+REMOVIDA = "removida"
+REINICIO = "reinicio"
+
+# Tópico dos assinantes sem filtro
+TODAS = "todas"
+
+
+@dataclass(frozen=True)
+class Evento:
+    seq: int
+    tipo: str
+    id_sala: int
+    localizacao: str
+    quadro: bytes  # evento SSE completo, compartilhado por todos os assinantes
+
+    def topicos(self) -> Tuple[Hashable, ...]:
+        return (TODAS, ("sala", self.id_sala), ("localizacao", self.localizacao))
+
+
+@dataclass(frozen=True)
+class Filtro:
+    """
+    Salas e/ou localização que interessam a um assinante (vazio: todas).
+    """
+
+    salas: FrozenSet[int] = frozenset()
+    localizacao: Optional[str] = None
+
+    def aceita(self, evento: Evento) -> bool:
+        return ((not self.salas or evento.id_sala in self.salas)
+                and (self.localizacao is None or evento.localizacao == self.localizacao))
+
+    def topicos(self) -> Tuple[Hashable, ...]:
+        # O assinante só é acordado pelos eventos dos seus tópicos
+        if self.salas:
+            return tuple(("sala", id_sala) for id_sala in self.salas)
+        if self.localizacao is not None:
+            return (("localizacao", self.localizacao),)
+        return (TODAS,)
+
+
+class IdEventoInvalidoError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class CanalReservas:
+    """
+    Pub/sub em memória das alterações de reservas.
+    publicar pode ser chamado de qualquer thread; os assinantes rodam no event
+    loop, cada um com o seu sinal (asyncio.Event) inscrito nos tópicos do seu
+    filtro, então um evento só acorda quem se interessa por ele.
+    """
+
+    def __init__(self, historico: int = HISTORICO):
+        self.epoca = format(time.time_ns(), "x")
+        self._eventos: Deque[Evento] = deque(maxlen=historico)
+        self._seq = 0
+        self._lock = threading.Lock()
+        # loop -> tópico -> sinais dos assinantes
+        self._inscritos: Dict[asyncio.AbstractEventLoop, Dict[Hashable, Set[asyncio.Event]]] = {}
+        self.assinantes = 0
+        self.publicados = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publicar(self, tipo: str, reserva: dict) -> Evento:
+        """
+        Registra o evento e acorda os assinantes interessados. reserva segue o
+        formato de schemas.Reserva (sala com localizacao).
+        """
+        with self._lock:
+            self._seq += 1
+            id_evento = f"{self.epoca}-{self._seq}"
+            dados = serializacao.dumps({"id": id_evento, "tipo": tipo, "reserva": reserva})
+            evento = Evento(
+                seq=self._seq,
+                tipo=tipo,
+                id_sala=reserva["id_sala"],
+                localizacao=reserva["sala"]["localizacao"],
+                quadro=b"id: %s\nevent: %s\ndata: %s\n\n" % (id_evento.encode(), tipo.encode(), dados),
+            )
+            self._eventos.append(evento)
+            self.publicados += 1
+            loops = list(self._inscritos)
+        topicos = evento.topicos()
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._acordar, loop, topicos)
+            except RuntimeError:  # loop encerrado
+                with self._lock:
+                    self._inscritos.pop(loop, None)
+        return evento
+
+    def _acordar(self, loop: asyncio.AbstractEventLoop, topicos: Tuple[Hashable, ...]) -> None:
+        with self._lock:
+            por_topico = self._inscritos.get(loop, {})
+            sinais = [sinal for topico in topicos for sinal in por_topico.get(topico, ())]
+        for sinal in sinais:
+            sinal.set()
+
+    def _inscrever(self, sinal: asyncio.Event, topicos: Tuple[Hashable, ...]) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            por_topico = self._inscritos.setdefault(loop, {})
+            for topico in topicos:
+                por_topico.setdefault(topico, set()).add(sinal)
+
+    def _desinscrever(self, sinal: asyncio.Event, topicos: Tuple[Hashable, ...]) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            por_topico = self._inscritos.get(loop, {})
+            for topico in topicos:
+                sinais = por_topico.get(topico)
+                if sinais is not None:
+                    sinais.discard(sinal)
+                    if not sinais:
+                        del por_topico[topico]
+            if not por_topico:
+                self._inscritos.pop(loop, None)
+
+    def seq_de(self, id_evento: Optional[str]) -> Optional[int]:
+        """
+        Converte o ID de um evento na sequência a partir da qual retomar.
+        Retorna None se o ID for de outra execução do servidor.
+        """
+        if not id_evento:
+            return self._seq
+        epoca, _, seq = id_evento.partition("-")
+        if not seq.isdigit():
+            raise IdEventoInvalidoError(f"ID de evento inválido: {id_evento!r}.")
+        return int(seq) if epoca == self.epoca else None
+
+    def _depois(self, seq: int) -> Tuple[List[Evento], bool]:
+        """
+        Eventos posteriores a seq e se algum deles já saiu do histórico (ou se
+        seq é posterior ao último evento).
+        """
+        with self._lock:
+            if seq >= self._seq:
+                return [], seq > self._seq
+            primeiro = self._eventos[0].seq if self._eventos else self._seq + 1
+            eventos = list(islice(self._eventos, max(seq + 1 - primeiro, 0), None))
+            return eventos, seq + 1 < primeiro
+
+    def _reinicio(self) -> bytes:
+        id_evento = f"{self.epoca}-{self._seq}"
+        dados = serializacao.dumps({"id": id_evento, "tipo": REINICIO})
+        return b"id: %s\nevent: %s\ndata: %s\n\n" % (id_evento.encode(), REINICIO.encode(), dados)
+
+    async def assinar(self, desde: Optional[int], filtro: Filtro = Filtro(),
+                      keepalive: float = KEEPALIVE_SEGUNDOS) -> AsyncIterator[bytes]:
+        """
+        Gera o fluxo SSE de um assinante: os eventos posteriores a desde (None
+        quando a retomada não é possível) que passam pelo filtro, e depois os
+        novos, à medida que são publicados.
+        """
+        sinal = asyncio.Event()
+        topicos = filtro.topicos()
+        self._inscrever(sinal, topicos)
+        self.assinantes += 1
+        try:
+            yield b"retry: %d\n\n" % RECONEXAO_MS
+            if desde is None:
+                yield self._reinicio()
+                desde = self._seq
+            while True:
+                # Limpo antes da leitura: um evento publicado depois dela volta a acordá-lo
+                sinal.clear()
+                eventos, perdidos = self._depois(desde)
+                if perdidos:
+                    yield self._reinicio()
+                    desde = self._seq
+                    continue
+                if eventos:
+                    desde = eventos[-1].seq
+                    quadros = b"".join(evento.quadro for evento in eventos if filtro.aceita(evento))
+                    if quadros:
+                        yield quadros
+                    continue
+                try:
+                    await asyncio.wait_for(sinal.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.assinantes -= 1
+            self._desinscrever(sinal, topicos)
+
+
+canal = CanalReservas()
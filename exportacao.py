@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator
+
+import crud
+from database import SessionLocal
+from recorrencia import Ocorrencia
+
+# Exportação de reservas em streaming (NDJSON ou CSV).
+# As linhas vêm do banco em lotes (yield_per) e são serializadas lote a lote,
+# então a memória usada não depende de quantas reservas caem no período.
+# As ocorrências das séries recorrentes entram na ordem de data_inicio, com
+# id vazio e id_serie preenchido (nas reservas avulsas, o contrário).
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+COLUNAS_CSV = [
+    "id", "id_serie", "id_sala", "id_usuario", "data_inicio", "data_final", "participantes",
+    "sala_nome", "sala_capacidade", "sala_localizacao", "usuario_nome", "usuario_email",
+]
+
+TAMANHO_LOTE = 1000
+
+
+def _campos(linha) -> Dict[str, Any]:
+    # COLUNAS_CSV de uma linha de reserva ou de uma recorrencia.Ocorrencia
+    if isinstance(linha, Ocorrencia):  # sala e usuário vêm da série
+        return {
+            "id": None,
+            "id_serie": linha.id_serie,
+            "id_sala": linha.id_sala,
+            "id_usuario": linha.id_usuario,
+            "data_inicio": linha.data_inicio,
+            "data_final": linha.data_final,
+            "participantes": linha.participantes,
+            "sala_nome": linha.sala.nome,
+            "sala_capacidade": linha.sala.capacidade,
+            "sala_localizacao": linha.sala.localizacao,
+            "usuario_nome": linha.usuario.nome,
+            "usuario_email": linha.usuario.email,
+        }
+    return {**linha._mapping, "id_serie": None}
+
+
+def _ndjson(linhas) -> Iterator[str]:
+    buffer = []
+    for linha in linhas:
+        campos = _campos(linha)
+        buffer.append(json.dumps({
+            "id_sala": campos["id_sala"],
+            "id_usuario": campos["id_usuario"],
+            "data_inicio": campos["data_inicio"].isoformat(),
+            "data_final": campos["data_final"].isoformat(),
+            "id": campos["id"],
+            "id_serie": campos["id_serie"],
+            "sala": {"nome": campos["sala_nome"], "capacidade": campos["sala_capacidade"], "localizacao": campos["sala_localizacao"]},
+            "usuario": {"nome": campos["usuario_nome"], "email": campos["usuario_email"]},
+            "participantes": campos["participantes"],
+        }, ensure_ascii=False))
+        if len(buffer) == TAMANHO_LOTE:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def _valor_csv(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def _csv(linhas) -> Iterator[str]:
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(COLUNAS_CSV)
+    for n, linha in enumerate(linhas, start=1):
+        campos = _campos(linha)
+        escritor.writerow([_valor_csv(campos[coluna]) for coluna in COLUNAS_CSV])
+        if n % TAMANHO_LOTE == 0:
+            yield saida.getvalue()
+            saida.seek(0)
+            saida.truncate()
+    yield saida.getvalue()
+
+
+def exportar_reservas(start_date: datetime, end_date: datetime, formato: str) -> Iterator[str]:
+    """
+    Gera o conteúdo da exportação em pedaços, para uso com StreamingResponse.
+    Usa uma sessão própria, que fica aberta enquanto a resposta é enviada.
+    """
+    serializar = _ndjson if formato == "ndjson" else _csv
+    with SessionLocal() as db:
+        linhas = crud.iter_reservas_by_period(db, start_date, end_date, tamanho_lote=TAMANHO_LOTE)
+        yield from serializar(linhas)
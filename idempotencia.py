@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+import models
+from cache import CacheTTL
+from database import SessionLocal
+
+# Idempotency-Key nos POSTs de criação (reservas, salas, usuários, ...).
+# O cliente manda um valor único por operação no cabeçalho Idempotency-Key e o
+# repete nas novas tentativas. A primeira requisição segue normalmente e a sua
+# resposta é guardada; as repetições recebem a mesma resposta (com o
+# cabeçalho Idempotent-Replayed: true) sem passar pelo endpoint nem pelo banco.
+# Uma repetição que chega enquanto a primeira ainda está em andamento espera
+# por ela. Reusar a chave com outro corpo é um erro do cliente (422).
+# O corpo não é guardado nem lido antes do endpoint: o digest que identifica
+# o corpo é calculado pedaço a pedaço, à medida que o endpoint o lê (o NDJSON
+# de POST /reservas/lote continua chegando em streaming). O que o endpoint
+# não ler é consumido no fim, só para completar o digest.
+# A chave vale por método e caminho. Respostas 5xx não são guardadas: a nova
+# tentativa executa de novo.
+# As respostas ficam num LRU em memória com TTL; com IDEMPOTENCIA_PERSISTIR=true
+# também na tabela respostas_idempotentes, e assim valem entre workers e
+# reinícios (a espera pela requisição em andamento é só dentro do processo).
+
+CABECALHO = "idempotency-key"
+CABECALHO_REPETICAO = "Idempotent-Replayed"
+
+TAMANHO_MAXIMO = int(os.getenv("IDEMPOTENCIA_TAMANHO_MAXIMO", "10000"))
+TTL_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", str(24 * 60 * 60)))
+PERSISTIR = os.getenv("IDEMPOTENCIA_PERSISTIR", "false").strip().lower() in ("1", "true", "sim")
+# Quanto uma repetição espera pela requisição original em andamento
+ESPERA_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_ESPERA_SEGUNDOS", "30"))
+
+METODOS = ("POST",)
+TAMANHO_MAXIMO_CHAVE = 255
+# A cada quantas respostas gravadas na tabela as expiradas são apagadas
+LIMPEZA_A_CADA = 1000
+
+Chave = Tuple[str, str, str]  # método, caminho, valor do cabeçalho
+
+
+@dataclass(frozen=True)
+class RespostaGuardada:
+    digest: str
+    status: int
+    cabecalhos: List[Tuple[bytes, bytes]]
+    corpo: bytes
+
+
+def _chave_tabela(chave: Chave) -> str:
+    return " ".join(chave)
+
+
+class ArmazemIdempotencia:
+    """
+    Respostas já enviadas, por chave: LRU em memória com TTL e, opcionalmente,
+    a tabela respostas_idempotentes.
+    """
+
+    def __init__(self, tamanho_maximo: int = TAMANHO_MAXIMO, ttl_segundos: float = TTL_SEGUNDOS,
+                 persistir: bool = PERSISTIR):
+        self._cache = CacheTTL(tamanho_maximo, ttl_segundos)
+        self.ttl = timedelta(seconds=ttl_segundos)
+        self.persistir = persistir
+        self._lock = threading.Lock()
+        self._gravadas = 0
+        # Requisições em andamento, com o evento marcado quando terminam
+        self.em_andamento: Dict[Chave, asyncio.Event] = {}
+        self.repeticoes = 0
+        self.esperas = 0
+        self.conflitos = 0
+
+    async def obter(self, chave: Chave) -> Optional[RespostaGuardada]:
+        resposta = self._cache.obter(chave)
+        if resposta is None and self.persistir:
+            resposta = await run_in_threadpool(self._ler, chave)
+            if resposta is not None:
+                self._cache.definir(chave, resposta)
+        return resposta
+
+    async def guardar(self, chave: Chave, resposta: RespostaGuardada) -> None:
+        self._cache.definir(chave, resposta)
+        if self.persistir:
+            await run_in_threadpool(self._gravar, chave, resposta)
+
+    def _ler(self, chave: Chave) -> Optional[RespostaGuardada]:
+        with SessionLocal() as db:
+            linha = db.get(models.RespostaIdempotente, _chave_tabela(chave))
+            if linha is None or linha.criada_em < datetime.now() - self.ttl:
+                return None
+            return RespostaGuardada(
+                digest=linha.digest,
+                status=linha.status,
+                cabecalhos=[(nome.encode("latin-1"), valor.encode("latin-1"))
+                            for nome, valor in json.loads(linha.cabecalhos)],
+                corpo=linha.corpo,
+            )
+
+    def _gravar(self, chave: Chave, resposta: RespostaGuardada) -> None:
+        with self._lock:
+            self._gravadas += 1
+            limpar = self._gravadas % LIMPEZA_A_CADA == 0
+        with SessionLocal() as db:
+            agora = datetime.now()
+            if limpar:
+                db.execute(delete(models.RespostaIdempotente)
+                           .where(models.RespostaIdempotente.criada_em < agora - self.ttl))
+            # Uma linha expirada com a mesma chave é substituída
+            db.execute(delete(models.RespostaIdempotente)
+                       .where(models.RespostaIdempotente.chave == _chave_tabela(chave),
+                              models.RespostaIdempotente.criada_em < agora - self.ttl))
+            db.add(models.RespostaIdempotente(
+                chave=_chave_tabela(chave),
+                digest=resposta.digest,
+                status=resposta.status,
+                cabecalhos=json.dumps([[nome.decode("latin-1"), valor.decode("latin-1")]
+                                       for nome, valor in resposta.cabecalhos]),
+                corpo=resposta.corpo,
+                criada_em=agora,
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Outro worker gravou a mesma chave primeiro; vale a dele
+                db.rollback()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "repeticoes": self.repeticoes,
+            "esperas": self.esperas,
+            "conflitos": self.conflitos,
+            "em_andamento": len(self.em_andamento),
+            "respostas": {**self._cache.estatisticas(), "persistir": self.persistir},
+        }
+
+
+armazem = ArmazemIdempotencia()
+
+
+class MiddlewareIdempotencia:
+    """
+    Middleware ASGI que responde as repetições de um POST com Idempotency-Key
+    com a resposta guardada da primeira requisição.
+    """
+
+    def __init__(self, app, armazem_respostas: ArmazemIdempotencia = armazem,
+                 espera_segundos: float = ESPERA_SEGUNDOS):
+        self.app = app
+        self.armazem = armazem_respostas
+        self.espera_segundos = espera_segundos
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS:
+            await self.app(scope, receive, send)
+            return
+        valor = Headers(scope=scope).get(CABECALHO)
+        if valor is None:
+            await self.app(scope, receive, send)
+            return
+        if not valor or len(valor) > TAMANHO_MAXIMO_CHAVE:
+            resposta = JSONResponse(
+                {"detail": f"O cabeçalho Idempotency-Key deve ter entre 1 e {TAMANHO_MAXIMO_CHAVE} caracteres."},
+                status_code=400,
+            )
+            await resposta(scope, receive, send)
+            return
+
+        corpo = CorpoComDigest(receive)
+        chave = (scope["method"], scope["path"], valor)
+
+        while True:
+            guardada = await self.armazem.obter(chave)
+            if guardada is not None:
+                await self._repetir(guardada, corpo, scope, send)
+                return
+            evento = self.armazem.em_andamento.get(chave)
+            if evento is None:
+                break
+            # A primeira requisição ainda está em andamento: espera por ela e
+            # olha de novo (se ela terminou com 5xx, esta executa no lugar dela)
+            self.armazem.esperas += 1
+            try:
+                await asyncio.wait_for(evento.wait(), self.espera_segundos)
+            except asyncio.TimeoutError:
+                resposta = JSONResponse(
+                    {"detail": "Uma requisição com o mesmo Idempotency-Key ainda está em andamento."},
+                    status_code=409,
+                )
+                await resposta(scope, receive, send)
+                return
+
+        evento = asyncio.Event()
+        self.armazem.em_andamento[chave] = evento
+        try:
+            await self._executar(chave, corpo, scope, send)
+        finally:
+            del self.armazem.em_andamento[chave]
+            evento.set()
+
+    async def _executar(self, chave: Chave, corpo: "CorpoComDigest", scope, send) -> None:
+        status_resposta = 500
+        cabecalhos: List[Tuple[bytes, bytes]] = []
+        partes: List[bytes] = []
+
+        async def enviar(message):
+            nonlocal status_resposta, cabecalhos
+            if message["type"] == "http.response.start":
+                status_resposta = message["status"]
+                cabecalhos = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                partes.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, corpo, enviar)
+        digest = await corpo.digest()
+        # Sem o corpo inteiro (cliente desconectou) não há digest para comparar
+        if status_resposta < 500 and digest is not None:
+            await self.armazem.guardar(chave, RespostaGuardada(digest, status_resposta, cabecalhos, b"".join(partes)))
+
+    async def _repetir(self, guardada: RespostaGuardada, corpo: "CorpoComDigest", scope, send) -> None:
+        if guardada.digest != await corpo.digest():
+            self.armazem.conflitos += 1
+            resposta = JSONResponse(
+                {"detail": "O Idempotency-Key já foi usado com outro corpo de requisição."},
+                status_code=422,
+            )
+            await resposta(scope, corpo, send)
+            return
+        self.armazem.repeticoes += 1
+        await send({
+            "type": "http.response.start",
+            "status": guardada.status,
+            "headers": guardada.cabecalhos + [(CABECALHO_REPETICAO.lower().encode("latin-1"), b"true")],
+        })
+        await send({"type": "http.response.body", "body": guardada.corpo})
+
+
+class CorpoComDigest:
+    """
+    receive do ASGI que repassa o corpo da requisição sem guardá-lo,
+    calculando o SHA-256 dos pedaços que passam.
+    """
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._sha = hashlib.sha256()
+        self.completo = False
+        self.desconectado = False
+
+    async def __call__(self):
+        message = await self._receive()
+        if message["type"] == "http.request":
+            self._sha.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                self.completo = True
+        elif message["type"] == "http.disconnect":
+            self.desconectado = True
+        return message
+
+    async def digest(self) -> Optional[str]:
+        """
+        Lê (e descarta) o resto do corpo e retorna o digest do corpo inteiro,
+        ou None se o cliente desconectou antes do fim.
+        """
+        while not self.completo and not self.desconectado:
+            await self()
+        return self._sha.hexdigest() if self.completo else None
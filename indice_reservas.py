@@ -0,0 +1,285 @@
+import threading
+import time
+from itertools import groupby, islice
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+import calendario, models
+from recorrencia import Recorrencia
+
+# Índice em memória das reservas de cada sala.
+# Cada sala guarda seus intervalos ordenados pela data de início e sem
+# sobreposição, então a verificação de conflito é uma busca binária (O(log n))
+# em vez de uma varredura na tabela de reservas.
+# O índice é carregado sob demanda (na primeira consulta a uma sala) e
+# atualizado pelo crud a cada criação/remoção de reserva.
+# As séries recorrentes da sala ficam na agenda só como regras (Recorrencia):
+# as ocorrências são calculadas apenas na janela de cada verificação.
+# Obs.: o índice vive no processo; com vários workers cada um mantém o seu.
+# Cada agenda guarda também os mapas de ocupação por dia já consultados
+# (calendario.py), atualizados junto com os intervalos.
+
+# Os intervalos ficam em blocos ordenados de tamanho limitado, para que a
+# inserção fora de ordem não precise deslocar o histórico inteiro da sala.
+TAMANHO_BLOCO = 512
+
+# Máximo de dias com mapa guardado por sala (acima disso os mapas são descartados)
+MAPAS_POR_SALA = 1000
+
+Intervalo = Tuple[datetime, datetime, int]  # (data_inicio, data_final, id)
+_inicio = itemgetter(0)
+
+
+class AgendaSala:
+    """
+    Intervalos reservados de uma única sala, ordenados por data de início.
+    """
+
+    def __init__(self, id_sala: int):
+        self.id_sala = id_sala
+        self._blocos: List[List[Intervalo]] = []
+        self._chaves: List[datetime] = []  # data de início do primeiro intervalo de cada bloco
+        self._total = 0
+        self.series: Dict[int, Recorrencia] = {}
+        self._mapas: Dict[date, int] = {}  # dia -> mapa de ocupação (calendario)
+        self.carregada = False
+        self.carregada_em = 0.0  # time.monotonic() do último carregamento
+        # Serializa verificação + escrita de reservas da mesma sala.
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._total
+
+    def carregar(self, db: Session) -> None:
+        """
+        Carrega os intervalos da sala a partir da tabela de reservas.
+        Não faz nada se a agenda já estiver carregada.
+        """
+        if self.carregada:
+            return
+        linhas = db.execute(
+            select(models.Reserva.data_inicio, models.Reserva.data_final, models.Reserva.id)
+            .where(models.Reserva.id_sala == self.id_sala)
+            .order_by(models.Reserva.data_inicio, models.Reserva.id)
+        ).all()
+        series = db.scalars(
+            select(models.SerieReserva)
+            .options(selectinload(models.SerieReserva.excecoes))
+            .where(models.SerieReserva.id_sala == self.id_sala)
+        ).all()
+        self.preencher([tuple(linha) for linha in linhas], [Recorrencia.de_serie(serie) for serie in series])
+
+    def invalidar(self) -> None:
+        """
+        Marca a agenda como desatualizada (ex.: outro processo gravou na sala);
+        ela é recarregada na próxima chamada a carregar.
+        """
+        self.carregada = False
+
+    def preencher(self, intervalos: List[Intervalo], series: Iterable[Recorrencia] = ()) -> None:
+        """
+        Substitui o conteúdo da agenda por intervalos já ordenados por data de
+        início e pelas séries recorrentes da sala.
+        """
+        self._blocos = [intervalos[i:i + TAMANHO_BLOCO] for i in range(0, len(intervalos), TAMANHO_BLOCO)]
+        self._chaves = [bloco[0][0] for bloco in self._blocos]
+        self._total = len(intervalos)
+        self.series = {serie.id: serie for serie in series}
+        self._mapas.clear()
+        self.carregada = True
+        self.carregada_em = time.monotonic()
+
+    def conflito(self, inicio: datetime, final: datetime) -> Optional[int]:
+        """
+        Retorna o ID da reserva que se sobrepõe ao intervalo [inicio, final),
+        ou None se o intervalo estiver livre.
+        """
+        # Como os intervalos não se sobrepõem, as datas finais também estão
+        # ordenadas: basta olhar o último intervalo que começa antes de 'final'.
+        b = bisect_left(self._chaves, final) - 1
+        if b < 0:
+            return None
+        bloco = self._blocos[b]
+        anterior = bloco[bisect_left(bloco, final, key=_inicio) - 1]
+        if anterior[1] > inicio:
+            return anterior[2]
+        return None
+
+    def intervalos(self, inicio: datetime, final: datetime) -> Iterator[Intervalo]:
+        """
+        Percorre, em ordem, os intervalos que se sobrepõem a [inicio, final).
+        """
+        # Só o último intervalo que começa até 'inicio' pode terminar depois dele
+        b = max(bisect_right(self._chaves, inicio) - 1, 0)
+        primeiro = True
+        for bloco in islice(self._blocos, b, None):
+            i = max(bisect_right(bloco, inicio, key=_inicio) - 1, 0) if primeiro else 0
+            primeiro = False
+            for intervalo in islice(bloco, i, None):
+                if intervalo[0] >= final:
+                    return
+                if intervalo[1] > inicio:
+                    yield intervalo
+
+    def mapa_dia(self, dia: date) -> int:
+        """
+        Mapa de ocupação do dia (ver calendario.py), calculado na primeira
+        consulta e mantido por inserir/remover.
+        """
+        mapa = self._mapas.get(dia)
+        if mapa is None:
+            inicio = calendario.meia_noite(dia)
+            final = calendario.meia_noite(dia + timedelta(days=1))
+            mapa = 0
+            for comeco, fim, _ in self.intervalos(inicio, final):
+                mapa |= calendario.mascara(comeco, fim, dia)
+            for serie in self.series.values():
+                for _, comeco, fim in serie.ocorrencias_entre(inicio, final):
+                    mapa |= calendario.mascara(comeco, fim, dia)
+            if len(self._mapas) >= MAPAS_POR_SALA:
+                self._mapas.clear()
+            self._mapas[dia] = mapa
+        return mapa
+
+    def conflito_serie(self, inicio: datetime, final: datetime) -> Optional[Tuple[int, datetime]]:
+        """
+        Retorna (id da série, início da ocorrência) da primeira ocorrência de
+        uma série da sala que se sobrepõe a [inicio, final), ou None.
+        """
+        for serie in self.series.values():
+            if serie.data_inicio >= final:
+                continue
+            ocorrencia = serie.conflito(inicio, final)
+            if ocorrencia is not None:
+                return serie.id, ocorrencia[1]
+        return None
+
+    def inserir_serie(self, serie: Recorrencia) -> None:
+        self.series[serie.id] = serie
+        self._mapas.clear()  # a série pode ocupar qualquer dia
+
+    def remover_serie(self, serie_id: int) -> None:
+        self.series.pop(serie_id, None)
+        self._mapas.clear()
+
+    def inserir(self, reserva_id: int, inicio: datetime, final: datetime) -> None:
+        if self._mapas:
+            for dia in calendario.dias(inicio, final):
+                if dia in self._mapas:
+                    self._mapas[dia] |= calendario.mascara(inicio, final, dia)
+
+        if not self._blocos:
+            self._blocos.append([(inicio, final, reserva_id)])
+            self._chaves.append(inicio)
+            self._total = 1
+            return
+
+        b = max(bisect_right(self._chaves, inicio) - 1, 0)
+        bloco = self._blocos[b]
+        insort(bloco, (inicio, final, reserva_id), key=_inicio)
+        self._chaves[b] = bloco[0][0]
+        self._total += 1
+
+        if len(bloco) > 2 * TAMANHO_BLOCO:
+            novo = bloco[TAMANHO_BLOCO:]
+            del bloco[TAMANHO_BLOCO:]
+            self._blocos.insert(b + 1, novo)
+            self._chaves.insert(b + 1, novo[0][0])
+
+    def remover(self, reserva_id: int, inicio: datetime) -> bool:
+        """
+        Remove a reserva do índice.
+        Retorna True se a reserva foi encontrada.
+        """
+        # Reservas com a mesma data de início podem estar na divisa entre dois blocos.
+        b = max(bisect_left(self._chaves, inicio) - 1, 0)
+        while b < len(self._blocos):
+            bloco = self._blocos[b]
+            i = bisect_left(bloco, inicio, key=_inicio)
+            while i < len(bloco) and bloco[i][0] == inicio:
+                if bloco[i][2] == reserva_id:
+                    # Outra reserva pode dividir um slot com esta: os dias são recalculados
+                    for dia in calendario.dias(inicio, bloco[i][1]):
+                        self._mapas.pop(dia, None)
+                    del bloco[i]
+                    self._total -= 1
+                    if bloco:
+                        self._chaves[b] = bloco[0][0]
+                    else:
+                        del self._blocos[b]
+                        del self._chaves[b]
+                    return True
+                i += 1
+            if i < len(bloco):
+                break
+            b += 1
+        return False
+
+
+def carregar_agendas(db: Session, agendas: Iterable[AgendaSala]) -> None:
+    """
+    Carrega de uma vez as agendas ainda não carregadas: uma consulta para as
+    reservas e outra para as séries de todas elas.
+    O chamador deve segurar o lock de cada agenda.
+    """
+    pendentes = {agenda.id_sala: agenda for agenda in agendas if not agenda.carregada}
+    if not pendentes:
+        return
+    linhas = db.execute(
+        select(models.Reserva.id_sala, models.Reserva.data_inicio, models.Reserva.data_final, models.Reserva.id)
+        .where(models.Reserva.id_sala.in_(pendentes))
+        .order_by(models.Reserva.id_sala, models.Reserva.data_inicio, models.Reserva.id)
+    ).all()
+    series = db.scalars(
+        select(models.SerieReserva)
+        .options(selectinload(models.SerieReserva.excecoes))
+        .where(models.SerieReserva.id_sala.in_(pendentes))
+    ).all()
+    series_por_sala: Dict[int, List[Recorrencia]] = {}
+    for serie in series:
+        series_por_sala.setdefault(serie.id_sala, []).append(Recorrencia.de_serie(serie))
+
+    for id_sala, grupo in groupby(linhas, key=itemgetter(0)):
+        pendentes.pop(id_sala).preencher([tuple(linha[1:]) for linha in grupo], series_por_sala.get(id_sala, ()))
+    for id_sala, agenda in pendentes.items():  # salas sem nenhuma reserva avulsa
+        agenda.preencher([], series_por_sala.get(id_sala, ()))
+
+
+class IndiceReservas:
+    """
+    Agendas de todas as salas já consultadas, indexadas pelo ID da sala.
+    """
+
+    def __init__(self):
+        self._agendas: Dict[int, AgendaSala] = {}
+        self._lock = threading.Lock()
+
+    def agenda(self, id_sala: int) -> AgendaSala:
+        """
+        Retorna a agenda da sala, criando-a (ainda não carregada) se necessário.
+        O carregamento é feito por AgendaSala.carregar, sob o lock da própria sala.
+        """
+        agenda = self._agendas.get(id_sala)
+        if agenda is None:
+            with self._lock:
+                agenda = self._agendas.setdefault(id_sala, AgendaSala(id_sala))
+        return agenda
+
+    def descartar(self, id_sala: int) -> None:
+        """
+        Remove a agenda da sala do índice (ela será recarregada na próxima consulta).
+        """
+        with self._lock:
+            self._agendas.pop(id_sala, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._agendas.clear()
+
+
+indice = IndiceReservas()
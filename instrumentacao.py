@@ -0,0 +1,431 @@
+import cProfile
+import inspect
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+# Instrumentação por requisição: quantidade de consultas SQL, tempo gasto no
+# banco, consulta mais lenta e tempo de serialização da resposta.
+# As medições de cada requisição vão para histogramas por rota (o template do
+# caminho, ex. /reservas/{reserva_id}), expostos em formato Prometheus em
+# GET /metricas.
+# Opcionais (variáveis de ambiente):
+# - INSTRUMENTACAO_SERVER_TIMING=true: devolve o cabeçalho Server-Timing;
+# - INSTRUMENTACAO_LENTA_MS: requisições mais lentas que isso são registradas
+#   no log, com a consulta mais lenta (0 desliga);
+# - INSTRUMENTACAO_PERFIL_AMOSTRA: fração (0 a 1) das requisições cujo endpoint
+#   roda sob o cProfile; o perfil entra no log se a requisição for lenta.
+
+SERVER_TIMING = os.getenv("INSTRUMENTACAO_SERVER_TIMING", "false").strip().lower() in ("1", "true", "sim")
+LIMITE_LENTA_MS = float(os.getenv("INSTRUMENTACAO_LENTA_MS", "500"))
+AMOSTRA_PERFIL = float(os.getenv("INSTRUMENTACAO_PERFIL_AMOSTRA", "0"))
+
+# Linhas do perfil (ordenadas por tempo acumulado) incluídas no log
+LINHAS_PERFIL = 25
+# Tamanho máximo do SQL guardado como consulta mais lenta
+TAMANHO_SQL = 500
+
+# Limites dos baldes dos histogramas (o último balde, +Inf, é implícito)
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# Rótulo das requisições que não casaram com nenhuma rota (evita um rótulo por URL)
+SEM_ROTA = "<sem rota>"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Medicao:
+    """
+    Medições de uma requisição em andamento.
+    """
+
+    inicio: float = field(default_factory=time.perf_counter)
+    consultas: int = 0
+    tempo_db: float = 0.0
+    mais_lenta: Tuple[float, str] = (0.0, "")  # (segundos, SQL)
+    fim_endpoint: Optional[float] = None
+    tempo_serializacao: float = 0.0
+    perfilar: bool = False
+    perfil: Optional[str] = None
+    fluxo_eventos: bool = False  # resposta text/event-stream: dura o tempo da conexão
+
+    def registrar_consulta(self, segundos: float, sql: str) -> None:
+        self.consultas += 1
+        self.tempo_db += segundos
+        if segundos > self.mais_lenta[0]:
+            self.mais_lenta = (segundos, sql[:TAMANHO_SQL])
+
+
+_medicao: ContextVar[Optional[Medicao]] = ContextVar("medicao_requisicao", default=None)
+
+
+def medicao_atual() -> Optional[Medicao]:
+    return _medicao.get()
+
+
+# --- Banco de dados ---
+
+# O início fica no contexto de execução da consulta, e não numa pilha na
+# conexão: uma consulta que falha não chega ao after_cursor_execute e deixaria
+# o seu início na pilha para a próxima consulta desempilhar.
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context.inicio_consulta = time.perf_counter()
+
+
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany) -> None:
+    inicio = getattr(context, "inicio_consulta", None)
+    medicao = _medicao.get()
+    if medicao is not None and inicio is not None:
+        medicao.registrar_consulta(time.perf_counter() - inicio, statement)
+
+
+def instrumentar_engine(engine: Engine) -> None:
+    """
+    Registra os eventos que medem cada consulta do engine.
+    Para um AsyncEngine, passe o engine.sync_engine.
+    """
+    if event.contains(engine, "before_cursor_execute", _antes_da_consulta):
+        return
+    event.listen(engine, "before_cursor_execute", _antes_da_consulta)
+    event.listen(engine, "after_cursor_execute", _depois_da_consulta)
+
+
+# --- Rotas ---
+
+# Só um perfil por vez: o cProfile de uma thread substitui o anterior, e
+# endpoints async compartilham a thread do event loop.
+_lock_perfil = threading.Lock()
+
+
+def _perfil_texto(perfil: cProfile.Profile) -> str:
+    saida = io.StringIO()
+    pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+    return saida.getvalue()
+
+
+def _envolver_endpoint(chamada: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Envolve o endpoint para marcar o fim da sua execução (o restante até a
+    resposta pronta é serialização) e, se sorteado, rodá-lo sob o cProfile.
+    A versão async continua async e a síncrona continua síncrona, para o
+    FastAPI executá-las do mesmo jeito.
+    """
+    def iniciar_perfil(medicao: Optional[Medicao]) -> Optional[cProfile.Profile]:
+        if medicao is None or not medicao.perfilar or not _lock_perfil.acquire(blocking=False):
+            return None
+        perfil = cProfile.Profile()
+        perfil.enable()
+        return perfil
+
+    def finalizar(medicao: Optional[Medicao], perfil: Optional[cProfile.Profile]) -> None:
+        if perfil is not None:
+            perfil.disable()
+            _lock_perfil.release()
+            medicao.perfil = _perfil_texto(perfil)
+        if medicao is not None:
+            medicao.fim_endpoint = time.perf_counter()
+
+    if _e_corrotina(chamada):
+        @wraps(chamada)
+        async def endpoint_async(*args, **kwargs):
+            medicao = _medicao.get()
+            perfil = iniciar_perfil(medicao)
+            try:
+                return await chamada(*args, **kwargs)
+            finally:
+                finalizar(medicao, perfil)
+        endpoint_async.instrumentado = True
+        return endpoint_async
+
+    @wraps(chamada)
+    def endpoint(*args, **kwargs):
+        medicao = _medicao.get()
+        perfil = iniciar_perfil(medicao)
+        try:
+            return chamada(*args, **kwargs)
+        finally:
+            finalizar(medicao, perfil)
+    endpoint.instrumentado = True
+    return endpoint
+
+
+def _e_corrotina(chamada: Callable[..., Any]) -> bool:
+    return inspect.iscoroutinefunction(chamada) or inspect.iscoroutinefunction(getattr(chamada, "__call__", None))
+
+
+class RotaInstrumentada(APIRoute):
+    """
+    APIRoute que separa o tempo do endpoint do tempo de serialização da
+    resposta (validação pelo response_model e geração do JSON).
+    Use com APIRouter(route_class=RotaInstrumentada).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if not getattr(endpoint, "instrumentado", False) and not _e_gerador(endpoint):
+            endpoint = _envolver_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        manipulador = super().get_route_handler()
+
+        async def manipulador_instrumentado(request):
+            resposta = await manipulador(request)
+            medicao = _medicao.get()
+            if medicao is not None and medicao.fim_endpoint is not None:
+                medicao.tempo_serializacao = time.perf_counter() - medicao.fim_endpoint
+            return resposta
+
+        return manipulador_instrumentado
+
+
+def _e_gerador(chamada: Callable[..., Any]) -> bool:
+    return inspect.isgeneratorfunction(chamada) or inspect.isasyncgenfunction(chamada)
+
+
+# --- Histogramas ---
+
+class Histograma:
+    """
+    Histograma cumulativo no formato do Prometheus (baldes "menor ou igual").
+    """
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def baldes(self):
+        """
+        Pares (limite, contagem acumulada), terminando em ("+Inf", total).
+        """
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ("+Inf",), self.contagens):
+            acumulado += contagem
+            yield limite, acumulado
+
+
+class EstatisticasRota:
+    def __init__(self):
+        self.latencia = Histograma(LIMITES_SEGUNDOS)
+        self.tempo_db = Histograma(LIMITES_SEGUNDOS)
+        self.serializacao = Histograma(LIMITES_SEGUNDOS)
+        self.consultas = Histograma(LIMITES_CONSULTAS)
+        self.consulta_mais_lenta = 0.0
+        self.por_status: Dict[int, int] = {}
+
+
+class MetricasRotas:
+    """
+    Histogramas de cada (método, rota), seguros para uso entre threads.
+    """
+
+    def __init__(self):
+        self._rotas: Dict[Tuple[str, str], EstatisticasRota] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metodo: str, rota: str, status: int, duracao: float, medicao: Medicao) -> None:
+        with self._lock:
+            estatisticas = self._rotas.get((metodo, rota))
+            if estatisticas is None:
+                estatisticas = self._rotas[(metodo, rota)] = EstatisticasRota()
+            estatisticas.latencia.observar(duracao)
+            estatisticas.tempo_db.observar(medicao.tempo_db)
+            estatisticas.serializacao.observar(medicao.tempo_serializacao)
+            estatisticas.consultas.observar(medicao.consultas)
+            estatisticas.consulta_mais_lenta = max(estatisticas.consulta_mais_lenta, medicao.mais_lenta[0])
+            estatisticas.por_status[status] = estatisticas.por_status.get(status, 0) + 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._rotas.clear()
+
+    def prometheus(self) -> str:
+        """
+        Todas as métricas no formato de texto do Prometheus (versão 0.0.4).
+        """
+        with self._lock:
+            rotas = sorted(self._rotas.items())
+            linhas: List[str] = []
+
+            def histograma(nome: str, ajuda: str, atributo: str) -> None:
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} histogram")
+                for (metodo, rota), estatisticas in rotas:
+                    rotulos = _rotulos(metodo=metodo, rota=rota)
+                    h: Histograma = getattr(estatisticas, atributo)
+                    for limite, acumulado in h.baldes():
+                        linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+                    linhas.append(f"{nome}_sum{{{rotulos}}} {h.soma!r}")
+                    linhas.append(f"{nome}_count{{{rotulos}}} {h.total}")
+
+            nome = "booking_requisicoes_total"
+            linhas.append(f"# HELP {nome} Requisições HTTP por rota e status.")
+            linhas.append(f"# TYPE {nome} counter")
+            for (metodo, rota), estatisticas in rotas:
+                for status, total in sorted(estatisticas.por_status.items()):
+                    linhas.append(f"{nome}{{{_rotulos(metodo=metodo, rota=rota, status=str(status))}}} {total}")
+
+            histograma("booking_requisicao_segundos", "Latência das requisições por rota.", "latencia")
+            histograma("booking_db_segundos", "Tempo total em consultas SQL por requisição.", "tempo_db")
+            histograma("booking_serializacao_segundos", "Tempo de serialização da resposta por requisição.", "serializacao")
+            histograma("booking_db_consultas", "Quantidade de consultas SQL por requisição.", "consultas")
+
+            nome = "booking_db_consulta_mais_lenta_segundos"
+            linhas.append(f"# HELP {nome} Duração da consulta SQL mais lenta já vista na rota.")
+            linhas.append(f"# TYPE {nome} gauge")
+            for (metodo, rota), estatisticas in rotas:
+                linhas.append(f"{nome}{{{_rotulos(metodo=metodo, rota=rota)}}} {estatisticas.consulta_mais_lenta!r}")
+        return "\n".join(linhas) + "\n"
+
+
+# Métricas dos pools de conexões: (nome, tipo, ajuda, chave em database.estatisticas_pool)
+METRICAS_POOL = [
+    ("booking_db_pool_em_uso", "gauge", "Conexões do pool emprestadas no momento.", "em_uso"),
+    ("booking_db_pool_ociosas", "gauge", "Conexões abertas e livres no pool.", "ociosas"),
+    ("booking_db_pool_excesso", "gauge", "Conexões abertas além do tamanho do pool.", "excesso"),
+    ("booking_db_pool_checkouts_total", "counter", "Conexões entregues pelo pool.", "checkouts"),
+    ("booking_db_pool_espera_segundos_total", "counter", "Tempo total esperando o pool entregar uma conexão.", "espera_total_segundos"),
+    ("booking_db_pool_espera_maxima_segundos", "gauge", "Maior espera por uma conexão do pool.", "espera_maxima_segundos"),
+    ("booking_db_pool_timeouts_total", "counter", "Esperas por uma conexão que estouraram o timeout do pool.", "timeouts"),
+]
+
+
+def prometheus_pools(pools: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Métricas dos pools de conexões (por engine: "sync", "async") no formato de
+    texto do Prometheus.
+    """
+    linhas: List[str] = []
+    for nome, tipo, ajuda, chave in METRICAS_POOL:
+        valores = [(engine, estatisticas[chave]) for engine, estatisticas in pools.items() if chave in estatisticas]
+        if not valores:
+            continue
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for engine, valor in valores:
+            linhas.append(f"{nome}{{{_rotulos(engine=engine)}}} {valor!r}")
+    return "\n".join(linhas) + "\n" if linhas else ""
+
+
+def prometheus_admissao(limitadores: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Métricas dos limitadores do controle de admissão (admissao.py) no formato
+    de texto do Prometheus.
+    """
+    linhas: List[str] = []
+    for nome, tipo, ajuda, chave in (
+        ("booking_admissao_em_uso", "gauge", "Requisições admitidas em andamento.", "em_uso"),
+        ("booking_admissao_fila", "gauge", "Requisições esperando vaga.", "fila"),
+        ("booking_admissao_admitidas_total", "counter", "Requisições admitidas.", "admitidas"),
+        ("booking_admissao_espera_segundos_total", "counter", "Tempo total esperando vaga na fila.", "espera_total_segundos"),
+    ):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for limitador, estatisticas in limitadores.items():
+            linhas.append(f"{nome}{{{_rotulos(limitador=limitador)}}} {estatisticas[chave]!r}")
+    nome = "booking_admissao_rejeitadas_total"
+    linhas.append(f"# HELP {nome} Requisições rejeitadas com 503, por motivo (fila cheia ou prazo vencido).")
+    linhas.append(f"# TYPE {nome} counter")
+    for limitador, estatisticas in limitadores.items():
+        for motivo, total in sorted(estatisticas["rejeitadas"].items()):
+            linhas.append(f"{nome}{{{_rotulos(limitador=limitador, motivo=motivo)}}} {total}")
+    return "\n".join(linhas) + "\n" if limitadores else ""
+
+
+def _rotulos(**rotulos: str) -> str:
+    def escapar(valor: str) -> str:
+        return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{chave}="{escapar(valor)}"' for chave, valor in rotulos.items())
+
+
+metricas = MetricasRotas()
+
+
+# --- Middleware ---
+
+def _server_timing(medicao: Medicao) -> str:
+    total = (time.perf_counter() - medicao.inicio) * 1000
+    return (
+        f'db;dur={medicao.tempo_db * 1000:.2f};desc="{medicao.consultas} consultas", '
+        f"serializacao;dur={medicao.tempo_serializacao * 1000:.2f}, "
+        f"total;dur={total:.2f}"
+    )
+
+
+class MiddlewareInstrumentacao:
+    """
+    Middleware ASGI que abre a medição de cada requisição HTTP e, ao fim da
+    resposta, registra os histogramas da rota e o log de requisições lentas.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING, limite_lenta_ms: float = LIMITE_LENTA_MS,
+                 amostra_perfil: float = AMOSTRA_PERFIL, metricas_rotas: MetricasRotas = metricas):
+        self.app = app
+        self.server_timing = server_timing
+        self.limite_lenta_ms = limite_lenta_ms
+        self.amostra_perfil = amostra_perfil
+        self.metricas = metricas_rotas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicao = Medicao(perfilar=self.amostra_perfil > 0 and random.random() < self.amostra_perfil)
+        token = _medicao.set(medicao)
+        status_resposta = 500
+
+        async def enviar(message):
+            nonlocal status_resposta
+            if message["type"] == "http.response.start":
+                status_resposta = message["status"]
+                cabecalhos = MutableHeaders(scope=message)
+                medicao.fluxo_eventos = cabecalhos.get("content-type", "").startswith("text/event-stream")
+                if self.server_timing:
+                    cabecalhos.append("Server-Timing", _server_timing(medicao))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao.reset(token)
+            self._finalizar(scope, status_resposta, medicao)
+
+    def _finalizar(self, scope, status_resposta: int, medicao: Medicao) -> None:
+        duracao = time.perf_counter() - medicao.inicio
+        rota = getattr(scope.get("route"), "path", None) or SEM_ROTA
+        self.metricas.registrar(scope["method"], rota, status_resposta, duracao, medicao)
+
+        if self.limite_lenta_ms and duracao * 1000 >= self.limite_lenta_ms and not medicao.fluxo_eventos:
+            logger.warning(
+                "Requisição lenta: %s %s em %.1f ms (status %d, %d consultas, %.1f ms no banco, "
+                "%.1f ms serializando); consulta mais lenta (%.1f ms): %s%s",
+                scope["method"], scope["path"], duracao * 1000, status_resposta, medicao.consultas,
+                medicao.tempo_db * 1000, medicao.tempo_serializacao * 1000, medicao.mais_lenta[0] * 1000,
+                medicao.mais_lenta[1] or "-",
+                f"\nPerfil do endpoint:\n{medicao.perfil}" if medicao.perfil else "",
+            )
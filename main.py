@@ -1,15 +1,34 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import models
-from database import engine
+import admissao, idempotencia, instrumentacao, migracoes, models
+from database import DB_ASYNC, async_engine, engine
 from routers.usuarios import usuarios
 from routers.salas import salas
 from routers.reservas import reservas
+from routers.metricas import metricas
+from routers.analises import analises
+from paginacao import CABECALHO_PROXIMO_CURSOR
 
 models.Base.metadata.create_all(bind=engine)
+migracoes.migrar(engine)  # bancos criados por versões anteriores
 
 app = FastAPI()
 
+# Limites de concorrência e filas das rotas caras e das escritas (503 com
+# Retry-After quando não há vaga); o mais interno, só em volta dos endpoints
+app.add_middleware(admissao.MiddlewareAdmissao)
+
+# Repetições de POST com Idempotency-Key recebem a resposta da primeira
+# requisição (registrado antes, fica por dentro da instrumentação, que mede
+# também as repetições)
+app.add_middleware(idempotencia.MiddlewareIdempotencia)
+
+# Consultas SQL, tempos e histogramas por rota de cada requisição (GET /metricas)
+instrumentacao.instrumentar_engine(engine)
+if async_engine is not None:
+    instrumentacao.instrumentar_engine(async_engine.sync_engine)
+app.add_middleware(instrumentacao.MiddlewareInstrumentacao)
+
 # Configuração de origem
 origins = [ 
     "http://localhost:5173",
@@ -22,11 +41,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECALHO_PROXIMO_CURSOR, "ETag", "Last-Modified", "Server-Timing", idempotencia.CABECALHO_REPETICAO, "Retry-After"],  # Cursor da próxima página, validadores do cache, tempos da instrumentação, repetições idempotentes e espera sugerida no 503
 )
 
+# No modo assíncrono as rotas de leitura async são registradas primeiro e
+# têm prioridade; as demais rotas continuam nos routers síncronos.
+if DB_ASYNC:
+    from routers.usuarios import usuarios_async
+    from routers.salas import salas_async
+    from routers.reservas import reservas_async
+
+    app.include_router(usuarios_async.router)
+    app.include_router(salas_async.router)
+    app.include_router(reservas_async.router)
+
 app.include_router(usuarios.router)
 app.include_router(salas.router)
 app.include_router(reservas.router)
+app.include_router(analises.router)
+app.include_router(metricas.router)
 
 @app.get("/")
 async def root():
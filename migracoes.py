@@ -0,0 +1,99 @@
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+import models
+
+# Ajustes do esquema de bancos criados por versões anteriores.
+# Base.metadata.create_all só cria o que não existe: não altera tabelas já
+# criadas nem cria os índices novos delas. Rodado na subida da API (main.py)
+# e do arquivamento, depois do create_all; cada passo confere o estado do
+# banco e não faz nada se já estiver aplicado.
+# - reservas: a versão original tinha UNIQUE em id_sala (uma única reserva
+#   por sala). No SQLite a restrição não pode ser removida com ALTER TABLE e
+#   a tabela é reconstruída (mesmas linhas e IDs); nos demais bancos a
+#   restrição é removida pelo nome.
+# - reservas, só no SQLite: sem AUTOINCREMENT, IDs de reservas apagadas
+#   podem ser reaproveitados, e um ID já usado em reservas_historico volta
+#   numa reserva nova (o arquivamento falharia na chave primária). A tabela é
+#   reconstruída com AUTOINCREMENT e a sequência começa depois do maior ID
+#   das duas tabelas.
+# - índices declarados nos modelos (ex. ix_reservas_sala_periodo,
+#   ix_reservas_inicio_id) que ainda não existem são criados.
+
+
+def _unique_id_sala(conexao: Connection) -> list:
+    return [
+        restricao for restricao in inspect(conexao).get_unique_constraints("reservas")
+        if restricao["column_names"] == ["id_sala"]
+    ]
+
+
+def _reconstruir_reservas_sqlite(conexao: Connection) -> None:
+    tabela = models.Reserva.__table__
+    metadata = MetaData()  # separado, para a cópia não entrar no create_all
+    for referenciada in (models.Sala.__table__, models.Usuario.__table__):
+        referenciada.to_metadata(metadata)
+    nova = tabela.to_metadata(metadata, name="reservas_nova")
+    existentes = {coluna["name"] for coluna in inspect(conexao).get_columns("reservas")}
+    colunas = ", ".join(coluna.name for coluna in tabela.columns if coluna.name in existentes)
+    conexao.execute(CreateTable(nova))
+    conexao.execute(text(f"INSERT INTO reservas_nova ({colunas}) SELECT {colunas} FROM reservas"))
+    conexao.execute(text("DROP TABLE reservas"))  # leva junto os índices antigos
+    conexao.execute(text("ALTER TABLE reservas_nova RENAME TO reservas"))
+    # A sequência do AUTOINCREMENT continua depois de todo ID já usado,
+    # inclusive os das reservas arquivadas
+    conexao.execute(text("DELETE FROM sqlite_sequence WHERE name = 'reservas'"))
+    conexao.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'reservas', MAX("
+        "(SELECT COALESCE(MAX(id), 0) FROM reservas), "
+        "(SELECT COALESCE(MAX(id), 0) FROM reservas_historico))"
+    ))
+
+
+def _sem_autoincrement(conexao: Connection) -> bool:
+    sql = conexao.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'reservas'"))
+    return sql is not None and "AUTOINCREMENT" not in sql.upper()
+
+
+def remover_unique_id_sala(conexao: Connection) -> bool:
+    """
+    Remove a restrição UNIQUE(id_sala) da tabela reservas, se existir.
+    Retorna True se havia o que remover.
+    """
+    restricoes = _unique_id_sala(conexao)
+    if not restricoes:
+        return False
+    if conexao.dialect.name == "sqlite":
+        _reconstruir_reservas_sqlite(conexao)
+    else:
+        for restricao in restricoes:
+            conexao.execute(text(f'ALTER TABLE reservas DROP CONSTRAINT "{restricao["name"]}"'))
+    return True
+
+
+def usar_autoincrement(conexao: Connection) -> bool:
+    """
+    No SQLite, reconstrói a tabela reservas com AUTOINCREMENT, se ainda não
+    tiver. Retorna True se a tabela foi reconstruída.
+    """
+    if conexao.dialect.name != "sqlite" or not _sem_autoincrement(conexao):
+        return False
+    _reconstruir_reservas_sqlite(conexao)
+    return True
+
+
+def criar_indices(conexao: Connection) -> None:
+    """
+    Cria os índices declarados nos modelos que ainda não existem no banco.
+    """
+    for tabela in models.Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(conexao, checkfirst=True)
+
+
+def migrar(engine: Engine) -> None:
+    with engine.begin() as conexao:
+        remover_unique_id_sala(conexao)
+        usar_autoincrement(conexao)
+        criar_indices(conexao)
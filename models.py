@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Table, ForeignKey, DateTime
+from sqlalchemy import Column, DDL, Integer, LargeBinary, String, Table, ForeignKey, DateTime, Index, UniqueConstraint, event
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -32,14 +32,121 @@ class Usuario(Base):
 
 
 class Reserva(Base):
+    # Em bancos criados pela versão original (com UNIQUE em id_sala e sem os
+    # índices abaixo) ou sem AUTOINCREMENT no SQLite, migracoes.migrar remove a
+    # restrição, recria a tabela e cria os índices na subida da API.
     __tablename__ = "reservas"
+    __table_args__ = (
+        # Usado para carregar a agenda de uma sala em ordem cronológica e, por
+        # incluir data_final, para a busca de salas livres sem ler a tabela
+        Index("ix_reservas_sala_periodo", "id_sala", "data_inicio", "data_final"),
+        # Chave da paginação por cursor de /reservas
+        Index("ix_reservas_inicio_id", "data_inicio", "id"),
+        # SQLite: IDs nunca reaproveitados. Sem AUTOINCREMENT o SQLite pode dar a
+        # uma reserva nova o maior rowid já apagado, que pode ser o de uma
+        # reserva movida para reservas_historico (com o mesmo ID).
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    id_sala = Column(Integer, ForeignKey('salas.id'), unique=True)
+    id_sala = Column(Integer, ForeignKey('salas.id'))
     id_usuario = Column(Integer, ForeignKey('usuarios.id'))
     data_inicio = Column(DateTime, index=True)
     data_final = Column(DateTime, index=True)
     participantes = Column(Integer, default=0)
 
     sala = relationship("Sala", back_populates="reservas")
-    usuario = relationship("Usuario")
\ No newline at end of file
+    usuario = relationship("Usuario")
+
+
+# No PostgreSQL o próprio banco recusa reservas sobrepostas na mesma sala
+# (restrição de exclusão GiST sobre [data_inicio, data_final)), inclusive
+# entre processos diferentes. Criada junto com a tabela; em bancos já
+# existentes, rode os dois comandos manualmente.
+RESTRICAO_SOBREPOSICAO = "reservas_sem_sobreposicao"
+
+event.listen(
+    Reserva.__table__, "after_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Reserva.__table__, "after_create",
+    DDL(
+        f"ALTER TABLE reservas ADD CONSTRAINT {RESTRICAO_SOBREPOSICAO} "
+        "EXCLUDE USING gist (id_sala WITH =, tsrange(data_inicio, data_final) WITH &&)"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+class ReservaHistorico(Base):
+    # Reservas encerradas antes do horizonte de retenção, movidas da tabela
+    # reservas pelo arquivamento (arquivamento.py) com o mesmo ID. Só é lida
+    # quando o período consultado alcança o horizonte.
+    __tablename__ = "reservas_historico"
+    __table_args__ = (
+        Index("ix_reservas_historico_sala_periodo", "id_sala", "data_inicio", "data_final"),
+        Index("ix_reservas_historico_inicio_id", "data_inicio", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    id_sala = Column(Integer, ForeignKey('salas.id'))
+    id_usuario = Column(Integer, ForeignKey('usuarios.id'), index=True)
+    data_inicio = Column(DateTime)
+    data_final = Column(DateTime, index=True)
+    participantes = Column(Integer, default=0)
+    arquivada_em = Column(DateTime)
+
+    sala = relationship("Sala")
+    usuario = relationship("Usuario")
+
+
+class SerieReserva(Base):
+    # Reserva recorrente: uma linha por série; as ocorrências são calculadas
+    # sob demanda (ver recorrencia.py).
+    __tablename__ = "series_reservas"
+    __table_args__ = (
+        # Séries de uma sala ativas em um período
+        Index("ix_series_sala_periodo", "id_sala", "data_inicio", "fim_serie"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    id_sala = Column(Integer, ForeignKey('salas.id'))
+    id_usuario = Column(Integer, ForeignKey('usuarios.id'))
+    data_inicio = Column(DateTime, index=True) # Início da primeira ocorrência
+    data_final = Column(DateTime) # Fim da primeira ocorrência
+    participantes = Column(Integer, default=0)
+    frequencia = Column(String) # "diaria", "semanal" ou "mensal"
+    intervalo = Column(Integer, default=1) # A cada quantos dias/semanas/meses
+    ocorrencias = Column(Integer, nullable=True) # Quantidade de ocorrências
+    data_limite = Column(DateTime, nullable=True) # Data de início máxima de uma ocorrência
+    fim_serie = Column(DateTime, index=True) # Fim da última ocorrência
+
+    sala = relationship("Sala")
+    usuario = relationship("Usuario")
+    excecoes = relationship("ExcecaoSerie", cascade="all, delete-orphan", order_by="ExcecaoSerie.data_inicio")
+
+
+class ExcecaoSerie(Base):
+    # Ocorrência cancelada de uma série, identificada pela data de início.
+    __tablename__ = "excecoes_serie"
+    __table_args__ = (
+        UniqueConstraint("id_serie", "data_inicio", name="uq_excecoes_serie_data"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    id_serie = Column(Integer, ForeignKey('series_reservas.id', ondelete="CASCADE"), index=True)
+    data_inicio = Column(DateTime)
+
+
+class RespostaIdempotente(Base):
+    # Respostas guardadas pelo middleware de Idempotency-Key (idempotencia.py)
+    # quando IDEMPOTENCIA_PERSISTIR está ligado, para que uma nova tentativa
+    # seja reconhecida por outro worker ou depois de um reinício.
+    __tablename__ = "respostas_idempotentes"
+
+    chave = Column(String, primary_key=True) # Método, caminho e valor do cabeçalho
+    digest = Column(String) # SHA-256 do corpo da requisição original
+    status = Column(Integer)
+    cabecalhos = Column(String) # JSON: lista de pares [nome, valor]
+    corpo = Column(LargeBinary)
+    criada_em = Column(DateTime, index=True)
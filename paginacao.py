@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+# Paginação por cursor (keyset) das listagens.
+# O cursor é opaco para o cliente: guarda a chave de ordenação do último item
+# da página, e a próxima página começa logo depois dela usando o índice da
+# chave, então o custo de uma página não depende de quantas vieram antes.
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+# Cabeçalho de resposta com o cursor da próxima página (ausente na última)
+CABECALHO_PROXIMO_CURSOR = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+class CursorInvalidoError(ValueError):
+    def __init__(self, message="Cursor de paginação inválido."):
+        self.message = message
+        super().__init__(self.message)
+
+
+def codificar_cursor(*valores: Any) -> str:
+    """
+    Gera o cursor a partir dos valores da chave de ordenação.
+    Datas são gravadas em ISO 8601.
+    """
+    serializados = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    bruto = json.dumps(serializados, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, *tipos: Callable[[Any], Any]) -> Tuple[Any, ...]:
+    """
+    Lê um cursor gerado por codificar_cursor, convertendo cada valor com o tipo
+    informado (ex.: decodificar_cursor(c, datetime.fromisoformat, int)).
+    Lança CursorInvalidoError se o cursor estiver malformado.
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if not isinstance(valores, list) or len(valores) != len(tipos):
+            raise ValueError
+        return tuple(tipo(valor) for tipo, valor in zip(tipos, valores))
+    except (ValueError, TypeError):
+        raise CursorInvalidoError()
+
+
+def paginar(itens: Sequence[T], limit: int, chave: Callable[[T], Sequence[Any]]) -> Tuple[List[T], Optional[str]]:
+    """
+    Recebe até limit + 1 itens (a consulta busca um a mais para saber se há
+    próxima página) e retorna os itens da página e o cursor da próxima.
+    """
+    pagina = list(itens[:limit])
+    if len(itens) <= limit:
+        return pagina, None
+    return pagina, codificar_cursor(*chave(pagina[-1]))
+
+
+class IdsInvalidosError(ValueError):
+    def __init__(self, message="Lista de IDs inválida."):
+        self.message = message
+        super().__init__(self.message)
+
+
+def ler_ids(valores: List[str], limite: int = LIMITE_MAXIMO) -> List[int]:
+    """
+    Lê os IDs de um parâmetro ids (repetido, ids=1&ids=2, e/ou separado por
+    vírgulas, ids=1,2), sem repetições e na ordem em que aparecem.
+    Lança IdsInvalidosError se algum não for inteiro ou se passarem do limite.
+    """
+    ids = {}
+    for valor in valores:
+        for parte in valor.split(","):
+            parte = parte.strip()
+            if not parte:
+                continue
+            try:
+                ids[int(parte)] = None
+            except ValueError:
+                raise IdsInvalidosError(f"ID inválido: {parte!r}.")
+    if not ids:
+        raise IdsInvalidosError("Informe ao menos um ID.")
+    if len(ids) > limite:
+        raise IdsInvalidosError(f"Informe no máximo {limite} IDs.")
+    return list(ids)
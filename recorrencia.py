@@ -0,0 +1,195 @@
+from calendar import monthrange
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+# Séries de reservas recorrentes (diária, semanal ou mensal).
+# Uma série é gravada como uma única linha; as ocorrências não são gravadas,
+# são calculadas sob demanda e só dentro da janela consultada: a data da
+# n-ésima ocorrência sai de uma conta (início + n * passo), então achar a
+# primeira ocorrência de uma janela não exige percorrer as anteriores.
+
+FREQUENCIAS = ("diaria", "semanal", "mensal")
+
+# Quantidade máxima de ocorrências de uma série
+LIMITE_OCORRENCIAS = 5000
+
+OcorrenciaCalculada = Tuple[int, datetime, datetime]  # (índice, data_inicio, data_final)
+
+
+def _somar_meses(data: datetime, meses: int) -> datetime:
+    # Meses sem o dia da data original usam o último dia do mês (31/01 -> 28/02).
+    ano, mes = divmod(data.month - 1 + meses, 12)
+    ano += data.year
+    dia = min(data.day, monthrange(ano, mes + 1)[1])
+    return data.replace(year=ano, month=mes + 1, day=dia)
+
+
+@dataclass(frozen=True)
+class Recorrencia:
+    """
+    Regra de uma série: a primeira ocorrência [data_inicio, data_final) se
+    repete a cada `intervalo` dias, semanas ou meses, até `ocorrencias`
+    ocorrências e/ou até `data_limite` (data de início da última), menos as
+    ocorrências cuja data de início está em `excecoes`.
+    """
+
+    id: Optional[int]
+    data_inicio: datetime
+    data_final: datetime
+    frequencia: str
+    intervalo: int = 1
+    ocorrencias: Optional[int] = None
+    data_limite: Optional[datetime] = None
+    excecoes: FrozenSet[datetime] = field(default_factory=frozenset)
+
+    @classmethod
+    def de_serie(cls, serie: Any) -> "Recorrencia":
+        """
+        Monta a regra a partir de uma linha de models.SerieReserva.
+        """
+        return cls(
+            id=serie.id,
+            data_inicio=serie.data_inicio,
+            data_final=serie.data_final,
+            frequencia=serie.frequencia,
+            intervalo=serie.intervalo,
+            ocorrencias=serie.ocorrencias,
+            data_limite=serie.data_limite,
+            excecoes=frozenset(excecao.data_inicio for excecao in serie.excecoes),
+        )
+
+    @property
+    def duracao(self) -> timedelta:
+        return self.data_final - self.data_inicio
+
+    @property
+    def _passo(self) -> Optional[timedelta]:
+        if self.frequencia == "diaria":
+            return timedelta(days=self.intervalo)
+        if self.frequencia == "semanal":
+            return timedelta(weeks=self.intervalo)
+        return None  # mensal: os meses não têm tamanho fixo
+
+    @property
+    def menor_passo(self) -> timedelta:
+        """
+        Menor distância entre o início de duas ocorrências seguidas.
+        """
+        return self._passo or timedelta(days=28 * self.intervalo)
+
+    def inicio(self, n: int) -> datetime:
+        """
+        Data de início da n-ésima ocorrência (a primeira é n = 0), ignorando exceções.
+        """
+        if self._passo is None:
+            return _somar_meses(self.data_inicio, n * self.intervalo)
+        return self.data_inicio + n * self._passo
+
+    def _primeira_depois(self, instante: datetime) -> int:
+        """
+        Menor n com inicio(n) > instante (pode passar do total).
+        """
+        if instante < self.data_inicio:
+            return 0
+        if self._passo is not None:
+            return (instante - self.data_inicio) // self._passo + 1
+        meses = (instante.year - self.data_inicio.year) * 12 + instante.month - self.data_inicio.month
+        n = max(meses // self.intervalo - 1, 0)
+        while self.inicio(n) <= instante:
+            n += 1
+        return n
+
+    @property
+    def total(self) -> int:
+        """
+        Quantidade de ocorrências da série, contando as exceções.
+        """
+        total = self.ocorrencias if self.ocorrencias is not None else LIMITE_OCORRENCIAS + 1
+        if self.data_limite is not None:
+            total = min(total, self._primeira_depois(self.data_limite))
+        return total
+
+    @property
+    def fim(self) -> datetime:
+        """
+        Data final da última ocorrência (limite superior da série).
+        """
+        return self.inicio(max(self.total - 1, 0)) + self.duracao
+
+    def ocorrencias_entre(self, inicio: datetime, final: datetime) -> Iterator[OcorrenciaCalculada]:
+        """
+        Percorre, em ordem, as ocorrências que se sobrepõem a [inicio, final).
+        """
+        n = self._primeira_depois(inicio - self.duracao)
+        total = self.total
+        while n < total:
+            inicio_n = self.inicio(n)
+            if inicio_n >= final:
+                return
+            if inicio_n not in self.excecoes:
+                yield n, inicio_n, inicio_n + self.duracao
+            n += 1
+
+    def ocorrencias_a_partir(self, instante: datetime) -> Iterator[OcorrenciaCalculada]:
+        """
+        Percorre, em ordem, as ocorrências que começam em `instante` ou depois.
+        """
+        n = self._primeira_depois(instante - timedelta.resolution)
+        total = self.total
+        while n < total:
+            inicio_n = self.inicio(n)
+            if inicio_n not in self.excecoes:
+                yield n, inicio_n, inicio_n + self.duracao
+            n += 1
+
+    def todas(self) -> Iterator[OcorrenciaCalculada]:
+        return self.ocorrencias_a_partir(self.data_inicio)
+
+    def conflito(self, inicio: datetime, final: datetime) -> Optional[OcorrenciaCalculada]:
+        """
+        Retorna a primeira ocorrência que se sobrepõe a [inicio, final), ou None.
+        """
+        return next(self.ocorrencias_entre(inicio, final), None)
+
+
+@dataclass
+class Ocorrencia:
+    """
+    Ocorrência de uma série, no formato de uma reserva (schemas.Reserva).
+    Não existe no banco: id é None e id_serie aponta para a série.
+    """
+
+    id_serie: int
+    indice: int
+    id_sala: int
+    id_usuario: int
+    data_inicio: datetime
+    data_final: datetime
+    participantes: int
+    sala: Any
+    usuario: Any
+    id: Optional[int] = None
+
+
+def expandir(series: Iterable[Any], inicio: datetime, final: datetime) -> Iterator[Ocorrencia]:
+    """
+    Ocorrências de cada série (models.SerieReserva) que se sobrepõem a [inicio, final).
+    """
+    for serie in series:
+        for n, inicio_n, final_n in Recorrencia.de_serie(serie).ocorrencias_entre(inicio, final):
+            yield ocorrencia(serie, n, inicio_n, final_n)
+
+
+def ocorrencia(serie: Any, n: int, inicio: datetime, final: datetime) -> Ocorrencia:
+    return Ocorrencia(
+        id_serie=serie.id,
+        indice=n,
+        id_sala=serie.id_sala,
+        id_usuario=serie.id_usuario,
+        data_inicio=inicio,
+        data_final=final,
+        participantes=serie.participantes,
+        sala=serie.sala,
+        usuario=serie.usuario,
+    )
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from database import get_db
+import analises, schemas
+from instrumentacao import RotaInstrumentada
+
+router = APIRouter(
+    prefix="/analises",
+    tags=["Análises"],
+    route_class=RotaInstrumentada,
+)
+
+@router.get("/ocupacao", response_model=schemas.RelatorioOcupacao)
+def get_ocupacao(
+    data_inicio: schemas.DataHora,
+    data_final: schemas.DataHora,
+    agrupar: str = Query("sala", pattern="^(sala|localizacao)$"),
+    periodo: str = Query("hora", pattern="^(hora|dia_semana|hora_semana|total)$"),
+    localizacao: Optional[str] = None,
+    db: Session = Depends(get_db)):
+    """
+    Relatório de ocupação das salas no período, agrupado por sala ou localização
+    e dividido em buckets por hora do dia, dia da semana, hora da semana ou total.
+    Exemplo de uso: /analises/ocupacao?data_inicio=2025-01-01T00:00:00&data_final=2026-01-01T00:00:00&agrupar=localizacao&periodo=hora_semana
+    """
+    if data_final <= data_inicio:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A data final deve ser posterior à data de início.")
+    try:
+        return analises.ocupacao(db=db, start_date=data_inicio, end_date=data_final, agrupar=agrupar, periodo=periodo, localizacao=localizacao)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
@@ -0,0 +1,67 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import admissao, cache, database, idempotencia, instrumentacao
+from instrumentacao import RotaInstrumentada
+
+router = APIRouter(
+    prefix="/metricas",
+    tags=["Métricas"],
+    route_class=RotaInstrumentada,
+)
+
+# Content-Type do formato de texto do Prometheus
+TIPO_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("", response_class=PlainTextResponse)
+def get_metricas_prometheus():
+    """
+    Histogramas por rota (latência, tempo no banco, quantidade de consultas
+    SQL e tempo de serialização), o estado dos pools de conexões e as filas do
+    controle de admissão, no formato de texto do Prometheus.
+    """
+    texto = (
+        instrumentacao.metricas.prometheus()
+        + instrumentacao.prometheus_pools(_estatisticas_pools())
+        + instrumentacao.prometheus_admissao(admissao.controle.estatisticas()["limitadores"])
+    )
+    return PlainTextResponse(texto, media_type=TIPO_PROMETHEUS)
+
+@router.get("/cache")
+def get_metricas_cache():
+    """
+    Retorna os contadores do cache do catálogo (acertos, falhas, despejos,
+    respostas 304) e a quantidade de respostas guardadas.
+    """
+    return cache.catalogo.estatisticas()
+
+@router.get("/idempotencia")
+def get_metricas_idempotencia():
+    """
+    Retorna os contadores do Idempotency-Key (repetições respondidas da
+    memória, esperas pela requisição original, conflitos de corpo) e do
+    armazenamento das respostas.
+    """
+    return idempotencia.armazem.estatisticas()
+
+@router.get("/pool")
+def get_metricas_pool():
+    """
+    Retorna o estado dos pools de conexões com o banco (em uso, ociosas,
+    excesso) e os tempos de espera por uma conexão.
+    """
+    return _estatisticas_pools()
+
+@router.get("/admissao")
+def get_metricas_admissao():
+    """
+    Retorna o estado de cada limitador do controle de admissão: vagas em uso,
+    profundidade da fila, admitidas e rejeitadas (503) por motivo.
+    """
+    return admissao.controle.estatisticas()
+
+def _estatisticas_pools():
+    pools = {"sync": database.estatisticas_pool(database.engine)}
+    if database.async_engine is not None:
+        pools["async"] = database.estatisticas_pool(database.async_engine.sync_engine)
+    return pools
@@ -1,39 +1,110 @@
-from typing import List, Optional
-from datetime import datetime
+from typing import AsyncIterator, List, Optional, Union
+import json
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session, joinedload # Importe joinedload aqui se não estiver em outro lugar
 
 from database import get_db
-import crud, schemas # Assumindo que crud.py e schemas.py estão no mesmo nível da pasta
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError
+import crud, eventos, exportacao, schemas, serializacao # Assumindo que crud.py e schemas.py estão no mesmo nível da pasta
+from instrumentacao import RotaInstrumentada
 
 router = APIRouter(
     prefix="/reservas",
-    tags=["Reservas"]
+    tags=["Reservas"],
+    route_class=RotaInstrumentada,
 )
 
+# Quantidade máxima de reservas em uma importação em lote
+LIMITE_LOTE = 50_000
+
 # --- ROTAS GET ---
 
 # 1. Rota mais específica: Busca por intervalo (com caminho literal fixo)
 @router.get("/intervalo", response_model=List[schemas.Reserva], status_code=status.HTTP_200_OK)
 def get_reservas_by_intervalo(
-    data_inicio: datetime, # Parâmetro de consulta (query parameter)
-    data_final: datetime,  # Parâmetro de consulta (query parameter)
+    data_inicio: schemas.DataHora, # Parâmetro de consulta (query parameter)
+    data_final: schemas.DataHora,  # Parâmetro de consulta (query parameter)
     db: Session = Depends(get_db)):
     """
     Retorna todas as reservas que se sobrepõem a um período de datas específico.
+    A resposta é montada direto das linhas do banco (serializacao), sem
+    passar pelo response_model.
     Exemplo de uso: /reservas/intervalo?data_inicio=2025-06-26T15:00:00&data_final=2025-06-26T17:00:00
     """
     try:
         reservas = crud.get_resrevas_by_period(
             db=db,
             start_date=data_inicio,
-            end_date=data_final
+            end_date=data_final,
+            linhas=True
         )
-        return reservas
+        return serializacao.RespostaRapida(serializacao.reservas(reservas))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
 
+# Exportação em streaming do período (também com caminho literal, antes de /{reserva_id})
+@router.get("/exportar", response_class=StreamingResponse)
+def exportar_reservas_endpoint(
+    data_inicio: schemas.DataHora,
+    data_final: schemas.DataHora,
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    Exporta as reservas que se sobrepõem ao período em NDJSON ou CSV.
+    As linhas são enviadas à medida que são lidas do banco, sem carregar o
+    período inteiro em memória.
+    Exemplo de uso: /reservas/exportar?data_inicio=2025-06-01T00:00:00&data_final=2025-07-01T00:00:00&formato=csv
+    """
+    nome_arquivo = f"reservas_{data_inicio:%Y%m%d}_{data_final:%Y%m%d}.{formato}"
+    return StreamingResponse(
+        exportacao.exportar_reservas(data_inicio, data_final, formato),
+        media_type=exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'},
+    )
+
+# Feed de alterações em Server-Sent Events (caminho literal, antes de /{reserva_id})
+@router.get("/eventos", response_class=StreamingResponse)
+async def eventos_reservas_endpoint(
+    id_sala: Optional[List[int]] = Query(None),
+    localizacao: Optional[str] = None,
+    desde: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)):
+    """
+    Envia as reservas criadas e removidas (eventos "criada" e "removida") à
+    medida que acontecem, opcionalmente só das salas informadas
+    (?id_sala=1&id_sala=2) ou de uma localização.
+    Para retomar após uma queda, informe o ID do último evento recebido no
+    cabeçalho Last-Event-ID (o EventSource do navegador faz isso sozinho) ou
+    em ?desde=; o evento "reinicio" indica que a agenda deve ser recarregada.
+    Exemplo de uso: /reservas/eventos?localizacao=Bloco%20A
+    """
+    try:
+        seq = eventos.canal.seq_de(desde or last_event_id)
+    except eventos.IdEventoInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+
+    filtro = eventos.Filtro(salas=frozenset(id_sala or ()), localizacao=localizacao)
+    return StreamingResponse(
+        eventos.canal.assinar(seq, filtro),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Séries recorrentes (caminho literal /series, antes de /{reserva_id})
+@router.get("/series/{serie_id}", response_model=schemas.SerieReserva, status_code=status.HTTP_200_OK)
+def get_serie_by_id_endpoint(serie_id: int, db: Session = Depends(get_db)):
+    """
+    Busca uma série de reservas recorrentes pelo ID.
+    Retorna 404 Not Found se a série não for encontrada.
+    """
+    serie = crud.get_serie_by_id(db=db, serie_id=serie_id)
+    if not serie:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Série não encontrada.")
+    return serie
+
 # 2. Rota para buscar uma reserva por ID (parâmetro de caminho)
 @router.get("/{reserva_id}", response_model=schemas.Reserva, status_code=status.HTTP_200_OK)
 def get_reserva_by_id_endpoint(reserva_id: int, db: Session = Depends(get_db)):
@@ -50,14 +121,23 @@ def get_reserva_by_id_endpoint(reserva_id: int, db: Session = Depends(get_db)):
 
 # 3. Rota mais genérica: Busca todas as reservas (sem parâmetros de caminho)
 @router.get("/", response_model=List[schemas.Reserva])
-def get_all_reservas_endpoint(db: Session = Depends(get_db)):
+def get_all_reservas_endpoint(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    historico: bool = False, # historico=true inclui as reservas arquivadas
+    db: Session = Depends(get_db)):
     """
-    Retorna todas as reservas cadastradas no sistema.
+    Retorna as reservas cadastradas no sistema, paginadas por cursor.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    Por padrão lista só as reservas ativas; as encerradas há mais que o
+    horizonte de retenção (arquivamento.py) entram com historico=true.
     """
     try:
-        # Assumindo que você terá uma função crud.get_all_reservas em crud.py
-        # ou, para simplicidade, um query direto:
-        return crud.get_all_reservas(db=db)
+        reservas, proximo_cursor = crud.get_all_reservas(db=db, limit=limit, cursor=cursor, linhas=True, historico=historico)
+        cabecalhos = {CABECALHO_PROXIMO_CURSOR: proximo_cursor} if proximo_cursor else None
+        return serializacao.RespostaRapida(serializacao.reservas(reservas), headers=cabecalhos)
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
 
@@ -72,9 +152,111 @@ def create_reserva_endpoint(reserva: schemas.ReservaCreate, db: Session = Depend
         return crud.create_reserva(db=db, reserva=reserva)
     except crud.ReservationConflictError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
     
+@router.post("/series", response_model=schemas.SerieReserva, status_code=status.HTTP_201_CREATED)
+def create_serie_endpoint(serie: schemas.SerieReservaCreate, db: Session = Depends(get_db)):
+    """
+    Cria uma série de reservas recorrentes (diária, semanal ou mensal).
+    A série é gravada uma única vez; as ocorrências aparecem nas listagens de
+    reservas com id_serie preenchido.
+    Retorna 409 Conflict se alguma ocorrência conflitar com outra reserva.
+    """
+    try:
+        return crud.create_serie(db=db, serie=serie)
+    except crud.ReservationConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+@router.post("/series/{serie_id}/excecoes", response_model=schemas.SerieReserva, status_code=status.HTTP_200_OK)
+def add_excecao_serie_endpoint(serie_id: int, excecao: schemas.ExcecaoSerie, db: Session = Depends(get_db)):
+    """
+    Cancela uma ocorrência da série, identificada pela sua data de início.
+    """
+    try:
+        serie = crud.add_excecao_serie(db=db, serie_id=serie_id, data_inicio=excecao.data_inicio)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not serie:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Série não encontrada.")
+    return serie
+
+@router.delete("/series/{serie_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_serie_endpoint(serie_id: int, db: Session = Depends(get_db)):
+    """
+    Deleta uma série e todas as suas ocorrências.
+    Retorna 404 Not Found se a série não for encontrada.
+    """
+    deleted = crud.delete_serie(db=db, serie_id=serie_id)
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Série não encontrada.")
+
+    return
+
+async def _linhas_ndjson(request: Request) -> AsyncIterator[bytes]:
+    """
+    Lê o corpo NDJSON à medida que chega, uma linha (reserva) por vez.
+    """
+    resto = b""
+    async for pedaco in request.stream():
+        resto += pedaco
+        *linhas, resto = resto.split(b"\n")
+        for linha in linhas:
+            if linha.strip():
+                yield linha
+    if resto.strip():
+        yield resto
+
+def _erro_validacao(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in erro['loc']) or 'item'}: {erro['msg']}" for erro in e.errors())
+
+def _validar_item(bruto: Union[bytes, object]) -> Union[schemas.ReservaCreate, str]:
+    try:
+        if isinstance(bruto, bytes):
+            return schemas.ReservaCreate.model_validate_json(bruto)
+        return schemas.ReservaCreate.model_validate(bruto)
+    except ValidationError as e:
+        return _erro_validacao(e)
+
+@router.post("/lote", response_model=schemas.ResultadoLote, status_code=status.HTTP_200_OK)
+async def create_reservas_lote_endpoint(request: Request, db: Session = Depends(get_db)):
+    """
+    Importa várias reservas em uma única transação.
+    Aceita um array JSON ou NDJSON (Content-Type: application/x-ndjson), uma reserva por linha.
+    Retorna o resultado de cada item, na ordem do envio; itens inválidos ou em
+    conflito são rejeitados sem impedir a gravação dos demais.
+    """
+    itens = []
+    if "ndjson" in request.headers.get("content-type", ""):
+        async for linha in _linhas_ndjson(request):
+            itens.append(_validar_item(linha))
+            if len(itens) > LIMITE_LOTE:
+                break
+    else:
+        try:
+            brutos = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Corpo da requisição não é um JSON válido.")
+        if not isinstance(brutos, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="O corpo deve ser um array JSON de reservas.")
+        itens = [_validar_item(bruto) for bruto in brutos[:LIMITE_LOTE + 1]]
+
+    if len(itens) > LIMITE_LOTE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"O lote pode ter no máximo {LIMITE_LOTE} reservas.")
+
+    try:
+        return await run_in_threadpool(crud.create_reservas_lote, db, itens)
+    except crud.ReservationConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
 @router.delete("/{reserva_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_reserva_endpoint(reserva_id: int, db: Session = Depends(get_db)):
     """
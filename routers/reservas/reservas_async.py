@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError
+import crud_async, schemas, serializacao
+from instrumentacao import RotaInstrumentada
+
+# Rotas de leitura de reservas no modo assíncrono (CONEXAO_DB_ASYNC).
+# São registradas antes do router síncrono e têm prioridade sobre as rotas
+# de mesmo caminho; as escritas continuam em reservas.py.
+router = APIRouter(
+    prefix="/reservas",
+    tags=["Reservas"],
+    route_class=RotaInstrumentada,
+)
+
+@router.get("/intervalo", response_model=List[schemas.Reserva], status_code=status.HTTP_200_OK)
+async def get_reservas_by_intervalo(
+    data_inicio: schemas.DataHora,
+    data_final: schemas.DataHora,
+    db: AsyncSession = Depends(get_async_db)):
+    """
+    Retorna todas as reservas que se sobrepõem a um período de datas específico.
+    """
+    try:
+        reservas = await crud_async.get_resrevas_by_period(db=db, start_date=data_inicio, end_date=data_final, linhas=True)
+        return serializacao.RespostaRapida(reservas)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+@router.get("/{reserva_id:int}", response_model=schemas.Reserva, status_code=status.HTTP_200_OK)
+async def get_reserva_by_id_endpoint(reserva_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Busca uma reserva pelo ID.
+    Retorna 404 Not Found se a reserva não for encontrada.
+    """
+    reserva = await crud_async.get_reserva_by_id(db=db, reserva_id=reserva_id)
+    if not reserva:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada.")
+
+    return reserva
+
+@router.get("/", response_model=List[schemas.Reserva])
+async def get_all_reservas_endpoint(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    historico: bool = False, # historico=true inclui as reservas arquivadas
+    db: AsyncSession = Depends(get_async_db)):
+    """
+    Retorna as reservas cadastradas no sistema, paginadas por cursor.
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
+    Por padrão lista só as reservas ativas; as encerradas há mais que o
+    horizonte de retenção (arquivamento.py) entram com historico=true.
+    """
+    try:
+        reservas, proximo_cursor = await crud_async.get_all_reservas(db=db, limit=limit, cursor=cursor, linhas=True, historico=historico)
+        cabecalhos = {CABECALHO_PROXIMO_CURSOR: proximo_cursor} if proximo_cursor else None
+        return serializacao.RespostaRapida(reservas, headers=cabecalhos)
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
@@ -1,44 +1,188 @@
 from typing import List, Optional # Importe Optional para a busca de nome
+from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from database import get_db
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError, IdsInvalidosError, ler_ids
 
-import crud, schemas 
+import cache, calendario, crud, schemas, serializacao
+from instrumentacao import RotaInstrumentada
 
 router = APIRouter(
     prefix="/salas", # Geralmente usamos o plural no prefixo RESTful
-    tags=["Salas"] # Capitalize tags
+    tags=["Salas"], # Capitalize tags
+    route_class=RotaInstrumentada,
 )
 
+# A resposta sai do cache do catálogo (com ETag/Last-Modified); com expand=false
+# as salas vêm sem usuarios/reservas.
 @router.get("/", response_model=List[schemas.Sala]) # Adicione response_model para FastAPI documentar
 def get_all_salas(
+    request: Request,
     nome: Optional[str] = None, # Adicione o parâmetro nome para busca
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    expand: bool = True, # expand=false retorna as salas sem usuarios/reservas
     db: Session = Depends(get_db)
 ):
     """
-    Retorna todas as salas cadastradas no sistema.
-    Pode filtrar por nome (busca parcial e case-insensitive).
+    Retorna as salas cadastradas no sistema, paginadas por cursor.
+    Pode filtrar por nome (busca parcial, sem diferenciar maiúsculas nem acentos).
+    O cursor da próxima página vem no cabeçalho X-Next-Cursor.
     """
+    chave = ("salas", "lista", nome, limit, cursor, expand)
+    em_cache = cache.catalogo.responder_do_cache(request, chave)
+    if em_cache:
+        return em_cache
+    geracao = cache.catalogo.geracao("salas")
     try:
-        return crud.get_all_salas(db=db, nome=nome) # Passe o nome para o CRUD
+        # linhas=True: salas já como dicionários, sem objetos ORM nem validação
+        salas, proximo_cursor = crud.get_all_salas(db=db, nome=nome, limit=limit, cursor=cursor, expand=expand, linhas=True) # Passe o nome para o CRUD
+        cabecalhos = {CABECALHO_PROXIMO_CURSOR: proximo_cursor} if proximo_cursor else None
+        return cache.catalogo.armazenar(chave, geracao, salas, cabecalhos)
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+# Caminho literal: precisa vir antes de /{sala_id}
+@router.get("/disponiveis", response_model=schemas.Disponibilidade)
+def get_salas_disponiveis(
+    data_inicio: schemas.DataHora,
+    data_final: schemas.DataHora,
+    capacidade: int = Query(1, ge=1), # Capacidade mínima
+    localizacao: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna as salas com capacidade >= capacidade livres em todo o período.
+    Se nenhuma estiver livre, sugere os próximos horários livres com a mesma duração.
+    Exemplo de uso: /salas/disponiveis?data_inicio=2025-06-26T15:00:00&data_final=2025-06-26T16:00:00&capacidade=8
+    """
+    if data_final <= data_inicio:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A data final deve ser posterior à data de início.")
+    try:
+        salas = crud.get_salas_disponiveis(db=db, start_date=data_inicio, end_date=data_final, capacidade=capacidade, localizacao=localizacao, limit=limit)
+        sugestoes = []
+        if not salas:
+            sugestoes = crud.sugerir_horarios(db=db, start_date=data_inicio, end_date=data_final, capacidade=capacidade, localizacao=localizacao)
+        return schemas.Disponibilidade(salas=[schemas.SalaResumo.model_validate(sala) for sala in salas], sugestoes=sugestoes)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+# Caminho literal: precisa vir antes de /{sala_id}
+@router.get("/busca", response_model=List[schemas.SalaBusca])
+def buscar_salas(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca salas por nome ou localização, para a caixa de busca: casa prefixos
+    e tolera erros de digitação, com as mais relevantes primeiro.
+    Exemplo de uso: /salas/busca?q=audit
+    """
+    try:
+        return serializacao.RespostaRapida(crud.buscar_salas(db=db, texto=q, limit=limit))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+# Caminho literal: precisa vir antes de /{sala_id}
+@router.get("/lote", response_model=schemas.LoteSalas)
+def get_salas_by_ids(
+    ids: List[str] = Query(...),
+    expand: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    Busca várias salas de uma vez, na ordem pedida; os IDs inexistentes vêm
+    em nao_encontrados. Salas já no cache do catálogo são reaproveitadas e as
+    demais vêm numa única consulta.
+    Exemplo de uso: /salas/lote?ids=3,1,7 (ou ?ids=3&ids=1&ids=7)
+    """
+    try:
+        sala_ids = ler_ids(ids)
+    except IdsInvalidosError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    schema = schemas.Sala if expand else schemas.SalaResumo
+    def buscar(faltando: List[int]):
+        salas = crud.get_salas_by_ids(db=db, sala_ids=faltando, expand=expand)
+        return [schema.model_validate(sala, from_attributes=True) if sala else None for sala in salas]
+    try:
+        return cache.catalogo.responder_lote("salas", sala_ids, expand, buscar)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+# Caminho literal: precisa vir antes de /{sala_id}
+@router.delete("/lote", response_model=schemas.RemocaoLote)
+def delete_salas(
+    ids: List[str] = Query(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Deleta várias salas de uma vez, com suas reservas, séries e associações
+    com usuários, em transações de até crud.LOTE_EXCLUSAO salas; os IDs
+    inexistentes vêm em nao_encontrados.
+    Exemplo de uso: DELETE /salas/lote?ids=3,1,7 (ou ?ids=3&ids=1&ids=7)
+    """
+    try:
+        sala_ids = ler_ids(ids)
+    except IdsInvalidosError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    try:
+        removidas = set(crud.delete_salas(db=db, sala_ids=sala_ids))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+    return {
+        "removidos": [sala_id for sala_id in sala_ids if sala_id in removidas],
+        "nao_encontrados": [sala_id for sala_id in sala_ids if sala_id not in removidas],
+    }
+
+# Caminho literal: precisa vir antes de /{sala_id}
+@router.get("/calendario", response_model=schemas.Calendario)
+def get_calendario(
+    data_inicio: date,
+    dias: int = Query(7, ge=1, le=calendario.LIMITE_DIAS),
+    capacidade: int = Query(1, ge=1), # Capacidade mínima
+    localizacao: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna a ocupação de cada sala compatível, dia a dia, em slots de
+    tamanho fixo (slot_minutos): um mapa de bits por sala e por dia, em base64.
+    Para saber se uma sala está livre num período alinhado aos slots, basta
+    conferir se os bits do período estão zerados.
+    Exemplo de uso: /salas/calendario?data_inicio=2025-06-23&dias=5&localizacao=Bloco%20A
+    """
+    try:
+        return serializacao.RespostaRapida(crud.get_calendario(db=db, data_inicio=data_inicio, dias=dias, capacidade=capacidade, localizacao=localizacao))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
 
 @router.get("/{sala_id}", response_model=schemas.Sala, status_code=status.HTTP_200_OK)
 def get_sala_by_id(
+    request: Request,
     sala_id: int, # Isso captura o '1' da URL /salas/1
+    expand: bool = True,
     db: Session = Depends(get_db)
 ):
     """
     Busca uma sala pelo ID.
     Retorna 404 Not Found se a sala não for encontrada.
     """
-    sala = crud.get_sala_by_id(db=db, sala_id=sala_id)
+    chave = ("salas", "item", sala_id, expand)
+    em_cache = cache.catalogo.responder_do_cache(request, chave)
+    if em_cache:
+        return em_cache
+    geracao = cache.catalogo.geracao("salas")
+    sala = crud.get_sala_by_id(db=db, sala_id=sala_id, expand=expand)
     if not sala:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sala não encontrada.")
     
-    return sala
+    schema = schemas.Sala if expand else schemas.SalaResumo
+    return cache.catalogo.armazenar(chave, geracao, schema.model_validate(sala, from_attributes=True))
 
 @router.post("/", response_model=schemas.Sala, status_code=status.HTTP_201_CREATED)
 def create_sala(
@@ -66,11 +210,10 @@ def delete_sala(
     """
     try:
         deleted = crud.delete_sala(db=db, sala_id=sala_id)
-        if not deleted:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sala não encontrada.")
-        
-        # Como o status é 204, não precisamos retornar nada. FastAPI lida com isso.
-        return 
-    
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sala não encontrada.")
+
+    # Como o status é 204, não precisamos retornar nada. FastAPI lida com isso.
+    return
\ No newline at end of file
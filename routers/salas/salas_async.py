@@ -0,0 +1,67 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError
+
+import cache, crud_async, schemas
+from instrumentacao import RotaInstrumentada
+
+# Rotas de leitura de salas no modo assíncrono (CONEXAO_DB_ASYNC).
+# São registradas antes do router síncrono e têm prioridade sobre as rotas
+# de mesmo caminho; as escritas continuam em salas.py.
+router = APIRouter(
+    prefix="/salas",
+    tags=["Salas"],
+    route_class=RotaInstrumentada,
+)
+
+@router.get("/", response_model=List[schemas.Sala])
+async def get_all_salas(
+    request: Request,
+    nome: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    expand: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Retorna as salas cadastradas no sistema, paginadas por cursor.
+    Pode filtrar por nome (busca parcial, sem diferenciar maiúsculas nem acentos).
+    """
+    chave = ("salas", "lista", nome, limit, cursor, expand)
+    em_cache = cache.catalogo.responder_do_cache(request, chave)
+    if em_cache:
+        return em_cache
+    geracao = cache.catalogo.geracao("salas")
+    try:
+        salas, proximo_cursor = await crud_async.get_all_salas(db=db, nome=nome, limit=limit, cursor=cursor, expand=expand, linhas=True)
+        cabecalhos = {CABECALHO_PROXIMO_CURSOR: proximo_cursor} if proximo_cursor else None
+        return cache.catalogo.armazenar(chave, geracao, salas, cabecalhos)
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno do servidor: {e}")
+
+@router.get("/{sala_id:int}", response_model=schemas.Sala, status_code=status.HTTP_200_OK)
+async def get_sala_by_id(
+    request: Request,
+    sala_id: int,
+    expand: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Busca uma sala pelo ID.
+    Retorna 404 Not Found se a sala não for encontrada.
+    """
+    chave = ("salas", "item", sala_id, expand)
+    em_cache = cache.catalogo.responder_do_cache(request, chave)
+    if em_cache:
+        return em_cache
+    geracao = cache.catalogo.geracao("salas")
+    sala = await crud_async.get_sala_by_id(db=db, sala_id=sala_id, expand=expand)
+    if not sala:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sala não encontrada.")
+
+    return cache.catalogo.armazenar(chave, geracao, sala)
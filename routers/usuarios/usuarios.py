@@ -1,40 +1,110 @@
 from typing import List, Optional # Keep Optional for potential future filters
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from database import get_db
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError, IdsInvalidosError, ler_ids
 
-import crud, schemas, models# No need to import 'models' directly in the router
+import cache, crud, schemas, models# No need to import 'models' directly in the router
+from instrumentacao import RotaInstrumentada
 
 router = APIRouter(
     prefix="/usuarios", # Plural is common for RESTful endpoints
-    tags=["Usuários"] # Capitalized tag for consistency
+    tags=["Usuários"], # Capitalized tag for consistency
+    route_class=RotaInstrumentada,
 )
 
-@router.get("/", response_model=List[schemas.Usuario]) # Specify the response model
-def get_all_users(db: Session = Depends(get_db)):
+# response_model_exclude_unset: with expand=false the relations are left out of the response
+@router.get("/", response_model=List[schemas.Usuario], response_model_exclude_unset=True) # Specify the response model
+def get_all_users(
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    expand: bool = True, # expand=false returns users without their rooms
+    db: Session = Depends(get_db)
+):
     """
-    Returns all registered users in the system.
+    Returns the registered users, paginated by cursor.
+    The next page cursor is sent in the X-Next-Cursor header.
     """
     try:
-        # Assuming you'll add a get_all_users function in crud.py
-        # You can add filters here if needed, similar to get_all_salas
-        return db.query(models.Usuario).all() # Simple retrieval if no specific CRUD function yet
+        users, next_cursor = crud.get_all_users(db=db, limit=limit, cursor=cursor, expand=expand)
+        if next_cursor:
+            response.headers[CABECALHO_PROXIMO_CURSOR] = next_cursor
+        if not expand:
+            return [schemas.UsuarioResumo.model_validate(user) for user in users]
+        return users
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
+# Literal path: must come before /{user_id}
+@router.get("/lote", response_model=schemas.LoteUsuarios)
+def get_users_by_ids(ids: List[str] = Query(...), expand: bool = True, db: Session = Depends(get_db)):
+    """
+    Retrieves several users at once, in the requested order; unknown IDs are
+    listed in nao_encontrados. Users already in the catalog cache are reused
+    and the rest come from a single query.
+    Example: /usuarios/lote?ids=3,1,7 (or ?ids=3&ids=1&ids=7)
+    """
+    try:
+        user_ids = ler_ids(ids)
+    except IdsInvalidosError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    schema = schemas.Usuario if expand else schemas.UsuarioResumo
+    def fetch(missing: List[int]):
+        users = crud.get_users_by_ids(db=db, user_ids=missing, expand=expand)
+        return [schema.model_validate(user, from_attributes=True) if user else None for user in users]
+    try:
+        return cache.catalogo.responder_lote("usuarios", user_ids, expand, fetch)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+# Literal path: must come before /{user_id}
+@router.delete("/lote", response_model=schemas.RemocaoLote)
+def delete_users(ids: List[str] = Query(...), db: Session = Depends(get_db)):
+    """
+    Deletes several users at once, with their reservations, series and room
+    associations, in transactions of up to crud.LOTE_EXCLUSAO users; unknown
+    IDs are listed in nao_encontrados.
+    Example: DELETE /usuarios/lote?ids=3,1,7 (or ?ids=3&ids=1&ids=7)
+    """
+    try:
+        user_ids = ler_ids(ids)
+    except IdsInvalidosError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    try:
+        deleted = set(crud.delete_users(db=db, user_ids=user_ids))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+    return {
+        "removidos": [user_id for user_id in user_ids if user_id in deleted],
+        "nao_encontrados": [user_id for user_id in user_ids if user_id not in deleted],
+    }
+
 @router.get("/{user_id}", response_model=schemas.Usuario, status_code=status.HTTP_200_OK)
-def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+def get_user_by_id(request: Request, user_id: int, expand: bool = True, db: Session = Depends(get_db)):
 
     """"
         Retrieves a user by ID.
-        return user
+        The response is served from the catalog cache (with ETag/Last-Modified).
     """
 
+    key = ("usuarios", "item", user_id, expand)
+    cached = cache.catalogo.responder_do_cache(request, key)
+    if cached:
+        return cached
+    generation = cache.catalogo.geracao("usuarios")
     try:
-        return crud.get_user_by_id(db=db, user_id=user_id)
+        user = crud.get_user_by_id(db=db, user_id=user_id, expand=expand)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Internal server error: {e}")
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+
+    schema = schemas.Usuario if expand else schemas.UsuarioResumo
+    return cache.catalogo.armazenar(key, generation, schema.model_validate(user, from_attributes=True))
 
 @router.post("/", response_model=schemas.Usuario, status_code=status.HTTP_201_CREATED)
 def create_user_endpoint(user: schemas.UsuarioCreate, db: Session = Depends(get_db)): # Use UsuarioCreate for input
@@ -55,11 +125,9 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     Returns 204 No Content on success.
     """
     try:
-        user = crud.get_user_by_id(db=db, user_id=user_id)
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
-        
-        crud.delete_user(db=db, user_id=user_id) # Assuming you have this function in crud.py
-        return None # FastAPI will return 204 No Content automatically
+        deleted = crud.delete_user(db=db, user_id=user_id)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    return None # FastAPI will return 204 No Content automatically
\ No newline at end of file
@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, LIMITE_PADRAO, CursorInvalidoError
+
+import cache, crud_async, schemas
+from instrumentacao import RotaInstrumentada
+
+# Read routes for users in async mode (CONEXAO_DB_ASYNC).
+# They are registered before the sync router and take precedence over routes
+# with the same path; writes stay in usuarios.py.
+router = APIRouter(
+    prefix="/usuarios",
+    tags=["Usuários"],
+    route_class=RotaInstrumentada,
+)
+
+@router.get("/", response_model=List[schemas.Usuario], response_model_exclude_unset=True)
+async def get_all_users(
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    expand: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns the registered users, paginated by cursor.
+    The next page cursor is sent in the X-Next-Cursor header.
+    """
+    try:
+        users, next_cursor = await crud_async.get_all_users(db=db, limit=limit, cursor=cursor, expand=expand)
+        if next_cursor:
+            response.headers[CABECALHO_PROXIMO_CURSOR] = next_cursor
+        return users
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+@router.get("/{user_id:int}", response_model=schemas.Usuario, status_code=status.HTTP_200_OK)
+async def get_user_by_id(request: Request, user_id: int, expand: bool = True, db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieves a user by ID.
+    The response is served from the catalog cache (with ETag/Last-Modified).
+    Returns 404 Not Found if the user does not exist.
+    """
+    key = ("usuarios", "item", user_id, expand)
+    cached = cache.catalogo.responder_do_cache(request, key)
+    if cached:
+        return cached
+    generation = cache.catalogo.geracao("usuarios")
+    user = await crud_async.get_user_by_id(db=db, user_id=user_id, expand=expand)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+
+    return cache.catalogo.armazenar(key, generation, user)
@@ -1,6 +1,18 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, Field
+from datetime import date, datetime, timezone
+from typing import Annotated, List, Optional
+
+# --- Datas ---
+def sem_fuso(valor: datetime) -> datetime:
+    # O banco guarda as datas sem fuso (DateTime), e todas as comparações são
+    # entre datas sem fuso: uma data com fuso (ex. 2030-01-01T10:00Z) é
+    # convertida para UTC e perde o tzinfo na entrada.
+    if valor.tzinfo is not None:
+        valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return valor
+
+# datetime recebido pela API (corpo ou parâmetro de consulta), já sem fuso
+DataHora = Annotated[datetime, AfterValidator(sem_fuso)]
 
 # --- Schemas para Usuario ---
 class UsuarioBase(BaseModel):
@@ -12,15 +24,19 @@ class UsuarioCreate(UsuarioBase):
     # Não inclui 'id', pois ele é gerado pelo banco de dados.
     pass
 
-class Usuario(UsuarioBase):
-    # Este schema é usado para retornar um usuário existente.
-    # Inclui 'id' e as relações (salas), que são carregadas do DB.
+class UsuarioResumo(UsuarioBase):
+    # Usuário sem relações: usado dentro de Sala (evita o ciclo
+    # usuario -> salas -> usuarios -> ...) e nas listagens com expand=false.
     id: int
-    salas: List["Sala"] = [] # Forward reference para evitar circularidade
 
     class Config:
         from_attributes = True
 
+class Usuario(UsuarioResumo):
+    # Este schema é usado para retornar um usuário existente.
+    # Inclui 'id' e as relações (salas), que são carregadas do DB.
+    salas: List["Sala"] = [] # Forward reference para evitar circularidade
+
 # --- Schemas para Sala ---
 class SalaBase(BaseModel):
     nome: str
@@ -31,22 +47,26 @@ class SalaCreate(SalaBase):
     # Este schema é usado para criar uma nova sala.
     pass
 
-class Sala(SalaBase):
-    # Este schema é usado para retornar uma sala existente.
-    # Inclui 'id' e as relações (usuarios, reservas).
+class SalaResumo(SalaBase):
+    # Sala sem relações: usado nas listagens com expand=false.
     id: int
-    usuarios: List[Usuario] = []
-    reservas: List["Reserva"] = [] # Forward reference para evitar circularidade
 
     class Config:
         from_attributes = True
 
+class Sala(SalaResumo):
+    # Este schema é usado para retornar uma sala existente.
+    # Inclui 'id' e as relações (usuarios, reservas).
+    # Os usuários vêm resumidos, o que limita a profundidade do objeto.
+    usuarios: List[UsuarioResumo] = []
+    reservas: List["Reserva"] = [] # Forward reference para evitar circularidade
+
 # --- Schemas para Reserva ---
 class ReservaBase(BaseModel):
     id_sala: int
     id_usuario: int
-    data_inicio: datetime
-    data_final: datetime
+    data_inicio: DataHora
+    data_final: DataHora
 
 class ReservaCreate(ReservaBase):
     # Este schema é usado para criar uma nova reserva.
@@ -55,7 +75,9 @@ class ReservaCreate(ReservaBase):
 
 class Reserva(ReservaBase):
     # Este schema é usado para retornar uma reserva existente.
-    id: int
+    # Ocorrências de séries recorrentes não têm id próprio: vêm com id=None e id_serie.
+    id: Optional[int] = None
+    id_serie: Optional[int] = None
     sala: SalaBase # Inclui o objeto Sala completo
     usuario: UsuarioBase # Inclui o objeto Usuario completo
     participantes: int # O campo 'participantes' deve vir do banco de dados
@@ -63,6 +85,110 @@ class Reserva(ReservaBase):
     class Config:
         from_attributes = True
 
+# --- Schemas para séries de reservas recorrentes ---
+class SerieReservaCreate(ReservaCreate):
+    # data_inicio/data_final são os da primeira ocorrência.
+    # É preciso informar ocorrencias, data_limite ou os dois.
+    frequencia: str = Field(pattern="^(diaria|semanal|mensal)$")
+    intervalo: int = Field(1, ge=1) # A cada quantos dias/semanas/meses
+    ocorrencias: Optional[int] = Field(None, ge=1)
+    data_limite: Optional[DataHora] = None # Data de início máxima de uma ocorrência
+    excecoes: List[DataHora] = [] # Datas de início das ocorrências canceladas
+
+class ExcecaoSerie(BaseModel):
+    data_inicio: DataHora
+
+    class Config:
+        from_attributes = True
+
+class SerieReserva(ReservaBase):
+    id: int
+    participantes: int
+    frequencia: str
+    intervalo: int
+    ocorrencias: Optional[int] = None
+    data_limite: Optional[datetime] = None
+    fim_serie: datetime # Fim da última ocorrência
+    excecoes: List[ExcecaoSerie] = []
+    sala: SalaBase
+    usuario: UsuarioBase
+
+    class Config:
+        from_attributes = True
+
+# --- Schemas para busca de salas livres ---
+class HorarioSugerido(BaseModel):
+    # Próximo horário livre, com a mesma duração pedida, em uma sala compatível.
+    sala: SalaResumo
+    data_inicio: datetime
+    data_final: datetime
+
+class Disponibilidade(BaseModel):
+    salas: List[SalaResumo] # Salas livres no período pedido
+    sugestoes: List[HorarioSugerido] = [] # Preenchido só quando nenhuma sala está livre
+
+# --- Schemas para relatórios de ocupação ---
+class GrupoOcupacao(BaseModel):
+    # Uma sala ou localização; cada lista tem um valor por bucket do relatório.
+    grupo: str
+    salas: int
+    minutos_ocupados: List[float]
+    reservas: List[int]
+    taxa_ocupacao: List[float] # minutos ocupados / minutos disponíveis no bucket
+    participantes_por_capacidade: List[Optional[float]] # média ponderada pelos minutos ocupados
+
+class RelatorioOcupacao(BaseModel):
+    data_inicio: datetime
+    data_final: datetime
+    agrupar: str
+    periodo: str
+    buckets: List[str] # rótulo de cada bucket (ex.: "08h", "seg", "seg 08h")
+    grupos: List[GrupoOcupacao]
+
+# --- Schemas para a busca de salas por texto ---
+class SalaBusca(SalaResumo):
+    # Fração dos trigramas da busca encontrados no nome ou na localização (0 a 1)
+    pontuacao: float
+
+# --- Schemas para a busca por vários IDs ---
+# Itens na ordem dos IDs pedidos; com expand=false vêm sem as relações.
+class LoteSalas(BaseModel):
+    salas: List[Sala]
+    nao_encontrados: List[int]
+
+class LoteUsuarios(BaseModel):
+    usuarios: List[Usuario]
+    nao_encontrados: List[int]
+
+class RemocaoLote(BaseModel):
+    removidos: List[int]
+    nao_encontrados: List[int]
+
+# --- Schemas para o calendário (mapas de ocupação por slot) ---
+class CalendarioSala(SalaResumo):
+    # Um mapa por dia, na ordem de Calendario.dias, em base64: o slot i do dia
+    # é o bit i % 8 (do menos significativo) do byte i // 8; 1 = ocupado.
+    mapas: List[str]
+
+class Calendario(BaseModel):
+    slot_minutos: int
+    slots_por_dia: int
+    dias: List[date]
+    salas: List[CalendarioSala]
+
+# --- Schemas para importação em lote de reservas ---
+class ResultadoItemLote(BaseModel):
+    # Resultado de cada item do lote, na mesma ordem do envio.
+    indice: int
+    status: str # "criada", "conflito" ou "invalida"
+    id: Optional[int] = None # ID da reserva criada
+    erro: Optional[str] = None
+
+class ResultadoLote(BaseModel):
+    criadas: int
+    rejeitadas: int
+    itens: List[ResultadoItemLote]
+
 # --- Ajuste de Forward References (IMPORTANTE para evitar erros) ---
 # Isso resolve dependências circulares entre os modelos
 Usuario.model_rebuild()
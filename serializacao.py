@@ -0,0 +1,116 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from recorrencia import Ocorrencia
+
+# Caminho rápido de serialização das listagens.
+# Em vez de hidratar objetos ORM, validá-los nos schemas e só então gerar o
+# JSON, as listagens leem apenas as colunas usadas na resposta (linhas
+# simples) e montam os dicionários no mesmo formato e ordem de campos dos
+# schemas (schemas.Reserva, schemas.Sala...), codificados direto em bytes.
+# Usa o orjson quando instalado; sem ele, cai no json da biblioteca padrão.
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+
+def _padrao(obj: Any) -> Any:
+    # Tipos que o codificador não conhece: schemas (respostas ainda montadas
+    # com Pydantic) e, no json da biblioteca padrão, datas.
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, datetime) and obj.utcoffset() is not None and not obj.utcoffset():
+        return obj.isoformat().replace("+00:00", "Z")  # como o orjson com OPT_UTC_Z e o Pydantic
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+def dumps(dados: Any) -> bytes:
+    """
+    Serializa os dados em JSON (UTF-8, sem espaços).
+    """
+    if orjson is not None:
+        return orjson.dumps(dados, default=_padrao, option=orjson.OPT_UTC_Z)
+    return json.dumps(dados, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespostaRapida(Response):
+    """
+    Resposta JSON serializada por dumps, sem passar pelo response_model.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --- Montagem das respostas a partir de linhas ---
+# As linhas de reserva vêm de crud._consulta_linhas_reserva, nesta ordem:
+# id, id_sala, id_usuario, data_inicio, data_final, participantes,
+# sala_nome, sala_capacidade, sala_localizacao, usuario_nome, usuario_email
+# e são lidas por posição (mais barato que por nome em milhares de linhas).
+
+def reserva(linha: Any) -> Dict[str, Any]:
+    """
+    schemas.Reserva de uma linha de reserva ou de uma recorrencia.Ocorrencia.
+    """
+    if isinstance(linha, Ocorrencia):  # sala e usuário vêm da série
+        return {
+            "id_sala": linha.id_sala,
+            "id_usuario": linha.id_usuario,
+            "data_inicio": linha.data_inicio,
+            "data_final": linha.data_final,
+            "id": None,
+            "id_serie": linha.id_serie,
+            "sala": {"nome": linha.sala.nome, "capacidade": linha.sala.capacidade, "localizacao": linha.sala.localizacao},
+            "usuario": {"nome": linha.usuario.nome, "email": linha.usuario.email},
+            "participantes": linha.participantes,
+        }
+    (id_reserva, id_sala, id_usuario, data_inicio, data_final, participantes,
+     sala_nome, sala_capacidade, sala_localizacao, usuario_nome, usuario_email) = linha
+    return {
+        "id_sala": id_sala,
+        "id_usuario": id_usuario,
+        "data_inicio": data_inicio,
+        "data_final": data_final,
+        "id": id_reserva,
+        "id_serie": None,
+        "sala": {"nome": sala_nome, "capacidade": sala_capacidade, "localizacao": sala_localizacao},
+        "usuario": {"nome": usuario_nome, "email": usuario_email},
+        "participantes": participantes,
+    }
+
+
+def reservas(linhas: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [reserva(linha) for linha in linhas]
+
+
+def usuario_resumo(linha: Any) -> Dict[str, Any]:
+    """
+    schemas.UsuarioResumo de uma linha (id, nome, email), lida por posição.
+    """
+    id_usuario, nome, email = linha
+    return {"nome": nome, "email": email, "id": id_usuario}
+
+
+def sala(linha: Any, usuarios: Optional[List[Dict[str, Any]]] = None,
+         reservas_sala: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    schemas.SalaResumo de uma linha (id, nome, capacidade, localizacao), lida
+    por posição, ou schemas.Sala quando as relações são informadas.
+    """
+    id_sala, nome, capacidade, localizacao = linha
+    dados = {"nome": nome, "capacidade": capacidade, "localizacao": localizacao, "id": id_sala}
+    if usuarios is not None:
+        dados["usuarios"] = usuarios
+    if reservas_sala is not None:
+        dados["reservas"] = reservas_sala
+    return dados
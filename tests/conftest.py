@@ -0,0 +1,54 @@
+"""
+Configuração comum dos testes: um banco SQLite temporário (CONEXAO_DB é lido
+na importação de database.py, então precisa ser definido antes de importar o
+app) e fixtures para recriar o banco e chamar a API.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+os.environ["CONEXAO_DB"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'testes.db')}"
+os.environ["CONEXAO_DB_ASYNC"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import busca_salas, cache, models  # noqa: E402
+from database import engine  # noqa: E402
+from indice_reservas import indice  # noqa: E402
+from main import app  # noqa: E402
+
+
+def recriar_banco() -> None:
+    """
+    Apaga e recria as tabelas, e esquece o que os índices e caches em memória
+    sabiam do banco anterior.
+    """
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    indice.limpar()
+    busca_salas.indice.carregado = False
+    cache.catalogo.invalidar("salas", "usuarios")
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def banco():
+    recriar_banco()
+
+
+@pytest.fixture
+def sala_e_usuario(banco, cliente):
+    """
+    Um usuário e uma sala de capacidade 10 (IDs 1), num banco vazio.
+    """
+    assert cliente.post("/usuarios/", json={"nome": "Ana", "email": "ana@exemplo.com"}).status_code == 201
+    assert cliente.post("/salas/", json={"nome": "Sala A", "capacidade": 10, "localizacao": "Térreo"}).status_code == 201
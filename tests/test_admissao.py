@@ -0,0 +1,121 @@
+"""
+Controle de admissão das rotas caras (admissao.py): fila limitada, prazo,
+503 com Retry-After e prioridade das escritas.
+"""
+import asyncio
+
+import pytest
+
+from admissao import ESCRITA, FILA_CHEIA, LEITURA, PRAZO, ControleAdmissao, Limitador, MiddlewareAdmissao
+
+
+def test_fila_cheia_e_prazo():
+    async def cenario():
+        limitador = Limitador("teste", limite=1, fila=1)
+        assert await limitador.entrar(LEITURA, 1) is None
+        espera = asyncio.create_task(limitador.entrar(LEITURA, 1))
+        await asyncio.sleep(0)
+        # A fila (de 1) está ocupada pela espera acima
+        assert await limitador.entrar(LEITURA, 1) == FILA_CHEIA
+        limitador.sair()
+        assert await espera is None
+        # Sem vaga e sem tempo para esperar
+        assert await limitador.entrar(LEITURA, 0) == PRAZO
+        assert await limitador.entrar(LEITURA, 0.01) == PRAZO
+        limitador.sair()
+        return limitador
+
+    limitador = asyncio.run(cenario())
+    assert limitador.em_uso == 0
+    assert limitador.admitidas == 2
+    assert limitador.rejeitadas == {FILA_CHEIA: 1, PRAZO: 2}
+
+
+def test_escritas_passam_na_frente_das_leituras():
+    async def cenario():
+        limitador = Limitador("teste", limite=1, fila=10)
+        assert await limitador.entrar(LEITURA, 1) is None
+        ordem = []
+
+        async def entrar(nome, prioridade):
+            assert await limitador.entrar(prioridade, 1) is None
+            ordem.append(nome)
+            await asyncio.sleep(0)
+            limitador.sair()
+
+        tarefas = [asyncio.create_task(entrar(nome, prioridade)) for nome, prioridade in
+                   [("leitura 1", LEITURA), ("escrita 1", ESCRITA), ("leitura 2", LEITURA), ("escrita 2", ESCRITA)]]
+        await asyncio.sleep(0)
+        limitador.sair()
+        await asyncio.gather(*tarefas)
+        return ordem
+
+    assert asyncio.run(cenario()) == ["escrita 1", "escrita 2", "leitura 1", "leitura 2"]
+
+
+def test_reserva_de_vagas_para_escritas():
+    async def cenario():
+        limitador = Limitador("teste", limite=2, fila=10, reserva=1)
+        assert await limitador.entrar(LEITURA, 1) is None
+        # A segunda vaga é das escritas
+        assert await limitador.entrar(LEITURA, 0) == PRAZO
+        assert await limitador.entrar(ESCRITA, 0) is None
+        return limitador.em_uso
+
+    assert asyncio.run(cenario()) == 2
+
+
+@pytest.mark.parametrize("metodo, caminho, esperado", [
+    ("GET", "/reservas/", [("/reservas", LEITURA), ("leituras", LEITURA), ("compartilhado", LEITURA)]),
+    ("GET", "/analises/ocupacao", [("/analises/ocupacao", LEITURA), ("leituras", LEITURA), ("compartilhado", LEITURA)]),
+    ("GET", "/reservas/1", []),
+    ("POST", "/reservas/", [("compartilhado", ESCRITA)]),
+    ("DELETE", "/salas/1", [("compartilhado", ESCRITA)]),
+    ("POST", "/eventos", []),
+])
+def test_limitadores_de_cada_rota(metodo, caminho, esperado):
+    limitadores = ControleAdmissao().limitadores(metodo, caminho)
+    assert [(limitador.nome, prioridade) for limitador, prioridade in limitadores] == esperado
+
+
+def test_middleware_responde_503_com_retry_after():
+    async def cenario():
+        liberar = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await liberar.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        controle = ControleAdmissao(ativa=True, concorrencia=2, reserva_escritas=1, fila=0,
+                                    concorrencia_leituras=1, fila_leituras=0, concorrencia_rota=1, fila_rota=0,
+                                    prazo_ms=10)
+        middleware = MiddlewareAdmissao(app, controle, retry_after=3)
+
+        async def chamar(metodo, caminho):
+            enviados = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                enviados.append(message)
+
+            await middleware({"type": "http", "method": metodo, "path": caminho, "headers": []}, receive, send)
+            return enviados[0]
+
+        leitura = asyncio.create_task(chamar("GET", "/reservas/"))
+        await asyncio.sleep(0)
+        rejeitada = await chamar("GET", "/reservas/")
+        # A escrita usa a vaga reservada do limite compartilhado
+        escrita = asyncio.create_task(chamar("POST", "/reservas/"))
+        await asyncio.sleep(0)
+        liberar.set()
+        return rejeitada, (await leitura)["status"], (await escrita)["status"], controle
+
+    rejeitada, leitura, escrita, controle = asyncio.run(cenario())
+    assert rejeitada["status"] == 503
+    assert (b"retry-after", b"3") in rejeitada["headers"]
+    assert (leitura, escrita) == (200, 200)
+    # Todas as vagas foram devolvidas
+    assert controle.compartilhado.em_uso == controle.leituras.em_uso == controle.rotas["/reservas"].em_uso == 0
@@ -0,0 +1,65 @@
+"""
+Arquivamento das reservas antigas e IDs que não se repetem entre a tabela
+quente e o histórico.
+"""
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+import arquivamento, migracoes, models
+from database import SessionLocal
+
+
+def reservar(cliente, inicio: str, final: str) -> int:
+    resposta = cliente.post("/reservas/", json={
+        "id_sala": 1, "id_usuario": 1, "data_inicio": inicio, "data_final": final,
+    })
+    assert resposta.status_code == 201, resposta.text
+    return resposta.json()["id"]
+
+
+def test_apagar_recriar_e_arquivar(cliente, sala_e_usuario):
+    antigas = [reservar(cliente, f"2001-01-0{dia}T10:00:00", f"2001-01-0{dia}T11:00:00") for dia in (1, 2)]
+    assert arquivamento.arquivar(pausa=0) == 2
+
+    # A reserva de maior ID é apagada e outra é criada no lugar: o ID não volta
+    ultima = reservar(cliente, "2001-01-03T10:00:00", "2001-01-03T11:00:00")
+    assert cliente.delete(f"/reservas/{ultima}").status_code == 204
+    nova = reservar(cliente, "2001-01-04T10:00:00", "2001-01-04T11:00:00")
+    assert nova not in antigas + [ultima]
+
+    assert arquivamento.arquivar(pausa=0) == 1
+    with SessionLocal() as db:
+        assert sorted(db.scalars(select(models.ReservaHistorico.id))) == sorted(antigas + [nova])
+        assert db.scalar(select(func.count()).select_from(models.Reserva)) == 0
+
+
+def test_migracao_passa_a_usar_autoincrement():
+    # Banco criado antes do AUTOINCREMENT, com a reserva de maior ID já arquivada
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'antigo.db')}")
+    tabelas = [tabela for tabela in models.Base.metadata.sorted_tables if tabela.name != "reservas"]
+    models.Base.metadata.create_all(bind=engine, tables=tabelas)
+    inicio = datetime(2001, 1, 1, 10)
+    with engine.begin() as conexao:
+        conexao.execute(text(
+            "CREATE TABLE reservas (id INTEGER PRIMARY KEY, id_sala INTEGER, id_usuario INTEGER, "
+            "data_inicio DATETIME, data_final DATETIME, participantes INTEGER)"
+        ))
+        conexao.execute(insert(models.Reserva), [{"id": 1, "id_sala": 1, "id_usuario": 1,
+                                                  "data_inicio": inicio, "data_final": inicio}])
+        conexao.execute(insert(models.ReservaHistorico), [{"id": 7, "id_sala": 1, "id_usuario": 1,
+                                                           "data_inicio": inicio, "data_final": inicio,
+                                                           "arquivada_em": inicio}])
+
+    migracoes.migrar(engine)
+    migracoes.migrar(engine)  # a segunda vez não muda nada
+
+    with engine.begin() as conexao:
+        sql = conexao.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'reservas'"))
+        assert "AUTOINCREMENT" in sql.upper()
+        conexao.execute(insert(models.Reserva), [{"id_sala": 1, "id_usuario": 1,
+                                                  "data_inicio": inicio, "data_final": inicio}])
+        assert sorted(conexao.scalars(select(models.Reserva.id))) == [1, 8]
+    engine.dispose()
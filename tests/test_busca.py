@@ -0,0 +1,60 @@
+"""
+Busca de salas por trigramas (busca_salas.py): prefixos e erros de digitação.
+"""
+import pytest
+
+from busca_salas import IndiceBusca, _distancia
+
+SALAS = [
+    (1, "Sala A", "Térreo"),
+    (2, "Auditório", "2º andar"),
+    (3, "Sala de Reunião", "1º andar"),
+    (4, "Sorvete", "Cozinha"),
+    (5, "Laboratório", "Bloco B"),
+]
+
+
+@pytest.fixture
+def indice():
+    indice = IndiceBusca()
+    indice.preencher(SALAS)
+    return indice
+
+
+def test_distancia():
+    assert _distancia("sala", "sala") == 0
+    assert _distancia("sla", "sal") == 1  # transposição
+    assert _distancia("kitten", "sitting") == 3
+
+
+@pytest.mark.parametrize("busca, primeira", [
+    ("sal", 1),
+    ("sla", 1),
+    ("slaa a", 1),
+    ("aduitorio", 2),
+    ("auditroio", 2),
+    ("reunaio", 3),
+    ("sla de reuinao", 3),
+    ("sorvte", 4),
+    ("cozinah", 4),
+    ("laboratrio", 5),
+])
+def test_erros_de_digitacao(indice, busca, primeira):
+    assert indice.buscar(busca, 5)[0][0] == primeira
+
+
+def test_busca_curta_com_erro_nao_traz_qualquer_sala(indice):
+    # "sla" tem só "  s" em comum com "Sorvete", como com "Sala A"
+    assert [id_sala for id_sala, _ in indice.buscar("sla", 5)] == [1, 3]
+    assert indice.buscar("xyz", 5) == []
+
+
+def test_acima_do_limiar_vem_antes(indice):
+    indice.preencher(SALAS + [(6, "Slack", "Térreo")])
+    assert [id_sala for id_sala, _ in indice.buscar("sla", 5)] == [6, 1, 3]
+
+
+def test_rota_de_busca(cliente, sala_e_usuario):
+    resposta = cliente.get("/salas/busca", params={"q": "sla"})
+    assert resposta.status_code == 200, resposta.text
+    assert [sala["nome"] for sala in resposta.json()] == ["sala a"]  # o nome é gravado em minúsculas
@@ -0,0 +1,69 @@
+"""
+Número de consultas SQL das listagens: não pode crescer com o número de
+linhas (N+1). Cada rota é chamada com 2 e com 20 registros de cada tipo e os
+before_cursor_execute do engine são contados.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+
+import cache, models
+from conftest import recriar_banco
+from database import SessionLocal, engine
+
+ROTAS = ["/reservas/", "/salas/?expand=true", "/usuarios/"]
+
+
+def popular(quantidade: int) -> None:
+    """
+    Recria o banco com `quantidade` usuários, salas e reservas, cada sala
+    associada a dois usuários.
+    """
+    recriar_banco()
+    inicio = datetime(2030, 1, 1, 8)
+    with SessionLocal() as db:
+        db.execute(insert(models.Usuario), [
+            {"id": i, "nome": f"usuario {i}", "email": f"usuario{i}@exemplo.com"} for i in range(1, quantidade + 1)
+        ])
+        db.execute(insert(models.Sala), [
+            {"id": i, "nome": f"sala {i}", "capacidade": 10, "localizacao": "teste"} for i in range(1, quantidade + 1)
+        ])
+        db.execute(insert(models.sala_usuario), [
+            {"sala_id": i, "usuario_id": u} for i in range(1, quantidade + 1) for u in {i, i % quantidade + 1}
+        ])
+        db.execute(insert(models.Reserva), [
+            {"id_sala": i, "id_usuario": i, "participantes": 1,
+             "data_inicio": inicio + timedelta(hours=i), "data_final": inicio + timedelta(hours=i, minutes=30)}
+            for i in range(1, quantidade + 1)
+        ])
+        db.commit()
+    cache.catalogo.invalidar("salas", "usuarios")
+
+
+def contar_consultas(cliente: TestClient, rota: str) -> int:
+    consultas = []
+
+    def contar(*args):
+        consultas.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        resposta = cliente.get(rota)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert resposta.status_code == 200, resposta.text
+    return len(consultas)
+
+
+@pytest.mark.parametrize("rota", ROTAS)
+def test_consultas_nao_crescem_com_as_linhas(cliente, rota):
+    contagens = {}
+    for quantidade in (2, 20):
+        popular(quantidade)
+        resposta = cliente.get(rota)
+        assert len(resposta.json()) == quantidade
+        cache.catalogo.invalidar("salas", "usuarios")
+        contagens[quantidade] = contar_consultas(cliente, rota)
+    assert contagens[2] == contagens[20], f"{rota}: {contagens}"
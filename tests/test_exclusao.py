@@ -0,0 +1,29 @@
+"""
+Exclusão de salas e usuários, com o que depende deles.
+"""
+import pytest
+
+import models
+from database import SessionLocal
+
+
+def test_exclusao_leva_as_reservas_da_sala(cliente, sala_e_usuario):
+    resposta = cliente.post("/reservas/", json={
+        "id_sala": 1, "id_usuario": 1, "data_inicio": "2030-01-01T10:00:00", "data_final": "2030-01-01T11:00:00",
+    })
+    assert resposta.status_code == 201, resposta.text
+    assert cliente.delete("/salas/1").status_code == 204
+    with SessionLocal() as db:
+        assert db.query(models.Reserva).count() == 0
+    assert cliente.get("/reservas/1").status_code == 404
+
+
+@pytest.mark.parametrize("rota, detalhe", [
+    ("/usuarios/1", "User not found."),
+    ("/salas/1", "Sala não encontrada."),
+])
+def test_segunda_exclusao_responde_404(cliente, sala_e_usuario, rota, detalhe):
+    assert cliente.delete(rota).status_code == 204
+    resposta = cliente.delete(rota)
+    assert resposta.status_code == 404
+    assert resposta.json()["detail"] == detalhe
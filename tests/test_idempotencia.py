@@ -0,0 +1,151 @@
+"""
+Idempotency-Key: repetições recebem a resposta guardada, sem criar outra
+reserva, e o corpo continua chegando ao endpoint em streaming.
+"""
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import models
+from database import SessionLocal
+from idempotencia import ArmazemIdempotencia, MiddlewareIdempotencia
+
+RESERVA = {"id_sala": 1, "id_usuario": 1, "participantes": 2,
+           "data_inicio": "2030-01-01T10:00:00", "data_final": "2030-01-01T11:00:00"}
+
+
+def contar_reservas() -> int:
+    with SessionLocal() as db:
+        return db.query(models.Reserva).count()
+
+
+async def chamar(middleware: MiddlewareIdempotencia, pedacos=(b"{}",)) -> list:
+    """
+    Um POST /x com Idempotency-Key direto no middleware, com o corpo nos
+    pedaços informados; retorna as mensagens enviadas.
+    """
+    mensagens = iter([{"type": "http.request", "body": p, "more_body": i < len(pedacos) - 1}
+                      for i, p in enumerate(pedacos)])
+    enviados = []
+
+    async def receive():
+        return next(mensagens)
+
+    async def send(message):
+        enviados.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/x", "headers": [(b"idempotency-key", b"k")]}
+    await middleware(scope, receive, send)
+    return enviados
+
+
+def test_repeticao_recebe_a_mesma_resposta(cliente, sala_e_usuario):
+    cabecalhos = {"Idempotency-Key": str(uuid.uuid4())}
+    primeira = cliente.post("/reservas/", json=RESERVA, headers=cabecalhos)
+    assert primeira.status_code == 201, primeira.text
+    repeticao = cliente.post("/reservas/", json=RESERVA, headers=cabecalhos)
+    assert repeticao.status_code == 201
+    assert repeticao.json() == primeira.json()
+    assert repeticao.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in primeira.headers
+    assert contar_reservas() == 1
+
+
+def test_mesma_chave_com_outro_corpo_responde_422(cliente, sala_e_usuario):
+    cabecalhos = {"Idempotency-Key": str(uuid.uuid4())}
+    assert cliente.post("/reservas/", json=RESERVA, headers=cabecalhos).status_code == 201
+    outra = {**RESERVA, "data_inicio": "2030-01-01T12:00:00", "data_final": "2030-01-01T13:00:00"}
+    assert cliente.post("/reservas/", json=outra, headers=cabecalhos).status_code == 422
+    assert contar_reservas() == 1
+
+
+def test_repeticoes_simultaneas_criam_uma_reserva(cliente, sala_e_usuario):
+    cabecalhos = {"Idempotency-Key": str(uuid.uuid4())}
+    with ThreadPoolExecutor(8) as executor:
+        respostas = list(executor.map(lambda _: cliente.post("/reservas/", json=RESERVA, headers=cabecalhos), range(8)))
+    assert [r.status_code for r in respostas] == [201] * 8
+    assert len({r.json()["id"] for r in respostas}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in respostas) == 7
+    assert contar_reservas() == 1
+
+
+def test_lote_ndjson_com_chave(cliente, sala_e_usuario):
+    linhas = [
+        {**RESERVA, "data_inicio": f"2030-01-01T{h:02}:00:00", "data_final": f"2030-01-01T{h:02}:30:00"}
+        for h in range(8, 12)
+    ]
+    corpo = "\n".join(json.dumps(linha) for linha in linhas) + "\n"
+
+    def pedacos():
+        # O corpo vai em vários pedaços, como um cliente enviando em streaming
+        for i in range(0, len(corpo), 50):
+            yield corpo[i:i + 50].encode()
+
+    cabecalhos = {"Idempotency-Key": str(uuid.uuid4()), "Content-Type": "application/x-ndjson"}
+    primeira = cliente.post("/reservas/lote", content=pedacos(), headers=cabecalhos)
+    assert primeira.status_code == 200, primeira.text
+    assert primeira.json()["criadas"] == 4
+    repeticao = cliente.post("/reservas/lote", content=pedacos(), headers=cabecalhos)
+    assert repeticao.json() == primeira.json()
+    assert repeticao.headers["Idempotent-Replayed"] == "true"
+    assert contar_reservas() == 4
+
+
+def test_corpo_chega_ao_endpoint_antes_de_terminar():
+    recebidos = []
+
+    async def app(scope, receive, send):
+        # Lê só o primeiro pedaço e responde: o resto nunca foi pedido
+        recebidos.append(await receive())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = MiddlewareIdempotencia(app, ArmazemIdempotencia(persistir=False))
+    enviados = asyncio.run(chamar(middleware, [b"ab", b"cd"]))
+    assert recebidos == [{"type": "http.request", "body": b"ab", "more_body": True}]
+    assert enviados[-1]["body"] == b"ok"
+    # O digest inclui o pedaço que o endpoint não leu
+    assert asyncio.run(chamar(middleware, [b"a", b"bcd"]))[0]["status"] == 200
+    assert asyncio.run(chamar(middleware, [b"ab", b"ce"]))[0]["status"] == 422
+
+
+def test_resposta_5xx_nao_e_guardada():
+    chamadas = []
+
+    async def app(scope, receive, send):
+        await receive()
+        chamadas.append(scope["path"])
+        await send({"type": "http.response.start", "status": 500 if len(chamadas) == 1 else 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = MiddlewareIdempotencia(app, ArmazemIdempotencia(persistir=False))
+    # A nova tentativa depois de um 500 executa de novo; a de depois do 201 é repetição
+    assert [asyncio.run(chamar(middleware))[0]["status"] for _ in range(3)] == [500, 201, 201]
+    assert len(chamadas) == 2
+
+
+def test_chave_vazia_ou_longa_responde_400(cliente, sala_e_usuario):
+    for chave in ("", "x" * 256):
+        assert cliente.post("/reservas/", json=RESERVA, headers={"Idempotency-Key": chave}).status_code == 400
+    assert contar_reservas() == 0
+
+
+def test_repeticao_desiste_de_esperar_a_original():
+    async def cenario():
+        liberar = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await receive()
+            await liberar.wait()
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = MiddlewareIdempotencia(app, ArmazemIdempotencia(persistir=False), espera_segundos=0.01)
+        original = asyncio.create_task(chamar(middleware))
+        await asyncio.sleep(0)
+        repeticao = await chamar(middleware)
+        liberar.set()
+        return (await original)[0]["status"], repeticao[0]["status"]
+
+    assert asyncio.run(cenario()) == (201, 409)
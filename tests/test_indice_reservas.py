@@ -0,0 +1,56 @@
+"""
+Índice em memória das reservas de cada sala (indice_reservas.AgendaSala).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import indice_reservas
+from indice_reservas import AgendaSala
+
+BASE = datetime(2030, 1, 1, 8)
+
+
+def hora(h: float) -> datetime:
+    return BASE + timedelta(hours=h)
+
+
+@pytest.fixture
+def agenda(monkeypatch):
+    # Blocos pequenos: os limites entre blocos aparecem com poucas reservas
+    monkeypatch.setattr(indice_reservas, "TAMANHO_BLOCO", 2)
+    agenda = AgendaSala(id_sala=1)
+    agenda.carregada = True
+    # Reservas de 1 h começando a cada 2 h, inseridas fora de ordem
+    for n in (3, 0, 4, 1, 5, 2):
+        agenda.inserir(n + 1, hora(2 * n), hora(2 * n + 1))
+    return agenda
+
+
+@pytest.mark.parametrize("inicio, final, esperado", [
+    (hora(1), hora(2), None),  # entre duas reservas, encostando nas duas
+    (hora(-1), hora(0), None),  # termina quando a primeira começa
+    (hora(11), hora(12), None),  # começa quando a última termina
+    (hora(0.5), hora(1.5), 1),  # sobrepõe o fim
+    (hora(1.5), hora(2.5), 2),  # sobrepõe o começo
+    (hora(4.25), hora(4.75), 3),  # contido
+    (hora(5.5), hora(9.5), 5),  # contém uma reserva e sobrepõe outra: a última que começa antes do fim
+    (hora(-5), hora(20), 6),
+])
+def test_conflito_nos_limites(agenda, inicio, final, esperado):
+    assert agenda.conflito(inicio, final) == esperado
+
+
+def test_intervalos_em_ordem_entre_blocos(agenda):
+    assert len(agenda._blocos) > 1
+    assert [i[2] for i in agenda.intervalos(hora(1), hora(9))] == [2, 3, 4, 5]
+    # Os que só encostam no período ficam de fora
+    assert [i[2] for i in agenda.intervalos(hora(1), hora(2))] == []
+
+
+def test_remover(agenda):
+    assert agenda.remover(3, hora(4))
+    assert not agenda.remover(3, hora(4))
+    assert agenda.conflito(hora(4), hora(5)) is None
+    assert len(agenda) == 5
+    assert [i[2] for i in agenda.intervalos(hora(0), hora(12))] == [1, 2, 4, 5, 6]
@@ -0,0 +1,84 @@
+"""
+Paginação por cursor (keyset) das listagens, com reservas avulsas e
+ocorrências de séries recorrentes intercaladas.
+"""
+from datetime import datetime
+
+import pytest
+
+from paginacao import CABECALHO_PROXIMO_CURSOR, CursorInvalidoError, codificar_cursor, decodificar_cursor
+
+
+def percorrer(cliente, rota: str, limit: int, **params) -> list:
+    """
+    Todas as páginas da rota, seguindo o X-Next-Cursor até a última.
+    """
+    itens, cursor = [], None
+    while True:
+        resposta = cliente.get(rota, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert resposta.status_code == 200, resposta.text
+        assert len(resposta.json()) <= limit
+        itens += resposta.json()
+        cursor = resposta.headers.get(CABECALHO_PROXIMO_CURSOR)
+        if cursor is None:
+            return itens
+
+
+def identificar(reserva: dict) -> tuple:
+    return reserva["id"], reserva["id_serie"], reserva["data_inicio"]
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor(datetime(2030, 1, 1, 10, 30), 0, 7)
+    assert decodificar_cursor(cursor, datetime.fromisoformat, int, int) == (datetime(2030, 1, 1, 10, 30), 0, 7)
+    with pytest.raises(CursorInvalidoError):
+        decodificar_cursor(cursor, datetime.fromisoformat, int)
+    with pytest.raises(CursorInvalidoError):
+        decodificar_cursor("nao-e-um-cursor", datetime.fromisoformat, int, int)
+
+
+def test_cursor_invalido_responde_400(cliente, banco):
+    resposta = cliente.get("/reservas/", params={"cursor": "nao-e-um-cursor"})
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == "Cursor de paginação inválido."
+
+
+@pytest.fixture
+def reservas_e_series(cliente, sala_e_usuario):
+    assert cliente.post("/salas/", json={"nome": "Sala B", "capacidade": 10, "localizacao": "Térreo"}).status_code == 201
+    # Série diária na sala 2, das 10h às 11h, de 1 a 6 de janeiro, sem o dia 3
+    assert cliente.post("/reservas/series", json={
+        "id_sala": 2, "id_usuario": 1, "participantes": 2,
+        "data_inicio": "2030-01-01T10:00:00", "data_final": "2030-01-01T11:00:00",
+        "frequencia": "diaria", "ocorrencias": 6, "excecoes": ["2030-01-03T10:00:00"],
+    }).status_code == 201
+    # Avulsas na sala 1: algumas no mesmo horário das ocorrências, outras entre elas
+    for dia, hora in [(1, 10), (2, 9), (2, 10), (3, 10), (4, 12), (5, 10), (6, 8), (7, 10)]:
+        assert cliente.post("/reservas/", json={
+            "id_sala": 1, "id_usuario": 1, "participantes": 2,
+            "data_inicio": f"2030-01-{dia:02}T{hora:02}:00:00", "data_final": f"2030-01-{dia:02}T{hora:02}:30:00",
+        }).status_code == 201
+
+
+def test_listagem_completa_intercala_avulsas_e_ocorrencias(cliente, reservas_e_series):
+    itens = percorrer(cliente, "/reservas/", limit=1000)
+    assert len(itens) == 8 + 5
+    assert [r["data_inicio"] for r in itens] == sorted(r["data_inicio"] for r in itens)
+    # No mesmo horário a avulsa vem antes da ocorrência
+    assert [(r["id"] is None) for r in itens if r["data_inicio"] == "2030-01-02T10:00:00"] == [False, True]
+    assert "2030-01-03T10:00:00" not in {r["data_inicio"] for r in itens if r["id_serie"]}
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_paginas_cobrem_a_listagem_sem_repetir(cliente, reservas_e_series, limit):
+    completa = [identificar(r) for r in percorrer(cliente, "/reservas/", limit=1000)]
+    assert [identificar(r) for r in percorrer(cliente, "/reservas/", limit=limit)] == completa
+
+
+@pytest.mark.parametrize("rota", ["/salas/", "/usuarios/"])
+def test_paginas_de_salas_e_usuarios(cliente, banco, rota):
+    for i in range(5):
+        corpo = ({"nome": f"Sala {i}", "capacidade": 10, "localizacao": "Térreo"} if rota == "/salas/"
+                 else {"nome": f"Usuário {i}", "email": f"usuario{i}@exemplo.com"})
+        assert cliente.post(rota, json=corpo).status_code == 201
+    assert [item["id"] for item in percorrer(cliente, rota, limit=2)] == [1, 2, 3, 4, 5]
@@ -0,0 +1,160 @@
+"""
+Séries de reservas recorrentes: expansão das ocorrências, exceções e
+conflitos com reservas avulsas.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from recorrencia import Recorrencia
+
+
+def regra(frequencia: str = "diaria", **campos) -> Recorrencia:
+    return Recorrencia(id=1, data_inicio=datetime(2030, 1, 1, 10), data_final=datetime(2030, 1, 1, 11),
+                       frequencia=frequencia, **campos)
+
+
+def inicios(ocorrencias) -> list:
+    return [inicio for _, inicio, _ in ocorrencias]
+
+
+# --- Expansão ---
+
+@pytest.mark.parametrize("frequencia, intervalo, passo", [
+    ("diaria", 1, timedelta(days=1)),
+    ("diaria", 3, timedelta(days=3)),
+    ("semanal", 2, timedelta(weeks=2)),
+])
+def test_ocorrencias_com_passo_fixo(frequencia, intervalo, passo):
+    serie = regra(frequencia, intervalo=intervalo, ocorrencias=4)
+    assert inicios(serie.todas()) == [datetime(2030, 1, 1, 10) + n * passo for n in range(4)]
+    assert serie.fim == datetime(2030, 1, 1, 11) + 3 * passo
+
+
+def test_mensal_usa_o_ultimo_dia_dos_meses_curtos():
+    serie = Recorrencia(id=1, data_inicio=datetime(2030, 1, 31, 10), data_final=datetime(2030, 1, 31, 11),
+                        frequencia="mensal", ocorrencias=4)
+    assert [d.date().isoformat() for d in inicios(serie.todas())] == [
+        "2030-01-31", "2030-02-28", "2030-03-31", "2030-04-30",
+    ]
+
+
+def test_data_limite_inclui_a_ocorrencia_que_comeca_nela():
+    serie = regra(data_limite=datetime(2030, 1, 4, 10))
+    assert serie.total == 4
+    assert inicios(serie.todas())[-1] == datetime(2030, 1, 4, 10)
+    # Com os dois, vale o que terminar antes
+    assert regra(data_limite=datetime(2030, 1, 4, 10), ocorrencias=2).total == 2
+
+
+def test_excecoes_ficam_de_fora():
+    serie = regra(ocorrencias=5, excecoes=frozenset({datetime(2030, 1, 2, 10), datetime(2030, 1, 4, 10)}))
+    assert [n for n, _, _ in serie.todas()] == [0, 2, 4]
+    assert serie.total == 5
+
+
+def test_ocorrencias_entre_respeita_os_limites():
+    serie = regra(ocorrencias=5)
+    # Períodos que só encostam numa ocorrência não a incluem
+    assert inicios(serie.ocorrencias_entre(datetime(2030, 1, 2, 11), datetime(2030, 1, 3, 10))) == []
+    assert inicios(serie.ocorrencias_entre(datetime(2030, 1, 2, 10, 59), datetime(2030, 1, 3, 10, 1))) == [
+        datetime(2030, 1, 2, 10), datetime(2030, 1, 3, 10),
+    ]
+    # Depois da última ocorrência não há mais nada
+    assert serie.conflito(datetime(2030, 1, 6, 10), datetime(2030, 1, 6, 11)) is None
+    assert serie.conflito(datetime(2030, 1, 5, 10, 30), datetime(2030, 1, 5, 12)) == (
+        4, datetime(2030, 1, 5, 10), datetime(2030, 1, 5, 11),
+    )
+
+
+def test_ocorrencias_a_partir_de_um_instante():
+    serie = regra(ocorrencias=5)
+    assert inicios(serie.ocorrencias_a_partir(datetime(2030, 1, 3, 10))) == [
+        datetime(2030, 1, d, 10) for d in (3, 4, 5)
+    ]
+    assert inicios(serie.ocorrencias_a_partir(datetime(2030, 1, 3, 10, 1))) == [
+        datetime(2030, 1, d, 10) for d in (4, 5)
+    ]
+
+
+# --- Pela API ---
+
+SERIE = {
+    "id_sala": 1, "id_usuario": 1, "participantes": 2,
+    "data_inicio": "2030-01-01T10:00:00", "data_final": "2030-01-01T11:00:00",
+    "frequencia": "diaria", "ocorrencias": 5, "excecoes": ["2030-01-03T10:00:00"],
+}
+
+
+def reservar(cliente, inicio: str, final: str):
+    return cliente.post("/reservas/", json={
+        "id_sala": 1, "id_usuario": 1, "participantes": 2, "data_inicio": inicio, "data_final": final,
+    })
+
+
+@pytest.fixture
+def serie(cliente, sala_e_usuario) -> dict:
+    resposta = cliente.post("/reservas/series", json=SERIE)
+    assert resposta.status_code == 201, resposta.text
+    return resposta.json()
+
+
+def test_reserva_sobre_ocorrencia_responde_409(cliente, serie):
+    assert reservar(cliente, "2030-01-04T10:30:00", "2030-01-04T12:00:00").status_code == 409
+    # Encostando na ocorrência, no dia da exceção e depois da série está livre
+    assert reservar(cliente, "2030-01-04T11:00:00", "2030-01-04T12:00:00").status_code == 201
+    assert reservar(cliente, "2030-01-03T10:00:00", "2030-01-03T11:00:00").status_code == 201
+    assert reservar(cliente, "2030-01-06T10:00:00", "2030-01-06T11:00:00").status_code == 201
+
+
+def test_serie_sobre_reserva_avulsa_responde_409(cliente, sala_e_usuario):
+    assert reservar(cliente, "2030-01-04T10:30:00", "2030-01-04T10:45:00").status_code == 201
+    assert cliente.post("/reservas/series", json={**SERIE, "excecoes": []}).status_code == 409
+    # Com a ocorrência do dia 4 como exceção a série cabe
+    assert cliente.post("/reservas/series", json={**SERIE, "excecoes": ["2030-01-04T10:00:00"]}).status_code == 201
+
+
+def test_series_sobrepostas_responde_409(cliente, serie):
+    semanal = {**SERIE, "data_inicio": "2030-01-05T10:30:00", "data_final": "2030-01-05T11:30:00",
+               "frequencia": "semanal", "excecoes": []}
+    assert cliente.post("/reservas/series", json=semanal).status_code == 409
+    # A mesma série a partir do dia 6 não encontra mais ocorrências
+    seguinte = {**semanal, "data_inicio": "2030-01-06T10:30:00", "data_final": "2030-01-06T11:30:00"}
+    assert cliente.post("/reservas/series", json=seguinte).status_code == 201
+
+
+def test_cancelar_ocorrencia_libera_o_horario(cliente, serie):
+    assert reservar(cliente, "2030-01-02T10:00:00", "2030-01-02T11:00:00").status_code == 409
+    rota = f"/reservas/series/{serie['id']}/excecoes"
+    resposta = cliente.post(rota, json={"data_inicio": "2030-01-02T10:00:00"})
+    assert resposta.status_code == 200, resposta.text
+    assert reservar(cliente, "2030-01-02T10:00:00", "2030-01-02T11:00:00").status_code == 201
+    assert cliente.post(rota, json={"data_inicio": "2030-01-02T10:00:00"}).status_code == 400
+    assert cliente.post(rota, json={"data_inicio": "2030-01-02T10:30:00"}).status_code == 400
+
+
+def test_excecao_que_nao_e_ocorrencia_responde_400(cliente, sala_e_usuario):
+    resposta = cliente.post("/reservas/series", json={**SERIE, "excecoes": ["2030-01-03T09:00:00"]})
+    assert resposta.status_code == 400
+
+
+def test_listagens_expandem_as_ocorrencias(cliente, serie):
+    resposta = cliente.get("/reservas/intervalo", params={
+        "data_inicio": "2030-01-02T00:00:00", "data_final": "2030-01-05T00:00:00",
+    })
+    assert resposta.status_code == 200, resposta.text
+    assert [(r["id_serie"], r["data_inicio"]) for r in resposta.json()] == [
+        (serie["id"], "2030-01-02T10:00:00"), (serie["id"], "2030-01-04T10:00:00"),
+    ]
+
+
+def test_ocupacao_conta_as_ocorrencias(cliente, serie):
+    assert reservar(cliente, "2030-01-03T10:00:00", "2030-01-03T11:00:00").status_code == 201
+    resposta = cliente.get("/analises/ocupacao", params={
+        "data_inicio": "2030-01-01T00:00:00", "data_final": "2030-01-08T00:00:00", "periodo": "total",
+    })
+    assert resposta.status_code == 200, resposta.text
+    grupo, = resposta.json()["grupos"]
+    # 4 ocorrências (uma das 5 é exceção) + 1 avulsa, de 1 h cada
+    assert grupo["reservas"] == [5]
+    assert grupo["minutos_ocupados"] == [300]
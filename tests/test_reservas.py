@@ -0,0 +1,92 @@
+"""
+Criação de reservas e consultas por período.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+import models, schemas
+from database import SessionLocal
+
+PERIODO_COM_FUSO = {"data_inicio": "2030-01-01T00:00:00Z", "data_final": "2030-01-02T00:00:00+00:00"}
+
+
+def reservar(cliente, inicio: str, final: str, id_sala: int = 1):
+    return cliente.post("/reservas/", json={
+        "id_sala": id_sala, "id_usuario": 1, "data_inicio": inicio, "data_final": final, "participantes": 2,
+    })
+
+
+# --- Datas com fuso ---
+
+def test_sem_fuso_converte_para_utc():
+    assert schemas.sem_fuso(datetime.fromisoformat("2030-01-01T10:00:00-03:00")) == datetime(2030, 1, 1, 13)
+    assert schemas.sem_fuso(datetime(2030, 1, 1, 10)) == datetime(2030, 1, 1, 10)
+
+
+def test_reserva_com_fuso_e_gravada_em_utc(cliente, sala_e_usuario):
+    resposta = reservar(cliente, "2030-01-01T10:00Z", "2030-01-01T08:00:00-03:00")
+    assert resposta.status_code == 201, resposta.text
+    assert resposta.json()["data_inicio"] == "2030-01-01T10:00:00"
+    assert resposta.json()["data_final"] == "2030-01-01T11:00:00"
+    # Conflita com a mesma faixa escrita sem fuso
+    assert reservar(cliente, "2030-01-01T10:30:00", "2030-01-01T10:45:00").status_code == 409
+
+
+@pytest.mark.parametrize("rota", [
+    "/reservas/intervalo",
+    "/reservas/exportar",
+    "/salas/disponiveis",
+    "/analises/ocupacao",
+])
+def test_consultas_por_periodo_aceitam_fuso(cliente, sala_e_usuario, rota):
+    assert reservar(cliente, "2030-01-01T10:00Z", "2030-01-01T11:00Z").status_code == 201
+    resposta = cliente.get(rota, params=PERIODO_COM_FUSO)
+    assert resposta.status_code == 200, resposta.text
+    if rota == "/reservas/intervalo":
+        assert [r["data_inicio"] for r in resposta.json()] == ["2030-01-01T10:00:00"]
+    if rota == "/reservas/exportar":
+        assert resposta.text.count("\n") == 1
+
+
+# --- Limites dos intervalos ---
+
+def test_reservas_que_se_encostam_sao_aceitas(cliente, sala_e_usuario):
+    assert reservar(cliente, "2030-01-01T10:00:00", "2030-01-01T11:00:00").status_code == 201
+    assert reservar(cliente, "2030-01-01T11:00:00", "2030-01-01T12:00:00").status_code == 201
+    assert reservar(cliente, "2030-01-01T09:00:00", "2030-01-01T10:00:00").status_code == 201
+
+
+@pytest.mark.parametrize("inicio, final", [
+    ("2030-01-01T10:59:00", "2030-01-01T11:30:00"),  # um minuto sobre o fim
+    ("2030-01-01T09:30:00", "2030-01-01T10:01:00"),  # um minuto sobre o começo
+    ("2030-01-01T10:15:00", "2030-01-01T10:45:00"),  # contida
+    ("2030-01-01T09:00:00", "2030-01-01T12:00:00"),  # contém
+    ("2030-01-01T10:00:00", "2030-01-01T11:00:00"),  # idêntica
+])
+def test_sobreposicao_responde_409(cliente, sala_e_usuario, inicio, final):
+    assert reservar(cliente, "2030-01-01T10:00:00", "2030-01-01T11:00:00").status_code == 201
+    resposta = reservar(cliente, inicio, final)
+    assert resposta.status_code == 409
+    assert resposta.json()["detail"] == "A sala 1 já possui a reserva 1 no período informado."
+    # Outra sala no mesmo horário está livre
+    assert cliente.post("/salas/", json={"nome": "Sala B", "capacidade": 10, "localizacao": "Térreo"}).status_code == 201
+    assert reservar(cliente, inicio, final, id_sala=2).status_code == 201
+
+
+# --- Concorrência ---
+
+def test_escritores_simultaneos_nao_criam_reserva_dupla(cliente, sala_e_usuario):
+    # Todos disputam os mesmos horários sobrepostos da mesma sala
+    faixas = [(f"2030-01-01T{10 + i // 4:02}:{15 * (i % 4):02}:00", f"2030-01-01T{11 + i // 4:02}:{15 * (i % 4):02}:00")
+              for i in range(8)] * 4
+    with ThreadPoolExecutor(16) as executor:
+        respostas = list(executor.map(lambda faixa: reservar(cliente, *faixa), faixas))
+    assert sorted({r.status_code for r in respostas}) == [201, 409]
+    with SessionLocal() as db:
+        linhas = db.execute(select(models.Reserva.data_inicio, models.Reserva.data_final)
+                            .order_by(models.Reserva.data_inicio)).all()
+    assert len(linhas) == sum(r.status_code == 201 for r in respostas)
+    assert all(anterior.data_final <= linha.data_inicio for anterior, linha in zip(linhas, linhas[1:]))